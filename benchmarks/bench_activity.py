@@ -0,0 +1,74 @@
+#! /usr/bin/env python
+"""
+Benchmark of the activity records of a synthetic account listing: plain
+`(id, starttime)` tuples versus :class:`garminexport.activity.Activity`
+records.
+
+For both representations, the memory held by the listing (as measured by
+:mod:`tracemalloc`), the time to put the listing in a set, and the time of
+:func:`garminexport.backup.need_backup` (which formats the export file
+names of every activity in every format) against an empty backup
+directory are reported.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_activity --activities 100000
+"""
+import argparse
+import shutil
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+
+from garminexport.activity import Activity
+from garminexport.backup import default_export_formats, need_backup
+
+NEWEST = datetime(2020, 1, 1, tzinfo=timezone.utc)
+
+
+def make_listing(record, activities):
+    return [record(10 ** 9 + activities - i, NEWEST - timedelta(hours=7 * i))
+            for i in range(activities)]
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - start
+
+
+def bench(args, backup_dir):
+    representations = [("tuple", lambda id, start: (id, start)),
+                       ("Activity", Activity)]
+    for name, record in representations:
+        tracemalloc.start()
+        listing = make_listing(record, args.activities)
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        hashing = timed(set, listing)
+        planning = min(
+            timed(need_backup, make_listing(record, args.activities),
+                  backup_dir, args.format)
+            for _ in range(args.repeat))
+        print("{:>8} activities, {:<8}: listing {:7.1f} MiB  set {:6.3f} s  "
+              "need_backup {:6.3f} s".format(
+                  args.activities, name, size / 2.0 ** 20, hashing, planning))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--activities", type=int, default=100000,
+                        help="Account size. Default: 100000")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="Planning runs (the fastest counts). Default: 3")
+    parser.add_argument("-f", "--format", action="append",
+                        help="Export formats. Default: the garminbackup.py "
+                             "defaults.")
+    args = parser.parse_args()
+    args.format = args.format or default_export_formats
+    backup_dir = tempfile.mkdtemp(prefix="bench_activity")
+    try:
+        bench(args, backup_dir)
+    finally:
+        shutil.rmtree(backup_dir)
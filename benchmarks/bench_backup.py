@@ -0,0 +1,78 @@
+#! /usr/bin/env python
+"""
+End-to-end benchmark of ``garminbackup.py`` against the local Garmin Connect
+stand-in of :mod:`benchmarks.mockserver`.
+
+For every account size, a fresh backup of a synthetic account is run in a
+subprocess (so that its memory use can be measured in isolation), followed
+by an incremental run against the finished backup directory. Wall time,
+activity throughput, HTTP requests served and the peak resident set size of
+the backup process are reported.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_backup --activities 100 1000 --latency 0.02
+"""
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.mockserver import (
+    MockGarminServer, add_config_arguments, config_from_args)
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run(command, environment):
+    """Runs a command and returns its wall time (in seconds) and its peak
+    RSS (in MiB)."""
+    start = time.perf_counter()
+    process = subprocess.Popen(command, cwd=REPO_DIR, env=environment,
+                               stdout=subprocess.DEVNULL,
+                               stderr=subprocess.DEVNULL)
+    # the resource usage of this child alone (RUSAGE_CHILDREN would report
+    # the largest of all children waited for so far)
+    _, status, usage = os.wait4(process.pid, 0)
+    elapsed = time.perf_counter() - start
+    process.returncode = os.waitstatus_to_exitcode(status)
+    if process.returncode != 0:
+        raise subprocess.CalledProcessError(process.returncode, command)
+    return elapsed, usage.ru_maxrss / 1024.0
+
+
+def bench(args, activities):
+    backup_dir = tempfile.mkdtemp(prefix="bench_backup")
+    try:
+        with MockGarminServer(config_from_args(args, activities)) as server:
+            environment = dict(os.environ, **server.environment())
+            command = [sys.executable, "garminbackup.py", "bench",
+                       "--password", "secret", "--backup-dir", backup_dir,
+                       "--max-retries", "3", "--log-level", "ERROR"]
+            for export_format in args.format or []:
+                command += ["--format", export_format]
+            for run_name in ("full", "incremental"):
+                server.requests = 0
+                elapsed, max_rss = run(command, environment)
+                print("{:>7} activities, {:<11}: {:8.2f} s {:9.1f} act/s "
+                      "{:8d} requests  max RSS {:7.1f} MiB".format(
+                          activities, run_name, elapsed, activities / elapsed,
+                          server.requests, max_rss))
+    finally:
+        shutil.rmtree(backup_dir)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--activities", type=int, nargs="+", default=[100],
+                        help="Account sizes to benchmark. Default: 100")
+    parser.add_argument("-f", "--format", action="append",
+                        help="Export format(s) to back up. Default: the "
+                             "garminbackup.py defaults.")
+    add_config_arguments(parser)
+    args = parser.parse_args()
+    for activities in args.activities:
+        bench(args, activities)
@@ -0,0 +1,68 @@
+#! /usr/bin/env python
+"""
+End-to-end benchmark of ``get_data.py`` against the local Garmin Connect
+stand-in of :mod:`benchmarks.mockserver`.
+
+For every range length, the wellness data of a synthetic account is
+fetched and stored in a subprocess (so that its memory use can be measured
+in isolation), either in a SQLite wellness database (see
+:func:`garminexport.database.open_database`) or, with ``--output-dir``, in
+compressed files (see :mod:`garminexport.filesink`). Wall time, day
+throughput, HTTP requests served and the peak resident set size of the
+``get_data.py`` process are reported.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_get_data --days 30 365 --latency 0.02 [--workers 8]
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+from datetime import date, timedelta
+
+from benchmarks.bench_backup import run
+from benchmarks.mockserver import (
+    MockGarminServer, add_config_arguments, config_from_args)
+
+END = date(2019, 12, 31)
+
+
+def bench(args, days):
+    work_dir = tempfile.mkdtemp(prefix="bench_get_data")
+    try:
+        with MockGarminServer(config_from_args(args, 0)) as server:
+            environment = dict(os.environ, **server.environment())
+            environment.update({
+                "BIO_DB_BACKEND": "sqlite",
+                "BIO_DB_PATH": os.path.join(work_dir, "biometrics.sqlite"),
+                "BIO_LEDGER_PATH": os.path.join(work_dir, "ledger.sqlite")})
+            start = END - timedelta(days - 1)
+            command = [sys.executable, "get_data.py", "bench", "bench",
+                       "--password", "secret",
+                       "--start", start.isoformat(), "--end", END.isoformat(),
+                       "--workers", str(args.workers), "--log-level", "ERROR"]
+            if args.output_dir:
+                command += ["--output-dir", os.path.join(work_dir, "wellness")]
+            elapsed, max_rss = run(command, environment)
+            print("{:>6} days, {:<8}: {:8.2f} s {:8.1f} days/s {:8d} requests  "
+                  "max RSS {:7.1f} MiB".format(
+                      days, "files" if args.output_dir else "sqlite", elapsed,
+                      days / elapsed, server.requests, max_rss))
+    finally:
+        shutil.rmtree(work_dir)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--days", type=int, nargs="+", default=[30],
+                        help="Range lengths to benchmark. Default: 30")
+    parser.add_argument("-W", "--workers", type=int, default=4,
+                        help="Concurrent requests of get_data.py. Default: 4")
+    parser.add_argument("--output-dir", action="store_true",
+                        help="Store to compressed files instead of SQLite.")
+    add_config_arguments(parser)
+    args = parser.parse_args()
+    for days in args.days:
+        bench(args, days)
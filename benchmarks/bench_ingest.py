@@ -0,0 +1,204 @@
+#! /usr/bin/env python
+"""
+Profile-driven benchmark of the wellness ingest path of
+:class:`garminexport.database.StorageBackend` on synthetic daily payloads.
+
+By default the database connection is replaced by an in-memory recorder,
+so that the benchmark measures the client-side cost of ingest (timestamp
+conversion and statement preparation) without a database server. With
+``--backend sqlite`` the days are ingested into a
+:class:`garminexport.database.SQLiteDatabase` in a temporary directory
+instead (``--compact`` selects the compact layout of intraday samples, and
+the size of the resulting database is reported). The per-element
+conversions that the ingest path used previously are timed alongside for
+comparison.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_ingest --days 30 [--backend sqlite [--compact]] [--profile]
+"""
+import argparse
+import cProfile
+import os
+import pstats
+import random
+import shutil
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+from dateutil import parser
+
+from garminexport.database import MySQLDatabase, SQLiteDatabase
+from garminexport.timeutil import epochs_to_datetimes, parse_timestamps
+
+
+class RecordingCursor(object):
+    """A DB-API cursor stand-in that only counts statements and rows."""
+
+    def __init__(self, stats):
+        self.stats = stats
+        self.lastrowid = 1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def execute(self, sql, args=None):
+        self.stats["statements"] += 1
+        self.stats["rows"] += 1
+
+    def executemany(self, sql, args):
+        self.stats["statements"] += 1
+        self.stats["rows"] += len(args)
+
+    def fetchone(self):
+        return {"id": 1}
+
+    def fetchall(self):
+        return []
+
+
+class RecordingConnection(object):
+
+    def __init__(self):
+        self.stats = {"statements": 0, "rows": 0}
+
+    def cursor(self):
+        return RecordingCursor(self.stats)
+
+    def commit(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def synthetic_day(day, rng):
+    """Returns synthetic (sleep, hr, movement, summary) payloads for a day."""
+    start_ms = int(time.mktime(day.timetuple())) * 1000
+    calendar_date = day.isoformat()
+    sleep = {
+        "dailySleepDTO": {
+            "calendarDate": calendar_date, "sleepTimeSeconds": 27000,
+            "sleepStartTimestampGMT": start_ms - 3 * 3600 * 1000,
+            "sleepEndTimestampGMT": start_ms + 5 * 3600 * 1000,
+            "deepSleepSeconds": 5000, "lightSleepSeconds": 15000,
+            "remSleepSeconds": 6000, "awakeSleepSeconds": 1000},
+        "sleepMovement": [
+            {"startGMT": (datetime(day.year, day.month, day.day) +
+                          timedelta(minutes=i)).strftime("%Y-%m-%dT%H:%M:%S.0"),
+             "endGMT": (datetime(day.year, day.month, day.day) +
+                        timedelta(minutes=i + 1)).strftime("%Y-%m-%dT%H:%M:%S.0"),
+             "activityLevel": rng.random()}
+            for i in range(600)],
+    }
+    hr = {
+        "calendarDate": calendar_date, "maxHeartRate": 160,
+        "minHeartRate": 45, "restingHeartRate": 52,
+        "heartRateValues": [[start_ms + i * 120000, rng.randint(45, 160)]
+                            for i in range(720)],
+    }
+    movement = {
+        "calendarDate": calendar_date,
+        "movementValues": [[start_ms + i * 60000, rng.random()]
+                           for i in range(1440)],
+    }
+    summary = dict((key, 1) for key in (
+        "totalSteps", "highlyActiveSeconds", "activeSeconds",
+        "sedentarySeconds", "sleepingSeconds", "maxStressLevel",
+        "lowStressDuration", "mediumStressDuration", "highStressDuration"))
+    summary["calendarDate"] = calendar_date
+    return sleep, hr, movement, summary
+
+
+def ingest(db, days):
+    db.prefetch_daily_statistic_ids(
+        date.fromisoformat(days[0][1]["calendarDate"]),
+        date.fromisoformat(days[-1][1]["calendarDate"]))
+    for sleep, hr, movement, summary in days:
+        db.insert_sleep_data(sleep)
+        db.insert_hr_data(hr)
+        db.insert_movement_data(movement)
+        db.insert_user_summary(summary)
+
+
+def legacy_conversions(days):
+    """The per-element conversions performed by the previous ingest path."""
+    for sleep, hr, movement, summary in days:
+        for entry in sleep["sleepMovement"]:
+            parser.parse(entry["startGMT"])
+            parser.parse(entry["endGMT"])
+        for value in hr["heartRateValues"] + movement["movementValues"]:
+            datetime.fromtimestamp(int(str(value[0])[:10]))
+
+
+def batch_conversions(days):
+    for sleep, hr, movement, summary in days:
+        parse_timestamps([entry["startGMT"] for entry in sleep["sleepMovement"]])
+        parse_timestamps([entry["endGMT"] for entry in sleep["sleepMovement"]])
+        epochs_to_datetimes([value[0] for value in
+                             hr["heartRateValues"] + movement["movementValues"]])
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    arg_parser.add_argument("--days", type=int, default=30,
+                            help="Number of synthetic days. Default: 30")
+    arg_parser.add_argument("--backend", choices=["recording", "sqlite"],
+                            default="recording",
+                            help="Storage to ingest into. Default: recording")
+    arg_parser.add_argument("--compact", action="store_true",
+                            help="Store intraday samples in the compact layout.")
+    arg_parser.add_argument("--profile", action="store_true",
+                            help="Print a cProfile breakdown of the ingest.")
+    args = arg_parser.parse_args()
+
+    rng = random.Random(42)
+    days = [synthetic_day(date(2019, 1, 1) + timedelta(i), rng)
+            for i in range(args.days)]
+
+    legacy = timed(legacy_conversions, days)
+    batch = timed(batch_conversions, days)
+    print("timestamp conversion: legacy {:.1f} ms, batch {:.1f} ms ({:.1f}x)".format(
+        legacy * 1000, batch * 1000, legacy / batch))
+
+    directory = None
+    if args.backend == "sqlite":
+        directory = tempfile.mkdtemp()
+        db = SQLiteDatabase(os.path.join(directory, "biometrics.sqlite"),
+                            compact=args.compact)
+    else:
+        db = MySQLDatabase(compact=args.compact,
+                           connection=RecordingConnection())
+    profiler = cProfile.Profile()
+    profiler.enable()
+    elapsed = timed(ingest, db, days)
+    profiler.disable()
+    if args.backend == "sqlite":
+        rows = sum(db.connection.execute(
+            "SELECT COUNT(*) FROM " + table).fetchone()[0] for table in (
+                "daily_statistics", "sleep", "sleep_movement", "hr_data",
+                "movement_data", "hr_series", "movement_series"))
+        db.connection.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        size = os.path.getsize(db.path)
+        print("ingest of {} day(s) into sqlite ({} layout): {:.1f} ms, "
+              "{} row(s), {:.1f} MiB".format(
+                  args.days, "compact" if args.compact else "rows",
+                  elapsed * 1000, rows, size / 2 ** 20))
+        db.disconnect()
+        shutil.rmtree(directory)
+    else:
+        print("ingest of {} day(s): {:.1f} ms, {statements} statement(s), "
+              "{rows} row(s)".format(args.days, elapsed * 1000,
+                                     **db.connection.stats))
+    if args.profile:
+        pstats.Stats(profiler).sort_stats("cumulative").print_stats(15)
@@ -0,0 +1,94 @@
+#! /usr/bin/env python
+"""
+Microbenchmark of the JSON handling of large ``activityDetails`` payloads:
+the previous decode/re-encode path (``response.text`` + :func:`json.loads`,
+then :func:`json.dumps` with ``indent=4`` through :func:`codecs.open`)
+against the :mod:`garminexport.jsonutil` paths.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_json --samples 20000
+"""
+import argparse
+import codecs
+import json
+import os
+import random
+import tempfile
+import timeit
+
+from garminexport import jsonutil
+
+
+def synthetic_details(samples, seed=42):
+    """An activityDetails-like document with one metrics row per sample."""
+    rng = random.Random(seed)
+    return {
+        "activityId": 123456789,
+        "measurementCount": 8,
+        "metricsCount": samples,
+        "metricDescriptors": [
+            {"metricsIndex": i, "key": key, "unit": {"key": "unit"}}
+            for i, key in enumerate(
+                ["directTimestamp", "directLatitude", "directLongitude",
+                 "directHeartRate", "directSpeed", "directElevation",
+                 "sumDistance", "directRunCadence"])],
+        "activityDetailMetrics": [
+            {"metrics": [1551421800000.0 + 1000 * i,
+                         59.3 + rng.random() / 100, 18.0 + rng.random() / 100,
+                         float(rng.randint(90, 180)), rng.random() * 4,
+                         20 + rng.random() * 5, 3.0 * i,
+                         float(rng.randint(80, 95))]}
+            for i in range(samples)],
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--samples", type=int, default=20000,
+                        help="Number of metric samples. Default: 20000")
+    parser.add_argument("--repeat", type=int, default=5,
+                        help="Number of timed repetitions. Default: 5")
+    args = parser.parse_args()
+
+    content = json.dumps(synthetic_details(args.samples)).encode("utf-8")
+    dest = os.path.join(tempfile.mkdtemp(), "details.json")
+
+    def legacy():
+        data = json.loads(content.decode("utf-8"))
+        with codecs.open(dest, encoding="utf-8", mode="w") as f:
+            f.write(json.dumps(data, ensure_ascii=False, indent=4))
+
+    def pretty():
+        data = jsonutil.loads(content)
+        with open(dest, mode="wb") as f:
+            f.write(jsonutil.dumps(data, indent=4))
+
+    def pretty_indent_2():
+        data = jsonutil.loads(content)
+        with open(dest, mode="wb") as f:
+            f.write(jsonutil.dumps(data, indent=2))
+
+    def decode_and_raw_write():
+        jsonutil.loads(content)
+        with open(dest, mode="wb") as f:
+            f.write(content)
+
+    def raw_write():
+        with open(dest, mode="wb") as f:
+            f.write(content)
+
+    print("payload: {:.1f} MB, backend: {}".format(
+        len(content) / 1e6, jsonutil.backend))
+    baseline = None
+    for name, function in [("legacy decode + indent=4", legacy),
+                           ("jsonutil decode + indent=4", pretty),
+                           ("jsonutil decode + indent=2", pretty_indent_2),
+                           ("jsonutil decode + raw write", decode_and_raw_write),
+                           ("raw write only", raw_write)]:
+        seconds = min(timeit.repeat(function, number=1, repeat=args.repeat))
+        baseline = baseline or seconds
+        print("{:<30} {:8.2f} ms  {:6.1f}x".format(
+            name, seconds * 1000, baseline / seconds))
+    os.remove(dest)
+    os.rmdir(os.path.dirname(dest))
@@ -0,0 +1,116 @@
+#! /usr/bin/env python
+"""
+Benchmark of backup planning (comparing an account's activity listing with
+the backup directory) on a synthetic account and backup directory.
+
+A backup directory holding (empty) export files for all but the ``--new``
+newest activities is generated, and the missing exports are then planned
+from a streamed, newest-first listing in two ways, each in a subprocess of
+its own so that its memory use can be measured in isolation:
+
+  - ``set``: the listing is materialized as a set and compared with a list
+    of all file names (:func:`garminexport.backup.missing_exports`), and
+  - ``index``: the listing is streamed past a
+    :class:`garminexport.planner.BackupIndex` of the directory.
+
+Wall time and the growth of the peak resident set size during planning are
+reported.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_planning --activities 10000 100000 [--new 50]
+"""
+import argparse
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+from garminexport.backup import export_filename, missing_exports
+from garminexport.planner import BackupIndex
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+NEWEST = datetime(2020, 1, 1, tzinfo=timezone.utc)
+
+
+def listing(activities):
+    """Yields a synthetic account's activities, newest first."""
+    for i in range(activities):
+        yield (10 ** 9 + activities - i, NEWEST - timedelta(hours=7 * i))
+
+
+def populate(backup_dir, activities, new, export_formats):
+    """Creates empty export files for all but the ``new`` newest
+    activities."""
+    for i, activity in enumerate(listing(activities)):
+        if i < new:
+            continue
+        for export_format in export_formats:
+            open(os.path.join(backup_dir, export_filename(
+                activity, export_format)), "w").close()
+
+
+def plan(strategy, backup_dir, activities, export_formats):
+    """Plans a backup and returns the number of activities to back up."""
+    if strategy == "set":
+        return len(missing_exports(
+            set(listing(activities)), backup_dir, export_formats))
+    with BackupIndex(backup_dir) as index:
+        return len(list(index.missing(listing(activities), export_formats)))
+
+
+def child(args):
+    # runs in a subprocess: reports one strategy's time and memory growth
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    planned = plan(args.child, args.backup_dir, args.activities[0],
+                   args.format)
+    elapsed = time.perf_counter() - start
+    after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(json.dumps({"planned": planned, "seconds": elapsed,
+                      "rss_growth_mib": (after - before) / 1024.0}))
+
+
+def bench(args, activities):
+    backup_dir = tempfile.mkdtemp(prefix="bench_planning")
+    try:
+        populate(backup_dir, activities, args.new, args.format)
+        for strategy in ("set", "index"):
+            command = [sys.executable, "-m", "benchmarks.bench_planning",
+                       "--child", strategy, "--backup-dir", backup_dir,
+                       "--activities", str(activities)]
+            for export_format in args.format:
+                command += ["--format", export_format]
+            result = json.loads(subprocess.check_output(command, cwd=REPO_DIR))
+            print("{:>8} activities, {:<5}: {:7.2f} s  {:6d} planned  "
+                  "RSS growth {:7.1f} MiB".format(
+                      activities, strategy, result["seconds"],
+                      result["planned"], result["rss_growth_mib"]))
+    finally:
+        shutil.rmtree(backup_dir)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--activities", type=int, nargs="+", default=[10000],
+                        help="Account sizes to benchmark. Default: 10000")
+    parser.add_argument("--new", type=int, default=50,
+                        help="Activities that are not backed up. Default: 50")
+    parser.add_argument("-f", "--format", action="append",
+                        help="Export formats. Default: json_summary, fit")
+    parser.add_argument("--child", choices=("set", "index"),
+                        help=argparse.SUPPRESS)
+    parser.add_argument("--backup-dir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    args.format = args.format or ["json_summary", "fit"]
+    if args.child:
+        child(args)
+    else:
+        for activities in args.activities:
+            bench(args, activities)
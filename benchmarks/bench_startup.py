@@ -0,0 +1,115 @@
+#! /usr/bin/env python
+"""
+Benchmark of the startup time of the garminexport commands.
+
+Every command is started with ``--help`` (which parses the command line and
+exits, like the startup of a real run) under ``python -X importtime``. The
+report shows the wall time of the fastest run, the time spent importing
+modules, the number of modules imported, which of the heavy dependencies
+(``requests``, ``pymysql``, ``dateutil``, ``orjson``, numpy) were loaded, and
+the modules that took the longest to import. The cost of importing the heavy
+dependencies eagerly is measured for comparison.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_startup --repeat 10
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+import time
+
+from garminexport.cli import COMMANDS
+
+HEAVY_MODULES = ["requests", "pymysql", "dateutil", "orjson", "numpy"]
+"""Top-level packages that are expected to load lazily."""
+
+_IMPORTTIME = re.compile(
+    r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)\s*$")
+
+
+def parse_importtime(output):
+    """
+    Parses the ``-X importtime`` output of a process.
+
+    :param output: The standard error of the process.
+    :type output: str
+    :returns: A list of `(module, self_us, cumulative_us, depth)` tuples.
+    :rtype: list of tuple
+    """
+    imports = []
+    for line in output.splitlines():
+        match = _IMPORTTIME.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            imports.append((module, int(self_us), int(cumulative_us),
+                            len(indent) // 2))
+    return imports
+
+
+def measure(argv, repeat):
+    """
+    Runs a Python command line ``repeat`` times under ``-X importtime``.
+
+    :returns: The fastest wall time (s) and the imports of that run.
+    :rtype: tuple of `(float, list)`
+    """
+    best = None
+    # measure startup with cached bytecode, as in an installed package
+    env = dict(os.environ)
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+    for _ in range(repeat):
+        started = time.perf_counter()
+        process = subprocess.run(
+            [sys.executable, "-X", "importtime"] + argv,
+            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+            universal_newlines=True, env=env)
+        elapsed = time.perf_counter() - started
+        if best is None or elapsed < best[0]:
+            best = (elapsed, parse_importtime(process.stderr))
+    return best
+
+
+def report(label, elapsed, imports, top):
+    # depth 1 entries are the top-level imports; their cumulative times
+    # add up to the total import time
+    total = sum(cumulative for _, _, cumulative, depth in imports
+                if depth == 1)
+    loaded = set(module.split(".")[0] for module, _, _, _ in imports)
+    heavy = [module for module in HEAVY_MODULES if module in loaded]
+    print("{:<34} {:7.1f} ms wall {:7.1f} ms imports {:4d} modules  "
+          "heavy: {}".format(label, elapsed * 1000, total / 1000,
+                             len(imports), ", ".join(heavy) or "-"))
+    if top:
+        slowest = sorted(imports, key=lambda i: i[1], reverse=True)[:top]
+        for module, self_us, _, _ in slowest:
+            print("    {:>7.1f} ms  {}".format(self_us / 1000, module))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--repeat", type=int, default=5,
+                        help="Runs per command (the fastest counts). Default: 5")
+    parser.add_argument("--top", type=int, default=0,
+                        help="Show the N slowest imports of each command.")
+    args = parser.parse_args()
+
+    elapsed, imports = measure(["-c", "pass"], args.repeat)
+    report("interpreter", elapsed, imports, 0)
+    for name, _, _ in COMMANDS:
+        elapsed, imports = measure(
+            ["-m", "garminexport", name, "--help"], args.repeat)
+        report("garminexport " + name + " --help", elapsed, imports, args.top)
+
+    eager = []
+    for module in ["requests", "dateutil.parser", "zipfile", "pymysql"]:
+        try:
+            __import__(module)
+            eager.append(module)
+        except ImportError:
+            pass
+    elapsed, imports = measure(
+        ["-c", "import " + ", ".join(eager)], args.repeat)
+    report("eager " + ", ".join(eager), elapsed, imports, args.top)
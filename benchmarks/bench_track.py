@@ -0,0 +1,97 @@
+#! /usr/bin/env python
+"""
+Benchmarks the vectorized track operations of :mod:`garminexport.track`
+against straightforward pure-Python loops on a synthetic 1 Hz track.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_track --points 20000
+"""
+import argparse
+import math
+import random
+import timeit
+
+import numpy as np
+
+from garminexport import track
+
+
+def synthetic_track(points, seed=42):
+    """A random walk at roughly running pace, sampled at 1 Hz."""
+    rng = random.Random(seed)
+    lat, lon = [59.3], [18.0]
+    heading = 0.0
+    for _ in range(points - 1):
+        heading += rng.gauss(0, 0.1)
+        lat.append(lat[-1] + 0.00003 * math.cos(heading))
+        lon.append(lon[-1] + 0.00006 * math.sin(heading))
+    return lat, lon
+
+
+def haversine_loop(lat, lon):
+    total = 0.0
+    for i in range(1, len(lat)):
+        lat1, lon1 = math.radians(lat[i - 1]), math.radians(lon[i - 1])
+        lat2, lon2 = math.radians(lat[i]), math.radians(lon[i])
+        a = (math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) *
+             math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2)
+        total += 2 * track.EARTH_RADIUS * math.asin(math.sqrt(min(a, 1.0)))
+    return total
+
+
+def rdp_loop(lat, lon, tolerance):
+    lat0 = math.radians(sum(lat) / len(lat))
+    x = [track.EARTH_RADIUS * math.radians(v) * math.cos(lat0) for v in lon]
+    y = [track.EARTH_RADIUS * math.radians(v) for v in lat]
+    keep = [False] * len(x)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(x) - 1)]
+    while stack:
+        first, last = stack.pop()
+        dx, dy = x[last] - x[first], y[last] - y[first]
+        chord = math.hypot(dx, dy)
+        best, best_index = 0.0, None
+        for i in range(first + 1, last):
+            px, py = x[i] - x[first], y[i] - y[first]
+            d = (abs(dx * py - dy * px) / chord if chord > 0
+                 else math.hypot(px, py))
+            if d > best:
+                best, best_index = d, i
+        if best_index is not None and best > tolerance:
+            keep[best_index] = True
+            stack.append((first, best_index))
+            stack.append((best_index, last))
+    return keep
+
+
+def report(name, loop_seconds, vectorized_seconds):
+    print("{:<24} loop: {:8.2f} ms  numpy: {:8.2f} ms  speedup: {:6.1f}x".format(
+        name, loop_seconds * 1000, vectorized_seconds * 1000,
+        loop_seconds / vectorized_seconds))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--points", type=int, default=20000,
+                        help="Number of track points. Default: 20000")
+    parser.add_argument("--repeat", type=int, default=5,
+                        help="Number of timed repetitions. Default: 5")
+    args = parser.parse_args()
+
+    lat, lon = synthetic_track(args.points)
+    lat_array, lon_array = np.array(lat), np.array(lon)
+
+    def best(function):
+        return min(timeit.repeat(function, number=1, repeat=args.repeat))
+
+    report("haversine distance",
+           best(lambda: haversine_loop(lat, lon)),
+           best(lambda: track.cumulative_distance(lat_array, lon_array)[-1]))
+    report("rdp simplification",
+           best(lambda: rdp_loop(lat, lon, track.DEFAULT_TOLERANCE)),
+           best(lambda: track.simplify_rdp(
+               lat_array, lon_array, track.DEFAULT_TOLERANCE)))
+    kept = int(track.simplify_rdp(
+        lat_array, lon_array, track.DEFAULT_TOLERANCE).sum())
+    print("rdp kept {} of {} points".format(kept, args.points))
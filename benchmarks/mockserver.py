@@ -0,0 +1,450 @@
+#! /usr/bin/env python
+"""
+A local stand-in for the parts of Garmin Connect that
+:class:`garminexport.garminclient.GarminClient` talks to: SSO login, the
+activity list search, activity summaries/details, the GPX/TCX/original file
+download services, the wellness services and the upload service.
+
+The server emulates a synthetic account whose activities and wellness data
+are generated deterministically on the fly, so accounts of any size cost no
+memory. Latency, error rates, throttling and payload sizes are configurable.
+GET responses carry an ``ETag`` and conditional requests are honoured.
+
+To point the client at the server, set the following environment variables
+(``MockGarminServer.environment()`` returns them):
+
+    GARMIN_SSO_LOGIN_URL=http://127.0.0.1:<port>/sso/login
+    GARMIN_CONNECT_URL=http://127.0.0.1:<port>
+
+Run standalone from the repository root:
+
+    python -m benchmarks.mockserver --activities 1000 --latency 0.05
+"""
+import argparse
+import hashlib
+import io
+import json
+import random
+import re
+import threading
+import time
+import zipfile
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+FIRST_ACTIVITY_ID = 1000000000
+"""Id of the oldest activity of the synthetic account."""
+
+NEWEST_START = datetime(2020, 1, 1, 6, 0, 0)
+"""Start time of the newest activity of the synthetic account."""
+
+ACTIVITY_TYPES = ("running", "cycling", "walking", "swimming")
+
+
+class MockConfig(object):
+    """
+    Configuration of a :class:`MockGarminServer`.
+
+    :ivar activities: Number of activities in the synthetic account.
+    :ivar points: Number of track points (1 Hz samples) per activity, which
+      determines the size of details, GPX, TCX and FIT payloads.
+    :ivar latency: Added response latency in seconds.
+    :ivar jitter: Maximum random latency added on top of ``latency``.
+    :ivar error_rate: Fraction of API requests answered with a 500 error.
+    :ivar rate_limit: Maximum sustained requests per second before requests
+      are answered with 429 (``0`` means no limit).
+    :ivar seed: Seed for latency jitter and error injection.
+    :ivar names: Activity names by activity id, to emulate activities that
+      were renamed after they were backed up.
+    """
+
+    def __init__(self, activities=100, points=1800, latency=0.0, jitter=0.0,
+                 error_rate=0.0, rate_limit=0, seed=42):
+        self.activities = activities
+        self.points = points
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.seed = seed
+        self.names = {}
+
+
+def activity_start(index):
+    """Start time of the activity at a given list index (0 is newest)."""
+    return NEWEST_START - timedelta(hours=7 * index)
+
+
+def activity_index(activity_id, config):
+    index = config.activities - 1 - (activity_id - FIRST_ACTIVITY_ID)
+    if not 0 <= index < config.activities:
+        return None
+    return index
+
+
+def _track(activity_id, points):
+    rng = random.Random(activity_id)
+    lat, lon = 59.3 + rng.random() / 10, 18.0 + rng.random() / 10
+    for i in range(points):
+        lat += (rng.random() - 0.5) / 5000
+        lon += (rng.random() - 0.5) / 2500
+        yield i, lat, lon, 20 + rng.random() * 5, rng.randint(90, 180)
+
+
+def list_entry(index, config):
+    activity_id = FIRST_ACTIVITY_ID + config.activities - 1 - index
+    start = activity_start(index)
+    return {
+        "activityId": activity_id,
+        "activityName": config.names.get(
+            activity_id, "Activity {}".format(activity_id)),
+        "startTimeGMT": start.strftime("%Y-%m-%d %H:%M:%S"),
+        "startTimeLocal": start.strftime("%Y-%m-%d %H:%M:%S"),
+        "activityType": {"typeKey": ACTIVITY_TYPES[index % len(ACTIVITY_TYPES)]},
+        "distance": float(config.points * 3),
+        "duration": float(config.points),
+        "averageHR": 140.0,
+        "maxHR": 175.0,
+    }
+
+
+def summary(index, config):
+    entry = list_entry(index, config)
+    start = activity_start(index)
+    return {
+        "activityId": entry["activityId"],
+        "activityName": entry["activityName"],
+        "activityTypeDTO": entry["activityType"],
+        "summaryDTO": {
+            "startTimeGMT": start.strftime("%Y-%m-%dT%H:%M:%S.0"),
+            "distance": entry["distance"],
+            "duration": entry["duration"],
+            "averageHR": entry["averageHR"],
+            "maxHR": entry["maxHR"],
+            "startLatitude": 59.3,
+            "startLongitude": 18.0,
+            "endLatitude": 59.31,
+            "endLongitude": 18.01,
+        },
+    }
+
+
+def details(index, config):
+    activity_id = FIRST_ACTIVITY_ID + config.activities - 1 - index
+    start_ms = int((activity_start(index) - datetime(1970, 1, 1))
+                   .total_seconds()) * 1000
+    return {
+        "activityId": activity_id,
+        "metricDescriptors": [
+            {"metricsIndex": i, "key": key} for i, key in enumerate(
+                ["directTimestamp", "directLatitude", "directLongitude",
+                 "directElevation", "directHeartRate"])],
+        "activityDetailMetrics": [
+            {"metrics": [start_ms + 1000 * i, lat, lon, ele, float(hr)]}
+            for i, lat, lon, ele, hr in _track(activity_id, config.points)],
+    }
+
+
+def gpx(index, config):
+    activity_id = FIRST_ACTIVITY_ID + config.activities - 1 - index
+    start = activity_start(index)
+    points = "\n".join(
+        '<trkpt lat="{:.7f}" lon="{:.7f}"><ele>{:.1f}</ele>'
+        '<time>{}Z</time></trkpt>'.format(
+            lat, lon, ele, (start + timedelta(seconds=i)).isoformat())
+        for i, lat, lon, ele, hr in _track(activity_id, config.points))
+    return ('<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<gpx version="1.1" xmlns="http://www.topografix.com/GPX/1/1">'
+            '<trk><trkseg>\n{}\n</trkseg></trk></gpx>\n'.format(points))
+
+
+def tcx(index, config):
+    activity_id = FIRST_ACTIVITY_ID + config.activities - 1 - index
+    start = activity_start(index)
+    points = "\n".join(
+        '<Trackpoint><Time>{}Z</Time><Position><LatitudeDegrees>{:.7f}'
+        '</LatitudeDegrees><LongitudeDegrees>{:.7f}</LongitudeDegrees>'
+        '</Position><HeartRateBpm><Value>{}</Value></HeartRateBpm>'
+        '</Trackpoint>'.format(
+            (start + timedelta(seconds=i)).isoformat(), lat, lon, hr)
+        for i, lat, lon, ele, hr in _track(activity_id, config.points))
+    return ('<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<TrainingCenterDatabase xmlns="http://www.garmin.com/xmlschemas/'
+            'TrainingCenterDatabase/v2"><Activities><Activity><Lap><Track>\n'
+            '{}\n</Track></Lap></Activity></Activities>'
+            '</TrainingCenterDatabase>\n'.format(points))
+
+
+def original_zip(index, config):
+    """A zip holding a FIT-sized (but not FIT-encoded) blob."""
+    activity_id = FIRST_ACTIVITY_ID + config.activities - 1 - index
+    rng = random.Random(activity_id)
+    blob = bytes(rng.getrandbits(8) for _ in range(config.points * 20))
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, mode="w") as archive:
+        archive.writestr("{}.fit".format(activity_id), blob)
+    return buffer.getvalue()
+
+
+def wellness(kind, user, day, config):
+    rng = random.Random(day)
+    start_ms = int((datetime.strptime(day, "%Y-%m-%d") -
+                    datetime(1970, 1, 1)).total_seconds()) * 1000
+    if kind == "dailySleepData":
+        night = datetime.strptime(day, "%Y-%m-%d") - timedelta(hours=2)
+        return {
+            "dailySleepDTO": {
+                "calendarDate": day, "sleepTimeSeconds": 27000,
+                "sleepStartTimestampGMT": start_ms - 2 * 3600 * 1000,
+                "sleepEndTimestampGMT": start_ms + 6 * 3600 * 1000,
+                "deepSleepSeconds": 5000, "lightSleepSeconds": 15000,
+                "remSleepSeconds": 6000, "awakeSleepSeconds": 1000},
+            "sleepMovement": [
+                {"startGMT": (night + timedelta(minutes=i)).strftime(
+                    "%Y-%m-%dT%H:%M:%S.0"),
+                 "endGMT": (night + timedelta(minutes=i + 1)).strftime(
+                     "%Y-%m-%dT%H:%M:%S.0"),
+                 "activityLevel": rng.random()} for i in range(480)],
+        }
+    if kind == "dailyHeartRate":
+        return {
+            "userProfilePK": user, "calendarDate": day, "maxHeartRate": 160,
+            "minHeartRate": 45, "restingHeartRate": 52,
+            "heartRateValues": [[start_ms + i * 120000, rng.randint(45, 160)]
+                                for i in range(720)],
+        }
+    if kind == "dailyMovement":
+        return {
+            "calendarDate": day,
+            "movementValues": [[start_ms + i * 60000, rng.random()]
+                               for i in range(1440)],
+        }
+    summary = dict((key, rng.randint(0, 20000)) for key in (
+        "totalSteps", "highlyActiveSeconds", "activeSeconds",
+        "sedentarySeconds", "sleepingSeconds", "maxStressLevel",
+        "lowStressDuration", "mediumStressDuration", "highStressDuration"))
+    summary["calendarDate"] = day
+    return summary
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body=b"", content_type="application/json"):
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        etag = None
+        if self.command == "GET" and status == 200:
+            etag = '"{}"'.format(hashlib.md5(body).hexdigest())
+            if self.headers.get("If-None-Match") == etag:
+                status, body = 304, b""
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        if etag:
+            self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, document, status=200):
+        self._send(status, json.dumps(document))
+
+    def _read_body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if length:
+            self.rfile.read(length)
+        elif self.headers.get("Transfer-Encoding") == "chunked":
+            while True:
+                size = int(self.rfile.readline().strip(), 16)
+                self.rfile.read(size + 2)
+                if size == 0:
+                    break
+
+    def do_GET(self):
+        self.server.mock.handle(self, "GET")
+
+    def do_POST(self):
+        self._read_body()
+        self.server.mock.handle(self, "POST")
+
+    def do_PUT(self):
+        self._read_body()
+        self.server.mock.handle(self, "PUT")
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # clients that are killed mid-response are part of the job
+        pass
+
+
+class MockGarminServer(object):
+    """
+    A threaded HTTP server emulating Garmin Connect.
+
+    Example of use:
+        with MockGarminServer(MockConfig(activities=500)) as server:
+            os.environ.update(server.environment())
+            ...
+    """
+
+    def __init__(self, config=None, host="127.0.0.1", port=0):
+        self.config = config or MockConfig()
+        self._rng = random.Random(self.config.seed)
+        self._lock = threading.Lock()
+        self._tokens = float(self.config.rate_limit)
+        self._last_refill = time.monotonic()
+        self.requests = 0
+        self.httpd = _Server((host, port), _Handler)
+        self.httpd.mock = self
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return "http://{}:{}".format(host, port)
+
+    def environment(self):
+        """Environment variables that point GarminClient at this server."""
+        return {"GARMIN_SSO_LOGIN_URL": self.url + "/sso/login",
+                "GARMIN_CONNECT_URL": self.url}
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def _throttled(self):
+        if not self.config.rate_limit:
+            return False
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                float(self.config.rate_limit),
+                self._tokens + (now - self._last_refill) * self.config.rate_limit)
+            self._last_refill = now
+            if self._tokens < 1:
+                return True
+            self._tokens -= 1
+            return False
+
+    def handle(self, handler, method):
+        with self._lock:
+            self.requests += 1
+            delay = self.config.latency + self._rng.random() * self.config.jitter
+            fail = self._rng.random() < self.config.error_rate
+        if delay:
+            time.sleep(delay)
+        url = urlparse(handler.path)
+        path, query = url.path, parse_qs(url.query)
+        if path == "/sso/login":
+            return handler._send(200, 'var response_url = "{}/modern?ticket=ST-0-mock";'.format(
+                self.url), "text/html")
+        if path in ("/modern", "/legacy/session"):
+            return handler._send(200, "<html></html>", "text/html")
+        if self._throttled():
+            return handler._send_json({"message": "Too Many Requests"}, 429)
+        if fail:
+            return handler._send_json({"message": "injected error"}, 500)
+        path = re.sub(r"^/(modern/)?proxy/", "", path)
+        try:
+            return self._route(handler, method, path, query)
+        except KeyError:
+            return handler._send_json({"message": "Not Found"}, 404)
+
+    def _route(self, handler, method, path, query):
+        config = self.config
+        if path == "activitylist-service/activities/search/activities":
+            start = int(query["start"][0])
+            limit = int(query["limit"][0])
+            return handler._send_json([
+                list_entry(index, config) for index in
+                range(start, min(start + limit, config.activities))])
+        match = re.match(r"upload-service/upload/\.(\w+)$", path)
+        if match and method == "POST":
+            with self._lock:
+                upload_id = 2000000000 + self.requests
+            return handler._send_json({"detailedImportResult": {
+                "successes": [{"internalId": upload_id}], "failures": []}}, 201)
+        if method == "PUT" and path.startswith("activity-service/activity/"):
+            return handler._send(204)
+        match = re.match(r"(wellness-service/wellness/(\w+)|"
+                         r"usersummary-service/usersummary/daily)/([^/]+)$", path)
+        if match:
+            day = (query.get("date") or query["calendarDate"])[0]
+            kind = match.group(2) or "usersummary"
+            return handler._send_json(wellness(kind, match.group(3), day, config))
+        match = re.match(r"(.+)/(\d+)$", path)
+        if not match:
+            raise KeyError(path)
+        service, activity_id = match.group(1), int(match.group(2))
+        index = activity_index(activity_id, config)
+        if index is None:
+            raise KeyError(path)
+        if service == "activity-service/activity":
+            return handler._send_json(summary(index, config))
+        if service == "activity-service-1.3/json/activityDetails":
+            return handler._send_json(details(index, config))
+        if service == "download-service/export/gpx/activity":
+            return handler._send(200, gpx(index, config), "application/gpx+xml")
+        if service == "download-service/export/tcx/activity":
+            return handler._send(200, tcx(index, config), "application/vnd.garmin.tcx+xml")
+        if service == "download-service/files/activity":
+            return handler._send(200, original_zip(index, config), "application/x-zip-compressed")
+        raise KeyError(path)
+
+
+def add_config_arguments(parser):
+    """Adds command-line options for the :class:`MockConfig` settings."""
+    parser.add_argument("--points", type=int, default=1800,
+                        help="Track points per activity. Default: 1800")
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="Added response latency in seconds. Default: 0")
+    parser.add_argument("--jitter", type=float, default=0.0,
+                        help="Maximum random extra latency. Default: 0")
+    parser.add_argument("--error-rate", type=float, default=0.0,
+                        help="Fraction of requests failing with 500. Default: 0")
+    parser.add_argument("--rate-limit", type=float, default=0,
+                        help="Requests per second before 429s (0: off). Default: 0")
+
+
+def config_from_args(args, activities):
+    return MockConfig(activities=activities, points=args.points,
+                      latency=args.latency, jitter=args.jitter,
+                      error_rate=args.error_rate, rate_limit=args.rate_limit)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--activities", type=int, default=100,
+                        help="Activities in the synthetic account. Default: 100")
+    parser.add_argument("--port", type=int, default=8080,
+                        help="Port to listen on. Default: 8080")
+    add_config_arguments(parser)
+    args = parser.parse_args()
+    server = MockGarminServer(config_from_args(args, args.activities),
+                              port=args.port)
+    for name, value in sorted(server.environment().items()):
+        print("export {}={}".format(name, value))
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
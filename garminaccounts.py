@@ -0,0 +1,11 @@
+#! /usr/bin/env python
+"""
+Performs incremental backups of several Garmin Connect accounts in one
+process. The accounts, their backup directories and the shared worker pool
+size and request rate limit are read from a JSON configuration file (see
+:mod:`garminexport.accounts`).
+"""
+from garminexport.commands import main, accounts
+
+if __name__ == "__main__":
+    main(accounts)
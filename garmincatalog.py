@@ -0,0 +1,9 @@
+#! /usr/bin/env python
+"""
+Queries the local activity catalog of a backup directory (as maintained by
+``garminbackup.py``) without opening the individual activity files.
+"""
+from garminexport.commands import main, catalog
+
+if __name__ == "__main__":
+    main(catalog)
@@ -0,0 +1,4 @@
+"""Runs the ``garminexport`` program (see :mod:`garminexport.cli`)."""
+from garminexport.cli import main
+
+main()
@@ -0,0 +1,225 @@
+"""
+Module for backing up several Garmin Connect accounts in one process.
+
+Every account keeps its own :class:`garminexport.garminclient.GarminClient`
+(and thereby its own session), while all accounts share one pool of worker
+threads and, optionally, one :class:`garminexport.ratelimit.RateLimiter`.
+Downloads are scheduled fairly: whenever a worker frees up, it goes to the
+next account (taking turns) with pending work and no download in flight, so
+that a huge account cannot starve small ones. An account has at most one
+download in flight, since its client's session (and its ``.not_found``
+file) must not be used by several threads at once; the pool thus backs up
+up to one activity per account concurrently.
+
+The accounts are described by a JSON configuration file:
+
+    {
+        "workers": 4,
+        "rate": 5.0,
+        "burst": 10,
+        "accounts": [
+            {"name": "alice", "username": "alice@example.com",
+             "password_env": "ALICE_PASSWORD", "backup_dir": "backups/alice"},
+            {"name": "bob", "username": "bob@example.com",
+             "password": "secret", "backup_dir": "backups/bob",
+             "formats": ["json_summary", "fit"]}
+        ]
+    }
+"""
+import json
+import logging
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import garminexport.backup
+from garminexport.backup import default_export_formats, export_formats
+from garminexport.catalog import Catalog, catalog_file
+from garminexport.garminclient import GarminClient
+
+log = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = 4
+"""The default size of the shared worker pool."""
+
+
+class Account(object):
+    """
+    An account to back up, along with its backup settings and, during a
+    backup, its client, work queue and progress.
+    """
+
+    def __init__(self, name, username, password, backup_dir,
+                 export_formats=None):
+        """
+        :param name: A short name used in log messages.
+        :param username: Garmin Connect user name or email address.
+        :param password: Garmin Connect account password.
+        :param backup_dir: Destination directory for exported activities.
+        :param export_formats: The export formats to back up. Default:
+          :attr:`garminexport.backup.default_export_formats`.
+        """
+        self.name = name
+        self.username = username
+        self.password = password
+        self.backup_dir = backup_dir
+        self.export_formats = export_formats or default_export_formats
+        self.client = None
+        self.catalog = None
+        self.pending = deque()
+        self.in_flight = 0
+        self.downloaded = 0
+        self.failed = 0
+        self.error = None
+
+    def __repr__(self):
+        return "Account({!r})".format(self.name)
+
+
+def load_config(path):
+    """
+    Reads a multi-account configuration file (see the module docstring).
+    Passwords can be given inline (``password``) or, preferably, through an
+    environment variable (``password_env``).
+
+    :param path: Path to the JSON configuration file.
+    :type path: str
+    :return: The accounts and the global settings (``workers``, ``rate``
+      and ``burst``).
+    :rtype: tuple of (list of :class:`Account`, dict)
+    """
+    with open(path, mode="r") as f:
+        config = json.load(f)
+    accounts = []
+    for entry in config.get("accounts", []):
+        name = entry.get("name") or entry["username"]
+        password = entry.get("password")
+        if password is None and entry.get("password_env"):
+            password = os.getenv(entry["password_env"])
+            if password is None:
+                raise ValueError("account {}: environment variable {} is "
+                                 "not set".format(name, entry["password_env"]))
+        formats = entry.get("formats")
+        for export_format in formats or []:
+            if export_format not in export_formats:
+                raise ValueError("account {}: unknown export format: {}"
+                                 .format(name, export_format))
+        accounts.append(Account(
+            name, entry["username"], password,
+            entry.get("backup_dir") or os.path.join(".", "activities", name),
+            formats))
+    if not accounts:
+        raise ValueError("no accounts configured in {}".format(path))
+    settings = dict(workers=config.get("workers", DEFAULT_WORKERS),
+                    rate=config.get("rate"), burst=config.get("burst", 1))
+    return accounts, settings
+
+
+def _plan(account, retryer, rate_limiter, use_catalog):
+    if not os.path.isdir(account.backup_dir):
+        os.makedirs(account.backup_dir)
+    account.client = GarminClient(account.username, account.password,
+                                  rate_limiter=rate_limiter)
+    account.client.connect()
+    if use_catalog:
+        account.catalog = Catalog(
+            os.path.join(account.backup_dir, catalog_file))
+    activities = retryer.call(account.client.list_activities)
+    missing = garminexport.backup.need_backup(
+        activities, account.backup_dir, account.export_formats)
+    log.info("%s: %d of %d activities need to be backed up", account.name,
+             len(missing), len(activities))
+    account.pending.extend(sorted(missing, key=lambda a: a[1], reverse=True))
+
+
+def _download(account, activity, retryer, raw_json):
+    garminexport.backup.download(
+        account.client, activity, retryer, account.backup_dir,
+        account.export_formats, catalog=account.catalog, raw_json=raw_json)
+
+
+def _next_account(accounts, turn):
+    # the first account with pending work and no download in flight,
+    # starting the search at the account whose turn it is
+    for i in range(len(accounts)):
+        account = accounts[(turn + i) % len(accounts)]
+        if account.pending and not account.in_flight:
+            return account
+    return None
+
+
+def backup_accounts(accounts, retryer, workers=DEFAULT_WORKERS,
+                    rate_limiter=None, use_catalog=True, raw_json=False,
+                    ignore_errors=False):
+    """
+    Backs up several accounts concurrently on a shared pool of worker
+    threads. A failure to log in to or list an account, or (unless
+    ``ignore_errors`` is set) to download one of its activities, stops the
+    backup of that account only.
+
+    :param accounts: The accounts to back up.
+    :type accounts: list of :class:`Account`
+    :param retryer: A :class:`garminexport.retryer.Retryer` for listings
+      and downloads.
+    :param workers: Size of the shared worker pool. Every account has at
+      most one download in flight, so more workers than accounts only
+      speed up logging in to and listing the accounts.
+    :param rate_limiter: A rate limiter shared by all account clients.
+    :type rate_limiter: :class:`garminexport.ratelimit.RateLimiter`
+    :param use_catalog: Keep each backup directory's catalog up to date.
+    :param raw_json: Store json exports as returned by Garmin Connect.
+    :param ignore_errors: Keep backing up an account after a failed
+      activity download.
+    :return: The accounts, with their ``downloaded``, ``failed`` and
+      ``error`` attributes set.
+    :rtype: list of :class:`Account`
+    """
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            # log in to and list all accounts in parallel
+            planned = {executor.submit(_plan, account, retryer, rate_limiter,
+                                       use_catalog): account
+                       for account in accounts}
+            for future, account in planned.items():
+                try:
+                    future.result()
+                except Exception as e:
+                    log.error(u"%s: failed to plan backup: %s", account.name, e)
+                    account.error = e
+
+            in_flight = {}
+            turn = 0
+            while True:
+                while len(in_flight) < workers:
+                    account = _next_account(accounts, turn)
+                    if account is None:
+                        break
+                    turn = (accounts.index(account) + 1) % len(accounts)
+                    activity = account.pending.popleft()
+                    account.in_flight += 1
+                    in_flight[executor.submit(
+                        _download, account, activity, retryer,
+                        raw_json)] = (account, activity)
+                if not in_flight:
+                    break
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    account, activity = in_flight.pop(future)
+                    account.in_flight -= 1
+                    try:
+                        future.result()
+                        account.downloaded += 1
+                    except Exception as e:
+                        account.failed += 1
+                        log.error(u"%s: failed to back up activity %d: %s",
+                                  account.name, activity[0], e)
+                        if not ignore_errors:
+                            account.error = e
+                            account.pending.clear()
+    finally:
+        for account in accounts:
+            if account.client is not None:
+                account.client.disconnect()
+            if account.catalog is not None:
+                account.catalog.close()
+    return accounts
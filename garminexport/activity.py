@@ -0,0 +1,102 @@
+"""
+Module with the record type of the activities in an account's listing.
+
+An :class:`Activity` holds an activity's id and start time, and behaves as
+the `(id, starttime)` tuple that activities were represented by before: it
+can be indexed and unpacked, and it compares (and hashes) like the tuple.
+In addition, it caches the stem of its export file names (see
+:func:`garminexport.backup.export_filename`), which is otherwise formatted
+anew for every export format that an activity is checked for.
+
+Example of use:
+    activity = Activity(123456789, start)
+    activity_id, start = activity
+    activity.stem  # '2015-02-17T05:45:00+00:00_123456789'
+"""
+import operator
+import os
+
+
+def filename_stem(activity_id, start):
+    """
+    Returns the part of an activity's export file names that precedes the
+    export format suffix: ``<timestamp>_<activity_id>``.
+
+    :param activity_id: Activity identifier.
+    :type activity_id: int
+    :param start: The activity's start time.
+    :type start: :class:`datetime.datetime`
+    :rtype: str
+    """
+    stem = "{}_{}".format(start.isoformat(), activity_id)
+    return stem.replace(':', '_') if os.name == 'nt' else stem
+
+
+class Activity(object):
+    """
+    A listed activity: its id and (timezone-aware) start time.
+    """
+    __slots__ = ("id", "start", "_stem")
+
+    def __init__(self, id, start):
+        """
+        :param id: Activity identifier.
+        :type id: int
+        :param start: The activity's start time.
+        :type start: :class:`datetime.datetime`
+        """
+        self.id = id
+        self.start = start
+        self._stem = None
+
+    @property
+    def stem(self):
+        """The (cached) stem of the activity's export file names."""
+        if self._stem is None:
+            self._stem = filename_stem(self.id, self.start)
+        return self._stem
+
+    def __len__(self):
+        return 2
+
+    def __getitem__(self, index):
+        if index == 0 or index == -2:
+            return self.id
+        if index == 1 or index == -1:
+            return self.start
+        return (self.id, self.start)[index]
+
+    def __iter__(self):
+        yield self.id
+        yield self.start
+
+    def _compare(self, other, compare):
+        if isinstance(other, Activity):
+            other = (other.id, other.start)
+        elif not isinstance(other, tuple):
+            return NotImplemented
+        return compare((self.id, self.start), other)
+
+    def __eq__(self, other):
+        return self._compare(other, operator.eq)
+
+    def __ne__(self, other):
+        return self._compare(other, operator.ne)
+
+    def __lt__(self, other):
+        return self._compare(other, operator.lt)
+
+    def __le__(self, other):
+        return self._compare(other, operator.le)
+
+    def __gt__(self, other):
+        return self._compare(other, operator.gt)
+
+    def __ge__(self, other):
+        return self._compare(other, operator.ge)
+
+    def __hash__(self):
+        return hash((self.id, self.start))
+
+    def __repr__(self):
+        return "Activity({!r}, {!r})".format(self.id, self.start)
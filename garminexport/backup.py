@@ -2,26 +2,46 @@
 Module with methods useful when backing up activities.
 """
 import codecs
-import json
+from contextlib import contextmanager
 from datetime import datetime
-import dateutil.parser
 import logging
 import os
+from garminexport import jsonutil
+from garminexport.activity import filename_stem
+from garminexport.garminclient import NOT_MODIFIED
+from garminexport.metrics import registry
 
 log = logging.getLogger(__name__)
 
-export_formats=["json_summary", "json_details", "gpx", "tcx", "fit"]
+export_formats=["json_summary", "json_details", "gpx", "gpx_reduced", "tcx", "fit", "original"]
 """The range of supported export formats for activities."""
 
+default_export_formats=["json_summary", "json_details", "gpx", "tcx", "fit"]
+"""The export formats that are backed up unless told otherwise."""
+
 format_suffix = {
     "json_summary": "_summary.json",
     "json_details": "_details.json",
     "gpx": ".gpx",
+    "gpx_reduced": "_reduced.gpx",
     "tcx": ".tcx",
-    "fit": ".fit"
+    "fit": ".fit",
+    "original": "_original.zip"
 }
 """A table that maps export formats to their file format extensions."""
 
+bundle_formats = ["fit"]
+"""The export formats that are taken from an activity's ``original`` bundle
+(the zip archive of its uploaded files), when it has been backed up and
+holds a file of that format, instead of being requested separately. The
+``.fit`` export of an activity *is* its uploaded ``.fit`` file."""
+
+upload_formats = ["gpx", "tcx"]
+"""The export formats that are only taken from an activity's ``original``
+bundle on request (see the ``original_uploads`` keyword of
+:func:`download`): an uploaded ``.gpx``/``.tcx`` file is what the device or
+application wrote, not Garmin Connect's export of the activity."""
+
 
 not_found_file = ".not_found"
 """
@@ -41,7 +61,9 @@ def export_filename(activity, export_format):
       ``<timestamp>_<activity_id>_<suffix>``.
     For example: ``2015-02-17T05:45:00+00:00_123456789.tcx``
 
-    :param activity: An activity tuple `(id, starttime)`
+    :param activity: An activity tuple `(id, starttime)` (or an
+      :class:`garminexport.activity.Activity`, whose file name stem is
+      only formatted once)
     :type activity: tuple of `(int, datetime)`
     :param export_format: The export format (see :attr:`export_formats`)
     :type export_format: str
@@ -49,11 +71,10 @@ def export_filename(activity, export_format):
     :return: The file name to use for the exported activity.
     :rtype: str
     """
-    fn = "{time}_{id}{suffix}".format(
-        id=activity[0],
-        time=activity[1].isoformat(),
-        suffix=format_suffix[export_format])
-    return fn.replace(':','_') if os.name=='nt' else fn
+    stem = getattr(activity, "stem", None)
+    if stem is None:
+        stem = filename_stem(activity[0], activity[1])
+    return stem + format_suffix[export_format]
 
 
 def need_backup(activities, backup_dir, export_formats=None):
@@ -73,15 +94,32 @@ def need_backup(activities, backup_dir, export_formats=None):
     :return: All activities that need to be backed up.
     :rtype: set of tuples of `(int, datetime)`
     """
-    need_backup = set()
-    backed_up = os.listdir(backup_dir) + _not_found_activities(backup_dir)
+    return set(missing_exports(activities, backup_dir, export_formats))
+
+
+def missing_exports(activities, backup_dir, export_formats=None):
+    """
+    From a given set of activities, return the export formats that each
+    activity still needs to be backed up in (see :func:`need_backup`).
+
+    :param activities: A list of activity tuples `(id, starttime)`
+    :type activities: list of tuples of `(int, datetime)`
+    :param backup_dir: Destination directory for exported activities.
+    :type backup_dir: str
+    :return: The missing export formats of every activity that isn't fully
+      backed up, in the order of ``export_formats``.
+    :rtype: dict of tuple `(int, datetime)` to list of str
+    """
+    missing = {}
+    backed_up = set(os.listdir(backup_dir) + _not_found_activities(backup_dir))
 
     # get all activities missing at least one export format
     for activity in activities:
-        activity_files = [export_filename(activity, f) for f in export_formats]
-        if any(f not in backed_up for f in activity_files):
-            need_backup.add(activity)
-    return need_backup
+        formats = [f for f in export_formats
+                   if export_filename(activity, f) not in backed_up]
+        if formats:
+            missing[activity] = formats
+    return missing
 
 
 def _not_found_activities(backup_dir):
@@ -97,15 +135,100 @@ def _not_found_activities(backup_dir):
     return failed_activities
 
 
+def bundle_members(bundle_path, activity_id, export_formats):
+    """
+    Reads the files of given formats from an activity's ``original`` bundle.
 
-def download(client, activity, retryer, backup_dir, export_formats=None):
+    :param bundle_path: Path to the bundle (zip archive).
+    :type bundle_path: str
+    :param activity_id: Activity identifier.
+    :type activity_id: int
+    :param export_formats: Formats of :attr:`bundle_formats` or
+      :attr:`upload_formats`.
+    :type export_formats: list of str
+    :return: The contents of the file of every format, or :obj:`None` for
+      formats that the bundle holds no file of.
+    :rtype: dict
+    """
+    import zipfile
+    members = dict((f, None) for f in export_formats)
+    with zipfile.ZipFile(bundle_path, mode="r") as bundle:
+        for path in bundle.namelist():
+            fn, ext = os.path.splitext(path)
+            export_format = ext[1:].lower()
+            if fn == str(activity_id) and export_format in members and \
+                    members[export_format] is None:
+                members[export_format] = bundle.read(path)
+    return members
+
+
+def _bundled_exports(bundle_path, activity_id, export_formats,
+                     original_uploads=False):
+    # the files of the requested formats that the original bundle holds
+    import zipfile
+    formats = bundle_formats + (upload_formats if original_uploads else [])
+    wanted = [f for f in formats if f in export_formats or
+              (f == 'gpx' and 'gpx_reduced' in export_formats)]
+    if not wanted or not zipfile.is_zipfile(bundle_path):
+        return None
+    with _stage("bundle.extract", 'original'):
+        return bundle_members(bundle_path, activity_id, wanted)
+
+
+def _stage(stage, export_format):
+    return registry.timer(
+        "stage_duration_seconds", stage=stage, format=export_format)
+
+
+@contextmanager
+def _fetch_stage(client, export_format, *dests):
+    # requests are only made conditional (see GarminClient.validators) if
+    # the files they are written to exist: a NOT_MODIFIED answer would
+    # otherwise leave a missing file missing
+    with _stage("download.fetch", export_format):
+        if getattr(client, "validators", None) is not None and \
+                not all(os.path.exists(dest) for dest in dests):
+            with client.unconditional():
+                yield
+        else:
+            yield
+
+
+def _write_json(dest, document, export_format, raw=False):
+    # raw documents are the undecoded response bytes and are written as-is,
+    # others are pretty-printed
+    if raw:
+        content = document if document is not None else b"null"
+    else:
+        with _stage("json.encode", export_format):
+            content = jsonutil.dumps(document, indent=jsonutil.pretty_indent)
+    with _stage("disk.write", export_format):
+        with open(dest, mode="wb") as f:
+            f.write(content)
+
+
+def _write_text(dest, content, export_format):
+    # exports are decoded text, files taken from a bundle are written as-is
+    with _stage("disk.write", export_format):
+        if isinstance(content, bytes):
+            with open(dest, mode="wb") as f:
+                f.write(content)
+        else:
+            with codecs.open(dest, encoding="utf-8", mode="w") as f:
+                f.write(content)
+
+
+def download(client, activity, retryer, backup_dir, export_formats=None,
+             catalog=None, raw_json=False, original_uploads=False):
     """
     Exports a Garmin Connect activity to a given set of formats
     and saves the resulting file(s) to a given backup directory.
     In case a given format cannot be exported for the activity, the
     file name will be appended to the :attr:`not_found_file` in the
     backup directory (to prevent it from being retried on subsequent
-    backup runs).
+    backup runs). Exports that a client with ``validators`` reports as not
+    modified keep their existing file; exports whose file is missing are
+    requested unconditionally.
 
     :param client: A :class:`garminexport.garminclient.GarminClient`
       instance that is assumed to be connected.
@@ -118,61 +241,147 @@ def download(client, activity, retryer, backup_dir, export_formats=None):
     :param backup_dir: Backup directory path (assumed to exist already).
     :type backup_dir: str
     :keyword export_formats: Which format(s) to export to. Could be any
-      of: 'json_summary', 'json_details', 'gpx', 'tcx', 'fit'.
+      of: 'json_summary', 'json_details', 'gpx', 'gpx_reduced', 'tcx', 'fit',
+      'original'. The 'original' bundle is streamed to disk as is, and the
+      formats of :attr:`bundle_formats` are taken from it (if it has been
+      backed up) where it holds a file of their format.
     :type export_formats: list of str
+    :keyword catalog: If given, the activity summary is added to this
+      catalog when it is written to the backup directory.
+    :type catalog: :class:`garminexport.catalog.Catalog`
+    :keyword raw_json: If `True`, JSON exports are written exactly as
+      returned by Garmin Connect rather than being decoded and
+      pretty-printed.
+    :type raw_json: bool
+    :keyword original_uploads: If `True`, the formats of
+      :attr:`upload_formats` are taken from the 'original' bundle as well,
+      where it holds an uploaded file of their format.
+    :type original_uploads: bool
     """
     id = activity[0]
 
     if 'json_summary' in export_formats:
         log.debug("getting json summary for %s", id)
-
-        activity_summary = retryer.call(client.get_activity_summary, id)
         dest = os.path.join(
             backup_dir, export_filename(activity, 'json_summary'))
-        with codecs.open(dest, encoding="utf-8", mode="w") as f:
-            f.write(json.dumps(
-                activity_summary, ensure_ascii=False, indent=4))
+        with _fetch_stage(client, 'json_summary', dest):
+            activity_summary = retryer.call(
+                client.get_activity_summary, id, raw=raw_json)
+        if activity_summary is NOT_MODIFIED:
+            log.debug("json summary for %s is unchanged", id)
+        else:
+            _write_json(dest, activity_summary, 'json_summary', raw_json)
+        if catalog is not None and activity_summary is not None and \
+                activity_summary is not NOT_MODIFIED:
+            with _stage("catalog.add", 'json_summary'):
+                if raw_json:
+                    activity_summary = jsonutil.loads(activity_summary)
+                catalog.add(activity, activity_summary,
+                            os.path.basename(dest), os.path.getmtime(dest))
 
     if 'json_details' in export_formats:
         log.debug("getting json details for %s", id)
-        activity_details = retryer.call(client.get_activity_details, id)
         dest = os.path.join(
             backup_dir, export_filename(activity, 'json_details'))
-        with codecs.open(dest, encoding="utf-8", mode="w") as f:
-            f.write(json.dumps(
-                activity_details, ensure_ascii=False, indent=4))
+        with _fetch_stage(client, 'json_details', dest):
+            activity_details = retryer.call(
+                client.get_activity_details, id, raw=raw_json)
+        if activity_details is NOT_MODIFIED:
+            log.debug("json details for %s are unchanged", id)
+        else:
+            _write_json(dest, activity_details, 'json_details', raw_json)
 
     not_found_path = os.path.join(backup_dir, not_found_file)
+    bundle_path = os.path.join(backup_dir, export_filename(activity, 'original'))
     with open(not_found_path, mode="a") as not_found:
+        if 'original' in export_formats:
+            log.debug("getting original bundle for %s", id)
+            with _fetch_stage(client, 'original', bundle_path):
+                original = retryer.call(
+                    client.download_original_activity, id, bundle_path)
+            if original is None:
+                not_found.write(os.path.basename(bundle_path) + "\n")
+            elif original is NOT_MODIFIED:
+                log.debug("original bundle for %s is unchanged", id)
+
+        # files of the original bundle (from this or an earlier run) are
+        # not downloaded again through the export endpoints
+        bundled = _bundled_exports(
+            bundle_path, id, export_formats, original_uploads) or {}
+
+        if 'gpx' in export_formats or 'gpx_reduced' in export_formats:
+            gpx_path = os.path.join(
+                backup_dir, export_filename(activity, 'gpx'))
+            if bundled.get('gpx') is not None:
+                activity_gpx = bundled['gpx']
+            elif 'gpx' not in export_formats and os.path.exists(gpx_path):
+                # the reduced gpx is derived from the backed up gpx (which a
+                # job of its own has usually just written) if there is one
+                with _stage("disk.read", 'gpx_reduced'):
+                    with open(gpx_path, mode="rb") as f:
+                        activity_gpx = f.read()
+            else:
+                log.debug("getting gpx for %s", id)
+                dests = [os.path.join(backup_dir, export_filename(activity, f))
+                         for f in ('gpx', 'gpx_reduced') if f in export_formats]
+                with _fetch_stage(client, 'gpx', *dests):
+                    activity_gpx = retryer.call(client.get_activity_gpx, id)
+
         if 'gpx' in export_formats:
-            log.debug("getting gpx for %s", id)
-            activity_gpx = retryer.call(client.get_activity_gpx, id)
+            dest = gpx_path
+            if activity_gpx is None:
+                not_found.write(os.path.basename(dest) + "\n")
+            elif activity_gpx is NOT_MODIFIED:
+                log.debug("gpx for %s is unchanged", id)
+            else:
+                _write_text(dest, activity_gpx, 'gpx')
+
+        if 'gpx_reduced' in export_formats:
+            from garminexport.track import reduce_gpx
             dest = os.path.join(
-                backup_dir, export_filename(activity, 'gpx'))
+                backup_dir, export_filename(activity, 'gpx_reduced'))
             if activity_gpx is None:
                 not_found.write(os.path.basename(dest) + "\n")
+            elif activity_gpx is NOT_MODIFIED:
+                log.debug("reduced gpx for %s is unchanged", id)
             else:
-                with codecs.open(dest, encoding="utf-8", mode="w") as f:
-                    f.write(activity_gpx)
+                with _stage("track.reduce", 'gpx_reduced'):
+                    reduced_gpx = reduce_gpx(activity_gpx)
+                _write_text(dest, reduced_gpx, 'gpx_reduced')
 
         if 'tcx' in export_formats:
-            log.debug("getting tcx for %s", id)
-            activity_tcx = retryer.call(client.get_activity_tcx, id)
             dest = os.path.join(
                 backup_dir, export_filename(activity, 'tcx'))
+            if bundled.get('tcx') is not None:
+                activity_tcx = bundled['tcx']
+            else:
+                log.debug("getting tcx for %s", id)
+                with _fetch_stage(client, 'tcx', dest):
+                    activity_tcx = retryer.call(client.get_activity_tcx, id)
             if activity_tcx is None:
                 not_found.write(os.path.basename(dest) + "\n")
+            elif activity_tcx is NOT_MODIFIED:
+                log.debug("tcx for %s is unchanged", id)
             else:
-                with codecs.open(dest, encoding="utf-8", mode="w") as f:
-                    f.write(activity_tcx)
+                _write_text(dest, activity_tcx, 'tcx')
 
         if 'fit' in export_formats:
-            log.debug("getting fit for %s", id)
-            activity_fit = retryer.call(client.get_activity_fit, id)
             dest = os.path.join(
                 backup_dir, export_filename(activity, 'fit'))
+            if 'fit' in bundled:
+                # the .fit export *is* the bundle's .fit file, if it has one
+                activity_fit = bundled['fit']
+            elif 'original' in export_formats and original is None:
+                activity_fit = None
+            else:
+                log.debug("getting fit for %s", id)
+                with _fetch_stage(client, 'fit', dest):
+                    activity_fit = retryer.call(client.get_activity_fit, id)
             if activity_fit is None:
                 not_found.write(os.path.basename(dest) + "\n")
+            elif activity_fit is NOT_MODIFIED:
+                log.debug("fit for %s is unchanged", id)
             else:
-                with open(dest, mode="wb") as f:
-                    f.write(activity_fit)
+                with _stage("disk.write", 'fit'):
+                    with open(dest, mode="wb") as f:
+                        f.write(activity_fit)
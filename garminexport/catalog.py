@@ -0,0 +1,315 @@
+"""
+Module that maintains a local, queryable index over the activity summaries
+stored in a backup directory.
+
+The catalog is a SQLite database (by default stored as :attr:`catalog_file`
+in the backup directory) that holds a handful of per-activity summary fields
+(activity type, start time, distance, duration, heart rate and bounding box).
+It is updated incrementally, either as :func:`garminexport.backup.download`
+writes ``_summary.json`` files or by scanning the backup directory for
+summary files that are new or have changed since the last scan.
+"""
+import calendar
+import json
+import logging
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+log = logging.getLogger(__name__)
+
+catalog_file = ".catalog.sqlite"
+"""Default name of the catalog database within a backup directory."""
+
+summary_suffix = "_summary.json"
+"""File name suffix of the activity summaries that get indexed."""
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS activities (
+    id INTEGER PRIMARY KEY,
+    start_time INTEGER,
+    start_time_gmt TEXT,
+    name TEXT,
+    activity_type TEXT,
+    distance REAL,
+    duration REAL,
+    average_hr REAL,
+    max_hr REAL,
+    min_lat REAL,
+    min_lon REAL,
+    max_lat REAL,
+    max_lon REAL
+);
+CREATE INDEX IF NOT EXISTS activities_start_time ON activities(start_time);
+CREATE INDEX IF NOT EXISTS activities_type_start_time
+    ON activities(activity_type, start_time);
+CREATE TABLE IF NOT EXISTS sources (
+    filename TEXT PRIMARY KEY,
+    mtime REAL NOT NULL
+);
+"""
+
+_COLUMNS = ("id", "start_time", "start_time_gmt", "name", "activity_type",
+            "distance", "duration", "average_hr", "max_hr",
+            "min_lat", "min_lon", "max_lat", "max_lon")
+
+
+def _epoch_seconds(timestamp):
+    """Converts a (naive UTC or tz-aware) datetime to epoch seconds."""
+    if timestamp is None:
+        return None
+    return calendar.timegm(timestamp.utctimetuple())
+
+
+def _parse_gmt(value):
+    """Parses a Garmin ``startTimeGMT`` string (e.g. ``2019-03-01 06:30:00``
+    or ``2019-03-01T06:30:00.0``) into a naive UTC datetime."""
+    if not value:
+        return None
+    value = value.replace("T", " ").split(".")[0]
+    return datetime.strptime(value, "%Y-%m-%d %H:%M:%S")
+
+
+def _activity_id(filename):
+    """Returns the activity id of a summary file name
+    (``<timestamp>_<activity_id>_summary.json``)."""
+    return int(filename[:-len(summary_suffix)].rsplit("_", 1)[1])
+
+
+def _bounding_box(points):
+    """Returns ``(min_lat, min_lon, max_lat, max_lon)`` for a sequence of
+    ``(lat, lon)`` points, skipping points with missing coordinates."""
+    points = [(lat, lon) for lat, lon in points
+              if lat is not None and lon is not None]
+    if not points:
+        return (None, None, None, None)
+    lats = [lat for lat, _ in points]
+    lons = [lon for _, lon in points]
+    return (min(lats), min(lons), max(lats), max(lons))
+
+
+def summary_fields(activity_id, summary):
+    """
+    Extracts the indexed fields from an activity summary as returned by
+    :meth:`garminexport.garminclient.GarminClient.get_activity_summary`.
+
+    The bounding box is derived from the start and end coordinates of the
+    activity, which are the only positions available in the summary.
+
+    :param activity_id: Activity identifier.
+    :type activity_id: int
+    :param summary: The activity summary as a JSON dict.
+    :type summary: dict
+    :return: A dict keyed on the catalog column names.
+    :rtype: dict
+    """
+    dto = summary.get("summaryDTO") or {}
+    activity_type = (summary.get("activityTypeDTO") or {}).get("typeKey")
+    start = _parse_gmt(dto.get("startTimeGMT"))
+    bbox = _bounding_box([
+        (dto.get("startLatitude"), dto.get("startLongitude")),
+        (dto.get("endLatitude"), dto.get("endLongitude"))])
+    return {
+        "id": int(activity_id),
+        "start_time": _epoch_seconds(start),
+        "start_time_gmt": start.isoformat() if start else None,
+        "name": summary.get("activityName"),
+        "activity_type": activity_type,
+        "distance": dto.get("distance"),
+        "duration": dto.get("duration"),
+        "average_hr": dto.get("averageHR"),
+        "max_hr": dto.get("maxHR"),
+        "min_lat": bbox[0],
+        "min_lon": bbox[1],
+        "max_lat": bbox[2],
+        "max_lon": bbox[3],
+    }
+
+
+class Catalog(object):
+    """
+    A SQLite-backed index of activity summary fields.
+
+    Example of use:
+        with Catalog("activities/.catalog.sqlite") as catalog:
+            catalog.update("activities")
+            runs = catalog.query(activity_type="running", min_distance=10000)
+    """
+
+    def __init__(self, path):
+        """
+        Opens (and, if necessary, creates) a catalog database.
+
+        :param path: Path to the catalog database file.
+        :type path: str
+        """
+        self.path = path
+        # the catalog may be shared by concurrent downloads, which take
+        # turns through the lock
+        self._lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.executescript(_SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        if self.connection:
+            self.connection.close()
+            self.connection = None
+
+    def add(self, activity, summary, filename=None, mtime=None):
+        """
+        Adds (or replaces) the catalog entry for an activity.
+
+        :param activity: An activity tuple `(id, starttime)`
+        :type activity: tuple of `(int, datetime)`
+        :param summary: The activity summary as a JSON dict.
+        :type summary: dict
+        :param filename: Name of the summary file that the entry was read
+          from. If given, the file is marked as indexed.
+        :type filename: str
+        :param mtime: Modification time of ``filename``.
+        :type mtime: float
+        """
+        with self._lock:
+            self._add(activity, summary, filename, mtime)
+            self.connection.commit()
+
+    def _add(self, activity, summary, filename=None, mtime=None):
+        fields = summary_fields(activity[0], summary)
+        if fields["start_time"] is None and activity[1] is not None:
+            fields["start_time"] = _epoch_seconds(activity[1])
+            fields["start_time_gmt"] = activity[1].isoformat()
+        self.connection.execute(
+            "INSERT OR REPLACE INTO activities ({}) VALUES ({})".format(
+                ", ".join(_COLUMNS), ", ".join("?" for _ in _COLUMNS)),
+            [fields[column] for column in _COLUMNS])
+        if filename is not None:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO sources (filename, mtime) "
+                "VALUES (?, ?)", (filename, mtime or 0.0))
+
+    def update(self, backup_dir):
+        """
+        Indexes all summary files in a backup directory that are new or have
+        been modified since they were last indexed, and removes the entries
+        of indexed summary files that have since been deleted. Summary files
+        that cannot be read or are not a JSON object are skipped.
+
+        :param backup_dir: Backup directory to scan.
+        :type backup_dir: str
+        :return: The number of (re)indexed summary files.
+        :rtype: int
+        """
+        with self._lock:
+            indexed = dict(self.connection.execute(
+                "SELECT filename, mtime FROM sources"))
+        updated = 0
+        for entry in os.scandir(backup_dir):
+            if not entry.name.endswith(summary_suffix):
+                continue
+            # what is left of indexed after the scan has been deleted
+            indexed_mtime = indexed.pop(entry.name, None)
+            try:
+                mtime = entry.stat().st_mtime
+                if mtime == indexed_mtime:
+                    continue
+                activity_id = _activity_id(entry.name)
+                with open(entry.path, mode="rb") as f:
+                    summary = json.loads(f.read().decode("utf-8"))
+                if not isinstance(summary, dict):
+                    raise ValueError("not a JSON object")
+            except (IndexError, ValueError, OSError) as e:
+                log.warning("skipping unreadable summary %s: %s",
+                            entry.name, e)
+                continue
+            with self._lock:
+                self._add((activity_id, None), summary, entry.name, mtime)
+            updated += 1
+        with self._lock:
+            self._remove(indexed)
+            self.connection.commit()
+        log.debug("indexed %d summary file(s) in %s, removed %d",
+                  updated, backup_dir, len(indexed))
+        return updated
+
+    def _remove(self, filenames):
+        # drops the entries of deleted summary files
+        for filename in filenames:
+            try:
+                self.connection.execute(
+                    "DELETE FROM activities WHERE id = ?",
+                    (_activity_id(filename),))
+            except (IndexError, ValueError):
+                pass
+            self.connection.execute(
+                "DELETE FROM sources WHERE filename = ?", (filename,))
+
+    def query(self, activity_type=None, start=None, end=None,
+              min_distance=None, max_distance=None, min_duration=None,
+              max_duration=None, bbox=None, limit=None):
+        """
+        Returns the catalog entries that match all given criteria, ordered
+        by start time (most recent first).
+
+        :param activity_type: Activity type key (e.g. ``running``).
+        :type activity_type: str
+        :param start: Earliest start time (inclusive).
+        :type start: datetime
+        :param end: Latest start time (exclusive).
+        :type end: datetime
+        :param min_distance: Minimum distance in meters.
+        :type min_distance: float
+        :param max_distance: Maximum distance in meters.
+        :type max_distance: float
+        :param min_duration: Minimum duration in seconds.
+        :type min_duration: float
+        :param max_duration: Maximum duration in seconds.
+        :type max_duration: float
+        :param bbox: Only include activities whose bounding box intersects
+          this `(min_lat, min_lon, max_lat, max_lon)` box.
+        :type bbox: tuple of float
+        :param limit: Maximum number of entries to return.
+        :type limit: int
+        :return: The matching entries as dicts keyed on column name.
+        :rtype: list of dict
+        """
+        clauses = []
+        params = []
+        if activity_type is not None:
+            clauses.append("activity_type = ?")
+            params.append(activity_type)
+        if start is not None:
+            clauses.append("start_time >= ?")
+            params.append(_epoch_seconds(start))
+        if end is not None:
+            clauses.append("start_time < ?")
+            params.append(_epoch_seconds(end))
+        for column, op, value in (("distance", ">=", min_distance),
+                                  ("distance", "<=", max_distance),
+                                  ("duration", ">=", min_duration),
+                                  ("duration", "<=", max_duration)):
+            if value is not None:
+                clauses.append("{} {} ?".format(column, op))
+                params.append(value)
+        if bbox is not None:
+            min_lat, min_lon, max_lat, max_lon = bbox
+            clauses.append("max_lat >= ? AND min_lat <= ? AND "
+                           "max_lon >= ? AND min_lon <= ?")
+            params.extend([min_lat, max_lat, min_lon, max_lon])
+        sql = "SELECT * FROM activities"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY start_time DESC"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        with self._lock:
+            return [dict(row)
+                    for row in self.connection.execute(sql, params)]
@@ -0,0 +1,190 @@
+"""
+Module that detects activities that were edited on Garmin Connect (renamed,
+retyped, cropped, ...) after they were backed up, without downloading them.
+
+Every entry of the activity listing is reduced to a fingerprint: a hash of
+the list-level summary fields that such edits change. The fingerprint of
+the backed up state of every activity is kept in a :class:`ChangeStore`
+(by default :attr:`changes_file` in the backup directory), alongside the
+fingerprint last seen in a listing, so that the activities whose server
+state changed can be told apart and re-exported.
+
+The store also keeps the HTTP validators (``ETag``/``Last-Modified``) of
+downloaded exports. Assigned to a client's ``validators``, it makes the
+re-export of a changed activity conditional, so that exports that did not
+change with the edit (such as the original ``.fit`` file of a renamed
+activity) are not transferred again where the server supports it.
+"""
+import hashlib
+import json
+import logging
+import sqlite3
+import time
+
+from garminexport.activity import Activity
+from garminexport.timeutil import parse_utc_timestamp
+
+log = logging.getLogger(__name__)
+
+changes_file = ".changes.sqlite"
+"""The default name of the change store database in the backup directory."""
+
+FINGERPRINT_FIELDS = (
+    "activityName", "description", "activityType", "eventType",
+    "startTimeGMT", "distance", "duration", "elapsedDuration",
+    "movingDuration", "elevationGain", "elevationLoss", "calories",
+    "averageHR", "maxHR", "averageSpeed", "locationName", "privacy",
+    "lastUpdateDate", "updateDate")
+"""The activity list fields that an activity's fingerprint covers."""
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS fingerprints (
+    activity_id INTEGER PRIMARY KEY,
+    backed_up TEXT,
+    listed TEXT NOT NULL,
+    updated REAL
+);
+CREATE TABLE IF NOT EXISTS validators (
+    url TEXT PRIMARY KEY,
+    etag TEXT,
+    last_modified TEXT
+);
+"""
+
+
+def fingerprint(entry):
+    """
+    Returns the fingerprint of an activity list entry (see
+    :meth:`garminexport.garminclient.GarminClient.iter_activity_entries`).
+
+    :param entry: An activity list entry.
+    :type entry: dict
+    :rtype: str
+    """
+    fields = {}
+    for field in FINGERPRINT_FIELDS:
+        value = entry.get(field)
+        if isinstance(value, dict):
+            # type and privacy DTOs: only their keys are meaningful
+            value = value.get("typeKey", value)
+        fields[field] = value
+    return hashlib.sha1(json.dumps(
+        fields, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class ChangeStore(object):
+    """
+    A SQLite-backed store of activity fingerprints and HTTP validators.
+    """
+
+    def __init__(self, path):
+        """
+        Opens (and, if necessary, creates) a change store database.
+
+        :param path: Path to the database file.
+        :type path: str
+        """
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript(_SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        if self.connection:
+            self.connection.close()
+            self.connection = None
+
+    def record_listing(self, fingerprints):
+        """
+        Records the fingerprints seen in an activity listing. An activity
+        that is new to the store takes its listed fingerprint as its backed
+        up state (a backup of it is either present or about to be made).
+
+        :param fingerprints: Pairs of activity id and fingerprint.
+        :type fingerprints: iterable of tuple `(int, str)`
+        """
+        now = time.time()
+        with self.connection:
+            self.connection.executemany(
+                "INSERT INTO fingerprints (activity_id, backed_up, listed, "
+                "updated) VALUES (?, ?, ?, ?) ON CONFLICT (activity_id) DO "
+                "UPDATE SET listed = excluded.listed, updated = excluded.updated",
+                [(activity_id, value, value, now)
+                 for activity_id, value in fingerprints])
+
+    def changed(self, activity_ids=None):
+        """
+        Returns the ids of the activities whose listed fingerprint differs
+        from the fingerprint of their backed up state.
+
+        :param activity_ids: If given, only these activities are checked.
+        :type activity_ids: list of int
+        :rtype: set of int
+        """
+        sql = "SELECT activity_id FROM fingerprints WHERE backed_up != listed"
+        if activity_ids is None:
+            return set(row[0] for row in self.connection.execute(sql))
+        activity_ids = list(activity_ids)
+        if not activity_ids:
+            return set()
+        return set(row[0] for row in self.connection.execute(
+            sql + " AND activity_id IN ({})".format(
+                ",".join("?" * len(activity_ids))), activity_ids))
+
+    def accept(self, activity_ids):
+        """Marks the listed state of activities as backed up."""
+        with self.connection:
+            self.connection.executemany(
+                "UPDATE fingerprints SET backed_up = listed "
+                "WHERE activity_id = ?", [(i,) for i in activity_ids])
+
+    def get(self, url, default=None):
+        """Returns the `(etag, last_modified)` validators of a URL."""
+        row = self.connection.execute(
+            "SELECT etag, last_modified FROM validators WHERE url = ?",
+            (url,)).fetchone()
+        return tuple(row) if row else default
+
+    def __setitem__(self, url, validators):
+        with self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO validators (url, etag, last_modified) "
+                "VALUES (?, ?, ?)", (url,) + tuple(validators))
+
+
+def fingerprinted_activities(client, store, start_index=0, batch_size=100):
+    """
+    Lists the activities of an account, most recent first, and records the
+    fingerprint of every listed activity in a change store along the way.
+    An activity's fingerprint is recorded before the activity is yielded, so
+    that the store can tell whether it has changed as it is listed.
+
+    :param client: A connected :class:`GarminClient`.
+    :param store: The store to record fingerprints in.
+    :type store: :class:`ChangeStore`
+    :param start_index: The index of the first activity to list.
+    :rtype: generator of :class:`garminexport.activity.Activity`
+    """
+    batch = []
+    for entry in client.iter_activity_entries(batch_size, start_index):
+        batch.append(entry)
+        if len(batch) >= batch_size:
+            for activity in _recorded(store, batch):
+                yield activity
+            batch = []
+    for activity in _recorded(store, batch):
+        yield activity
+
+
+def _recorded(store, entries):
+    # records the fingerprints of a batch of listed entries
+    store.record_listing(
+        [(int(entry["activityId"]), fingerprint(entry)) for entry in entries])
+    return [Activity(int(entry["activityId"]),
+                     parse_utc_timestamp(entry["startTimeGMT"]))
+            for entry in entries]
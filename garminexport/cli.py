@@ -0,0 +1,62 @@
+"""
+The ``garminexport`` program, which runs the garminexport commands (see
+:mod:`garminexport.commands`) as subcommands::
+
+    garminexport backup --backup-dir=activities <username>
+    garminexport get-data <username> <user>
+    garminexport <command> --help
+
+Only the module of the command that is run is imported, so that, for
+example, ``garminexport catalog`` does not pay for the HTTP stack.
+"""
+import argparse
+import importlib
+import sys
+
+from garminexport import commands
+
+COMMANDS = [
+    ("backup", "backup", "Incremental backup of an account's activities."),
+    ("get-activity", "get_activity", "Download a single activity."),
+    ("get-data", "get_data", "Store daily wellness data in the database."),
+    ("upload", "upload", "Upload activity files."),
+    ("sync", "sync", "Keep a backup directory in sync (daemon)."),
+    ("accounts", "accounts", "Back up several accounts in one process."),
+    ("catalog", "catalog", "Query the activity catalog of a backup directory."),
+    ("tiles", "tiles", "Find activities that passed through an area."),
+]
+"""The subcommands: name, module (in :mod:`garminexport.commands`) and
+summary."""
+
+
+def main(argv=None):
+    """
+    Runs the subcommand named by the first command-line argument.
+
+    :param argv: Command-line arguments. Default: ``sys.argv[1:]``.
+    :type argv: list of str
+    """
+    argv = sys.argv[1:] if argv is None else argv
+    modules = dict((name, module) for name, module, _ in COMMANDS)
+    parser = argparse.ArgumentParser(
+        prog="garminexport",
+        description="Backs up Garmin Connect accounts.",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="commands:\n" + "\n".join(
+            "  {:<14}{}".format(name, summary)
+            for name, _, summary in COMMANDS))
+    parser.add_argument(
+        "command", metavar="<command>", choices=sorted(modules),
+        help="The command to run (see below).")
+    parser.add_argument(
+        "args", metavar="...", nargs=argparse.REMAINDER,
+        help="Arguments of the command (see garminexport <command> --help).")
+    # only the command name is parsed here, the command parses the rest
+    args = parser.parse_args(argv[:1])
+    command = importlib.import_module(
+        "garminexport.commands." + modules[args.command])
+    commands.main(command, argv[1:], prog="garminexport " + args.command)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+The command-line programs of garminexport.
+
+Every command is a module with a ``description``, an
+``add_arguments(parser)`` function that declares its command-line arguments
+and a ``run(args)`` function that carries it out (checks of combinations of
+arguments go in an optional ``check_arguments(parser, args)`` function). A
+command can be run as a subcommand of the ``garminexport`` program (see
+:mod:`garminexport.cli`) or on its own through :func:`main` (as the
+``garminbackup.py``, ... scripts do).
+
+Startup time matters for programs that are run from cron every few minutes,
+so command modules keep their module-level imports light: the HTTP stack
+(``requests``), the database driver (``pymysql``), ``dateutil`` and numpy
+are only imported when they are first used.
+"""
+import argparse
+import logging
+import sys
+
+LOG_LEVELS = {
+    "DEBUG": logging.DEBUG,
+    "INFO": logging.INFO,
+    "WARNING": logging.WARNING,
+    "ERROR": logging.ERROR
+}
+"""Command-line (string-based) log-level mapping to logging module levels."""
+
+LOG_FORMAT = "%(asctime)-15s [%(levelname)s] %(message)s"
+"""The default log line format (a command may define its own ``log_format``)."""
+
+DEFAULT_MAX_RETRIES = 7
+"""The default maximum number of retries to make when fetching a single activity."""
+
+
+def add_log_level_argument(parser):
+    """Adds the ``--log-level`` option to a command-line parser."""
+    parser.add_argument(
+        "--log-level", metavar="LEVEL", type=str,
+        help=("Desired log output level (DEBUG, INFO, WARNING, ERROR). "
+              "Default: INFO."), default="INFO")
+
+
+def build_parser(command, prog=None):
+    """
+    Creates the command-line parser of a command.
+
+    :param command: A command module.
+    :param prog: The program name to show in usage messages.
+    :type prog: str
+    :rtype: :class:`argparse.ArgumentParser`
+    """
+    parser = argparse.ArgumentParser(prog=prog, description=command.description)
+    command.add_arguments(parser)
+    return parser
+
+
+def main(command, argv=None, prog=None):
+    """
+    Parses the command line of a command, sets up logging and runs the
+    command. Exits with the status returned by the command's ``run``.
+
+    :param command: A command module.
+    :param argv: Command-line arguments. Default: ``sys.argv[1:]``.
+    :type argv: list of str
+    :param prog: The program name to show in usage messages.
+    :type prog: str
+    """
+    parser = build_parser(command, prog)
+    args = parser.parse_args(argv)
+    if hasattr(command, "check_arguments"):
+        command.check_arguments(parser, args)
+    if not args.log_level in LOG_LEVELS:
+        raise ValueError("Illegal log-level: {}".format(args.log_level))
+    logging.basicConfig(
+        level=logging.INFO,
+        format=getattr(command, "log_format", LOG_FORMAT))
+    logging.root.setLevel(LOG_LEVELS[args.log_level])
+    sys.exit(command.run(args))
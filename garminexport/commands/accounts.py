@@ -0,0 +1,87 @@
+"""
+Performs incremental backups of several Garmin Connect accounts in one
+process. The accounts, their backup directories and the shared worker pool
+size and request rate limit are read from a JSON configuration file (see
+:mod:`garminexport.accounts`).
+"""
+from datetime import timedelta
+import logging
+
+from garminexport import metrics
+from garminexport.commands import DEFAULT_MAX_RETRIES, add_log_level_argument
+
+log = logging.getLogger(__name__)
+
+log_format = "%(asctime)-15s [%(levelname)s] %(threadName)s %(message)s"
+
+description = (
+    "Performs incremental backups of several Garmin Connect "
+    "accounts in one process, sharing a worker pool and request "
+    "rate limit between them.")
+
+
+def add_arguments(parser):
+    # positional args
+    parser.add_argument(
+        "config", metavar="<config>", type=str,
+        help="JSON file listing the accounts to back up.")
+    # optional args
+    parser.add_argument(
+        "-W", "--workers", metavar="NUM", type=int,
+        help="Size of the shared worker pool. Overrides the config file.")
+    parser.add_argument(
+        "--rate", metavar="REQ/S", type=float,
+        help=("Maximum number of requests per second, over all accounts. "
+              "Overrides the config file."))
+    add_log_level_argument(parser)
+    parser.add_argument(
+        "-E", "--ignore-errors", action='store_true',
+        help="Keep backing up an account after a failed activity. Default: FALSE")
+    parser.add_argument(
+        "--max-retries", metavar="NUM", default=DEFAULT_MAX_RETRIES,
+        type=int, help="The maximum number of retries to make on failed attempts to fetch an activity. DEFAULT: %d" % DEFAULT_MAX_RETRIES)
+    parser.add_argument(
+        "--raw-json", action='store_true',
+        help=("Store json_summary/json_details exports exactly as returned "
+              "by Garmin Connect. Default: FALSE"))
+    parser.add_argument(
+        "--no-catalog", action='store_true',
+        help="Do not update the activity catalogs. Default: FALSE")
+    metrics.add_arguments(parser)
+
+
+def run(args):
+    from garminexport.accounts import backup_accounts, load_config
+    from garminexport.ratelimit import RateLimiter
+    from garminexport.retryer import (
+        Retryer, ExponentialBackoffDelayStrategy, MaxRetriesStopStrategy)
+
+    failed = False
+    try:
+        accounts, settings = load_config(args.config)
+        workers = args.workers or settings["workers"]
+        rate = args.rate or settings["rate"]
+        rate_limiter = RateLimiter(rate, settings["burst"]) if rate else None
+        log.info("backing up %d account(s) with %d worker(s) ...",
+                 len(accounts), workers)
+
+        retryer = Retryer(
+            delay_strategy=ExponentialBackoffDelayStrategy(
+                initial_delay=timedelta(seconds=1)),
+            stop_strategy=MaxRetriesStopStrategy(args.max_retries))
+        backup_accounts(
+            accounts, retryer, workers=workers, rate_limiter=rate_limiter,
+            use_catalog=not args.no_catalog, raw_json=args.raw_json,
+            ignore_errors=args.ignore_errors)
+        for account in accounts:
+            log.info("%s: %d activities backed up, %d failed%s", account.name,
+                     account.downloaded, account.failed,
+                     " (stopped: {})".format(account.error)
+                     if account.error else "")
+            failed = failed or account.error is not None
+    except Exception as e:
+        log.error(u"failed with exception: %s", e)
+        failed = True
+    finally:
+        metrics.report(args, log)
+    return 1 if failed else 0
@@ -0,0 +1,251 @@
+"""
+Performs (incremental) backups of activities for a given Garmin Connect
+account.
+The activities are stored in a local directory on the user's computer.
+The backups are incremental, meaning that only activities that aren't already
+stored in the backup directory will be downloaded.
+"""
+from datetime import timedelta
+import getpass
+import logging
+import os
+
+from garminexport import metrics
+from garminexport.backup import export_formats, default_export_formats
+from garminexport.catalog import catalog_file
+from garminexport.changes import changes_file
+from garminexport.commands import DEFAULT_MAX_RETRIES, add_log_level_argument
+from garminexport.journal import journal_file, orders
+from garminexport.scheduler import default_format_priority, parse_format_priority
+from garminexport.spatial import tiles_file
+
+log = logging.getLogger(__name__)
+
+description = (
+    "Performs incremental backups of activities for a "
+    "given Garmin Connect account. Only activities that "
+    "aren't already stored in the backup directory will "
+    "be downloaded.")
+
+
+def add_arguments(parser):
+    # positional args
+    parser.add_argument(
+        "username", metavar="<username>", type=str, help="Account user name.")
+    # optional args
+    parser.add_argument(
+        "--password", type=str, help="Account password.")
+    parser.add_argument(
+        "--backup-dir", metavar="DIR", type=str,
+        help=("Destination directory for downloaded activities. Default: "
+              "./activities/"), default=os.path.join(".", "activities"))
+    add_log_level_argument(parser)
+    parser.add_argument(
+        "-f", "--format", choices=export_formats,
+        default=None, action='append',
+        help=("Desired output formats ("+', '.join(export_formats)+"). "
+              "Default: "+', '.join(default_export_formats)+"."))
+    parser.add_argument(
+        "-E", "--ignore-errors", action='store_true',
+        help="Ignore errors and keep going. Default: FALSE")
+    parser.add_argument(
+        "--max-retries", metavar="NUM", default=DEFAULT_MAX_RETRIES,
+        type=int, help="The maximum number of retries to make on failed attempts to fetch an activity. Exponential backoff will be used, meaning that the delay between successive attempts will double with every retry, starting at one second. DEFAULT: %d" % DEFAULT_MAX_RETRIES)
+    parser.add_argument(
+        "--order", choices=orders, default="newest",
+        help=("Back up the newest or the oldest activities first. "
+              "Default: newest"))
+    parser.add_argument(
+        "--format-priority", metavar="FORMATS", type=parse_format_priority,
+        default=default_format_priority,
+        help=("Comma-separated export formats in the order in which they "
+              "are backed up (over all activities). Unlisted formats follow "
+              "in their default order. Default: " +
+              ",".join(default_format_priority)))
+    parser.add_argument(
+        "--time-budget", metavar="MINUTES", type=float,
+        help=("Stop starting new downloads when they are not expected to "
+              "finish within MINUTES from the start of the run. The "
+              "remaining work is resumed by the next run."))
+    parser.add_argument(
+        "--no-journal", action='store_true',
+        help=("Do not keep a journal (%s) of the run's progress in the "
+              "backup directory. Without it, an interrupted run has to list "
+              "and compare all activities again. Default: FALSE" %
+              journal_file))
+    parser.add_argument(
+        "--replan", action='store_true',
+        help=("Discard the work planned by an interrupted run and plan "
+              "anew. Default: FALSE"))
+    parser.add_argument(
+        "--detect-changes", action='store_true',
+        help=("Re-export activities that were edited on Garmin Connect "
+              "since they were backed up, as detected from the activity "
+              "listing (see %s in the backup directory). Unchanged exports "
+              "are skipped by conditional requests where the server "
+              "supports them. Default: FALSE" % changes_file))
+    parser.add_argument(
+        "--raw-json", action='store_true',
+        help=("Store json_summary/json_details exports exactly as returned "
+              "by Garmin Connect instead of pretty-printing them. "
+              "Default: FALSE"))
+    parser.add_argument(
+        "--original-uploads", action='store_true',
+        help=("Take gpx/tcx exports from the backed up 'original' bundle "
+              "where it holds an uploaded file of that format, rather than "
+              "requesting Garmin Connect's export. Default: FALSE"))
+    parser.add_argument(
+        "--no-catalog", action='store_true',
+        help=("Do not update the activity catalog (%s) in the backup "
+              "directory. Default: FALSE" % catalog_file))
+    parser.add_argument(
+        "--update-tiles", action='store_true',
+        help=("Update the spatial tile index (%s) of the backup directory "
+              "from exported .gpx/.fit files after the backup. "
+              "Default: FALSE" % tiles_file))
+    metrics.add_arguments(parser)
+
+
+def run(args):
+    import garminexport.backup
+    from garminexport.catalog import Catalog
+    from garminexport.changes import ChangeStore, fingerprinted_activities
+    from garminexport.garminclient import GarminClient
+    from garminexport.journal import Journal
+    from garminexport.planner import BackupIndex
+    from garminexport.retryer import (
+        Retryer, ExponentialBackoffDelayStrategy, MaxRetriesStopStrategy)
+    from garminexport.scheduler import TimeBudget, prioritize, schedule
+    from garminexport.spatial import TileIndex
+
+    # if no --format was specified, the default formats are to be backed up
+    args.format = args.format if args.format else default_export_formats
+    log.info("backing up formats: %s", ", ".join(args.format))
+
+    catalog = None
+    try:
+        if not os.path.isdir(args.backup_dir):
+            os.makedirs(args.backup_dir)
+
+        if not args.password:
+            args.password = getpass.getpass("Enter password: ")
+
+        # set up a retryer that will handle retries of failed activity
+        # downloads
+        retryer = Retryer(
+            delay_strategy=ExponentialBackoffDelayStrategy(
+                initial_delay=timedelta(seconds=1)),
+            stop_strategy=MaxRetriesStopStrategy(args.max_retries))
+
+
+        if not args.no_catalog:
+            catalog = Catalog(os.path.join(args.backup_dir, catalog_file))
+
+        journal = None
+        if not args.no_journal:
+            journal = Journal(os.path.join(args.backup_dir, journal_file))
+            if args.replan or not journal.is_started(args.format):
+                journal.reset(args.format)
+
+        budget = None
+        if args.time_budget is not None:
+            budget = TimeBudget(args.time_budget * 60)
+
+        changes = None
+        if args.detect_changes:
+            changes = ChangeStore(os.path.join(args.backup_dir, changes_file))
+
+        with GarminClient(args.username, args.password) as client:
+            def list_activities(start_index=0):
+                if changes is None:
+                    return client.iter_activities(start_index=start_index)
+                return fingerprinted_activities(client, changes, start_index)
+
+            listed = None
+            if journal is None:
+                # get all activity ids and timestamps from Garmin account,
+                # streamed past an index of the backup directory
+                log.info("scanning activities for %s ...", args.username)
+                with BackupIndex(args.backup_dir) as index:
+                    # whether an activity has changed is only known once it
+                    # has been listed
+                    refresh = changes.changed if changes is not None else ()
+                    missing_activities = retryer.call(lambda: list(index.missing(
+                        list_activities(), args.format, refresh)))
+                    listed = index.listed
+                log.info("account has a total of %d activities", listed)
+            elif journal.is_planned(args.format):
+                missing_activities = journal.pending(args.order)
+                log.info("resuming interrupted backup: %d activities left",
+                         len(missing_activities))
+            else:
+                if not journal.is_listed:
+                    log.info("scanning activities for %s (from index %d) ...",
+                             args.username, journal.listing_cursor)
+                    retryer.call(lambda: journal.add_listing(
+                        list_activities(journal.listing_cursor)))
+                listed = journal.listing_count()
+                log.info("account has a total of %d activities", listed)
+                journal.plan(args.backup_dir,
+                             changes.changed() if changes is not None else ())
+                missing_activities = journal.pending(args.order)
+
+            if listed is not None:
+                log.info("%s contains %d backed up activities",
+                         args.backup_dir, listed - len(missing_activities))
+
+            log.info("activities that aren't backed up: %d",
+                     len(missing_activities))
+
+            # changed activities are accepted as backed up once all of their
+            # exports have been refreshed
+            changed = {}
+            if changes is not None:
+                client.validators = changes
+                changed_ids = changes.changed()
+                changed = dict((activity[0], len(formats))
+                               for activity, formats in missing_activities
+                               if activity[0] in changed_ids)
+                log.info("activities changed since they were backed up: %d",
+                         len(changed))
+
+            jobs = prioritize(
+                missing_activities, args.format_priority, args.order)
+            for index, job in enumerate(schedule(jobs, budget)):
+                (id, start), formats = job.activity, [job.export_format]
+                log.info("backing up %s of activity %d from %s (%d out of %d) ..." % (job.export_format, id, start, index+1, len(jobs)))
+                try:
+                    garminexport.backup.download(
+                        client, job.activity, retryer, args.backup_dir,
+                        formats, catalog=catalog, raw_json=args.raw_json,
+                        original_uploads=args.original_uploads)
+                    if journal is not None:
+                        journal.mark(job.activity, formats, "done")
+                    if id in changed:
+                        changed[id] -= 1
+                        if not changed[id]:
+                            changes.accept([id])
+                except Exception as e:
+                    log.error(u"failed with exception: %s", e)
+                    if not args.ignore_errors:
+                        # left pending, to be retried first on resume
+                        raise
+                    if journal is not None:
+                        journal.mark(job.activity, formats, "failed", e)
+
+        if journal is not None:
+            journal.finish()
+            journal.close()
+        if changes is not None:
+            changes.close()
+
+        if args.update_tiles:
+            with TileIndex(os.path.join(args.backup_dir, tiles_file)) as index:
+                log.info("indexed %d track file(s) in %s",
+                         index.update(args.backup_dir), args.backup_dir)
+    except Exception as e:
+        log.error(u"failed with exception: %s", str(e))
+    finally:
+        if catalog is not None:
+            catalog.close()
+        metrics.report(args, log)
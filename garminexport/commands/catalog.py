@@ -0,0 +1,97 @@
+"""
+Queries the local activity catalog of a backup directory (as maintained by
+``garminbackup.py``) without opening the individual activity files.
+"""
+import argparse
+import json
+import logging
+import os
+
+from garminexport.commands import add_log_level_argument
+
+log = logging.getLogger(__name__)
+
+description = "Queries the activity catalog of a backup directory."
+
+
+def parse_bbox(value):
+    """Parses a ``min_lat,min_lon,max_lat,max_lon`` command-line argument."""
+    try:
+        bbox = tuple(float(v) for v in value.split(","))
+    except ValueError:
+        raise argparse.ArgumentTypeError("invalid bounding box: " + value)
+    if len(bbox) != 4:
+        raise argparse.ArgumentTypeError(
+            "bounding box must be min_lat,min_lon,max_lat,max_lon")
+    return bbox
+
+
+def add_arguments(parser):
+    # positional args
+    parser.add_argument(
+        "backup_dir", metavar="<backup-dir>", type=str,
+        help="Backup directory containing the catalog.")
+    # optional args
+    parser.add_argument(
+        "--refresh", action='store_true',
+        help=("Index new or modified summary files in the backup directory "
+              "before querying. Default: FALSE"))
+    parser.add_argument(
+        "-t", "--type", help="Activity type (running, cycling, ...).")
+    parser.add_argument(
+        "--after", type=str, help="Earliest start time (YYYY-MM-DD).")
+    parser.add_argument(
+        "--before", type=str, help="Latest start time, exclusive (YYYY-MM-DD).")
+    parser.add_argument(
+        "--min-distance", metavar="KM", type=float,
+        help="Minimum distance in kilometers.")
+    parser.add_argument(
+        "--max-distance", metavar="KM", type=float,
+        help="Maximum distance in kilometers.")
+    parser.add_argument(
+        "--min-duration", metavar="MIN", type=float,
+        help="Minimum duration in minutes.")
+    parser.add_argument(
+        "--max-duration", metavar="MIN", type=float,
+        help="Maximum duration in minutes.")
+    parser.add_argument(
+        "--bbox", type=parse_bbox,
+        help="Bounding box to intersect: min_lat,min_lon,max_lat,max_lon.")
+    parser.add_argument(
+        "--limit", type=int, help="Maximum number of results.")
+    parser.add_argument(
+        "--json", action='store_true',
+        help="Print results as JSON lines. Default: FALSE")
+    add_log_level_argument(parser)
+
+
+def run(args):
+    from garminexport.catalog import Catalog, catalog_file
+    from garminexport.timeutil import parse_timestamp
+
+    def scaled(value, factor):
+        return value * factor if value is not None else None
+
+    try:
+        with Catalog(os.path.join(args.backup_dir, catalog_file)) as catalog:
+            if args.refresh:
+                log.info("indexed %d summary file(s)",
+                         catalog.update(args.backup_dir))
+            entries = catalog.query(
+                activity_type=args.type,
+                start=parse_timestamp(args.after),
+                end=parse_timestamp(args.before),
+                min_distance=scaled(args.min_distance, 1000),
+                max_distance=scaled(args.max_distance, 1000),
+                min_duration=scaled(args.min_duration, 60),
+                max_duration=scaled(args.max_duration, 60),
+                bbox=args.bbox, limit=args.limit)
+        for entry in entries:
+            if args.json:
+                print(json.dumps(entry))
+            else:
+                print(u"{start_time_gmt}\t{id}\t{activity_type}\t"
+                      u"{distance}\t{duration}\t{name}".format(**entry))
+    except Exception as e:
+        log.error(u"failed with exception: %s", e)
+        raise
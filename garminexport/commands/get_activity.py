@@ -0,0 +1,63 @@
+"""
+A program that downloads one particular activity from a given Garmin
+Connect account and stores it locally on the user's computer.
+"""
+import getpass
+import logging
+import os
+
+from garminexport.backup import export_formats
+from garminexport.commands import add_log_level_argument
+
+log = logging.getLogger(__name__)
+
+description = ("Downloads one particular activity for a given "
+               "Garmin Connect account.")
+
+
+def add_arguments(parser):
+    # positional args
+    parser.add_argument(
+        "username", metavar="<username>", type=str, help="Account user name.")
+    parser.add_argument(
+        "activity", metavar="<activity>", type=int, help="Activity ID.")
+    parser.add_argument(
+        "format", metavar="<format>", type=str,
+        help="Export format (one of: {}).".format(export_formats))
+
+    # optional args
+    parser.add_argument(
+        "--password", type=str, help="Account password.")
+    parser.add_argument(
+        "--destination", metavar="DIR", type=str,
+        help=("Destination directory for downloaded activity. Default: "
+              "./activities/"), default=os.path.join(".", "activities"))
+    add_log_level_argument(parser)
+
+
+def run(args):
+    import garminexport.backup
+    from garminexport.activity import Activity
+    from garminexport.garminclient import GarminClient
+    from garminexport.timeutil import parse_timestamp
+
+    if not args.format in export_formats:
+        raise ValueError(
+            "Uncrecognized export format: '{}'. Must be one of {}".format(
+                args.format, export_formats))
+
+    try:
+        if not os.path.isdir(args.destination):
+            os.makedirs(args.destination)
+
+        if not args.password:
+            args.password = getpass.getpass("Enter password: ")
+        with GarminClient(args.username, args.password) as client:
+            log.info("fetching activity {} ...".format(args.activity))
+            summary = client.get_activity_summary(args.activity)
+            starttime = parse_timestamp(summary["activity"]["activitySummary"]["BeginTimestamp"]["value"])
+            garminexport.backup.download(
+                client, Activity(args.activity, starttime), args.destination, export_formats=[args.format])
+    except Exception as e:
+        log.error(u"failed with exception: %s", e)
+        raise
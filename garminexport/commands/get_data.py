@@ -0,0 +1,132 @@
+"""
+A program that downloads the daily wellness data (sleep, heart rate,
+movement and user summary) of a given Garmin Connect account and stores it
+in the wellness database.
+"""
+from datetime import date, timedelta
+import logging
+import os
+
+from garminexport import metrics
+from garminexport.commands import add_log_level_argument
+
+log = logging.getLogger(__name__)
+
+description = "Downloads Daily API Information from Garmin."
+
+
+def process_range(client, start_date, end_date, workers=4, output_dir=None,
+                  fill_gaps=False, ledger_path=None, empty_recheck_days=None):
+    from garminexport.garminclient import WELLNESS_KINDS
+    from garminexport.ledger import (
+        EMPTY_RECHECK_DAYS, FAILED, OK, Ledger, ledger_file, status_of)
+    from garminexport.timeutil import parse_timestamp
+    d1 = parse_timestamp(start_date).date()
+    d2 = parse_timestamp(end_date).date()
+
+    if output_dir:
+        from garminexport.filesink import FileSink
+        ledger_path = ledger_path or os.path.join(output_dir, ledger_file)
+    else:
+        # a database has no natural place for the ledger next to it
+        ledger_path = ledger_path or os.getenv("BIO_LEDGER_PATH")
+        if fill_gaps and not ledger_path:
+            raise ValueError("--fill-gaps needs a ledger: pass --ledger or set BIO_LEDGER_PATH")
+
+    ledger = Ledger(ledger_path) if ledger_path else None
+    if output_dir:
+        sink = FileSink(output_dir)
+        store, close = sink.write, sink.close
+    else:
+        from garminexport.database import open_database
+        db = open_database()
+        store, close = lambda day, documents: db.insert_wellness_data(documents), db.disconnect
+
+    failed = 0
+    try:
+        if fill_gaps:
+            # only the day/kind pairs that the ledger has no stored data of
+            if empty_recheck_days is None:
+                empty_recheck_days = EMPTY_RECHECK_DAYS
+            jobs = ledger.gaps(d1, d2, empty_recheck_days=empty_recheck_days)
+            log.info("{} missing or failed day/kind pairs between {} and {}".format(len(jobs), d1, d2))
+        else:
+            jobs = [(d1 + timedelta(i), kind) for i in range((d2 - d1).days + 1) for kind in WELLNESS_KINDS]
+        if not jobs:
+            return 0
+        if not output_dir:
+            db.prefetch_daily_statistic_ids(jobs[0][0], jobs[-1][0])
+
+        # days are stored as they arrive, while later days are being fetched
+        for day, documents in client.get_wellness_days(jobs, workers, return_exceptions=True):
+            log.info("Storing api data for {}".format(day))
+            statuses, errors = {}, {}
+            for kind, document in documents.items():
+                statuses[kind] = status_of(document)
+                if statuses[kind] == OK:
+                    try:
+                        store(day, {kind: document})
+                    except Exception as e:
+                        if ledger is not None and ledger.status(day, kind) == OK:
+                            # a rerun of a stored day (whose data stays as it was)
+                            log.warning("Kept stored {} data for {}: {}".format(kind, day, e))
+                            continue
+                        log.warning("Failed to store {} data for {}: {}".format(kind, day, e))
+                        statuses[kind], document = FAILED, e
+                if statuses[kind] == FAILED:
+                    errors[kind] = str(document)
+                    failed += 1
+            if ledger is not None:
+                ledger.record(day, statuses, errors)
+    finally:
+        close()
+        if ledger is not None:
+            ledger.close()
+    return failed
+
+
+def process(client, request_date, output_dir=None, fill_gaps=False, ledger_path=None,
+            empty_recheck_days=None):
+    logging.info("Pulling api data for {}".format(request_date))
+    return process_range(client, request_date, request_date, output_dir=output_dir,
+                         fill_gaps=fill_gaps, ledger_path=ledger_path,
+                         empty_recheck_days=empty_recheck_days)
+
+
+def add_arguments(parser):
+    parser.add_argument("username", metavar="<username>", type=str, help="Account email address.")
+    parser.add_argument("user", metavar="<user>", type=str, help="Account user")
+    parser.add_argument("--password", type=str, help="Account password.")
+    parser.add_argument("--end", type=str, help="Process multiple days.")
+    parser.add_argument("--start", type=str, help="How many days from the current date to start processing? YYYY-MM-DD")
+    parser.add_argument("--output-dir", metavar="DIR", type=str, help="Write the data to compressed monthly files in DIR instead of the database.")
+    parser.add_argument("--fill-gaps", action="store_true", help="Only fetch the days and kinds that the ledger has no record of, that failed, or that were empty when fetched recently (see --recheck-empty), rather than the whole range.")
+    parser.add_argument("--recheck-empty", metavar="DAYS", type=int, help="With --fill-gaps, fetch days without data again unless they were fetched at least DAYS days after the fact. Default: 3")
+    parser.add_argument("--ledger", metavar="PATH", type=str, help="The ingestion ledger database. Default: .wellness_ledger.sqlite in the output directory or, with the database, BIO_LEDGER_PATH (without either, a run against the database keeps no ledger and cannot --fill-gaps).")
+    parser.add_argument("-W", "--workers", metavar="NUM", type=int, default=4, help="Number of concurrent requests. Default: 4")
+    add_log_level_argument(parser)
+    metrics.add_arguments(parser)
+
+
+def run(args):
+    from garminexport.garminclient import GarminClient
+
+    try:
+        if not args.start:
+            request_date = (date.today() - timedelta(1)).strftime('%Y-%m-%d')
+        else:
+            request_date = args.start
+
+        with GarminClient(args.username, args.password, args.user) as client:
+            if args.end:
+                failed = process_range(client, args.start, args.end, args.workers, args.output_dir, args.fill_gaps, args.ledger, args.recheck_empty)
+            else:
+                failed = process(client, request_date, args.output_dir, args.fill_gaps, args.ledger, args.recheck_empty)
+        if failed:
+            log.error("{} day/kind pairs failed; rerun with --fill-gaps to retry them".format(failed))
+            return 1
+    except Exception as e:
+        log.error(u"Failed with exception: %s", e)
+        raise
+    finally:
+        metrics.report(args, log)
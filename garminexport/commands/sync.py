@@ -0,0 +1,138 @@
+"""
+Runs a long-lived sync daemon that keeps a backup directory (and optionally
+the wellness database) up to date with a given Garmin Connect account.
+
+Unlike scheduled ``garminbackup.py``/``get_data.py`` runs, the daemon logs in
+once and keeps an incremental cursor, so that every poll only asks for the
+activities and wellness days that are new since the last one.
+"""
+from datetime import timedelta
+import functools
+import getpass
+import logging
+import os
+import signal
+
+from garminexport.backup import export_formats, default_export_formats
+from garminexport.catalog import catalog_file
+from garminexport.commands import DEFAULT_MAX_RETRIES, add_log_level_argument
+from garminexport.daemon import state_file, DEFAULT_INTERVAL
+from garminexport.ledger import ledger_file
+
+log = logging.getLogger(__name__)
+
+description = (
+    "Keeps a backup directory in sync with a Garmin Connect account, "
+    "polling for new activities (and wellness days) on a schedule. "
+    "The sync cursor is kept in %s in the backup directory." % state_file)
+
+
+def add_arguments(parser):
+    # positional args
+    parser.add_argument(
+        "username", metavar="<username>", type=str, help="Account user name.")
+    # optional args
+    parser.add_argument(
+        "--password", type=str, help="Account password.")
+    parser.add_argument(
+        "--backup-dir", metavar="DIR", type=str,
+        help=("Destination directory for downloaded activities. Default: "
+              "./activities/"), default=os.path.join(".", "activities"))
+    add_log_level_argument(parser)
+    parser.add_argument(
+        "-f", "--format", choices=export_formats,
+        default=None, action='append',
+        help=("Desired output formats ("+', '.join(export_formats)+"). "
+              "Default: "+', '.join(default_export_formats)+"."))
+    parser.add_argument(
+        "--interval", metavar="SECONDS", type=int, default=DEFAULT_INTERVAL,
+        help="Seconds between polls. Default: %d" % DEFAULT_INTERVAL)
+    parser.add_argument(
+        "--overlap", metavar="HOURS", type=float, default=24,
+        help=("Also look for not yet backed up activities that started up "
+              "to HOURS before the newest synced activity (for activities "
+              "uploaded late). Default: 24"))
+    parser.add_argument(
+        "--max-retries", metavar="NUM", default=DEFAULT_MAX_RETRIES,
+        type=int, help="The maximum number of retries to make on failed attempts to fetch an activity. DEFAULT: %d" % DEFAULT_MAX_RETRIES)
+    parser.add_argument(
+        "--wellness-user", metavar="USER", type=str,
+        help=("Also store daily wellness data of this account user in the "
+              "wellness database (configured through the BIO_DB_* "
+              "environment variables). What has been stored is recorded in "
+              "a ledger: BIO_LEDGER_PATH, or %s in the backup "
+              "directory." % ledger_file))
+    parser.add_argument(
+        "--wellness-start", metavar="YYYY-MM-DD", type=str,
+        help=("First wellness day to store when there is no sync cursor yet. "
+              "Default: yesterday."))
+    parser.add_argument(
+        "--status-port", metavar="PORT", type=int,
+        help=("Serve the daemon's health on http://HOST:PORT/health and its "
+              "metrics on /metrics."))
+    parser.add_argument(
+        "--status-host", metavar="HOST", type=str, default="127.0.0.1",
+        help="Address to serve the status on. Default: 127.0.0.1")
+    parser.add_argument(
+        "--raw-json", action='store_true',
+        help=("Store json_summary/json_details exports exactly as returned "
+              "by Garmin Connect. Default: FALSE"))
+    parser.add_argument(
+        "--no-catalog", action='store_true',
+        help=("Do not update the activity catalog (%s) in the backup "
+              "directory. Default: FALSE" % catalog_file))
+
+
+def run(args):
+    from garminexport.catalog import Catalog
+    from garminexport.daemon import SyncDaemon, serve_status, store_wellness
+    from garminexport.garminclient import GarminClient
+    from garminexport.retryer import (
+        Retryer, ExponentialBackoffDelayStrategy, MaxRetriesStopStrategy)
+    from garminexport.timeutil import parse_timestamp
+
+    args.format = args.format if args.format else default_export_formats
+
+    try:
+        if not os.path.isdir(args.backup_dir):
+            os.makedirs(args.backup_dir)
+
+        if not args.password:
+            args.password = getpass.getpass("Enter password: ")
+
+        retryer = Retryer(
+            delay_strategy=ExponentialBackoffDelayStrategy(
+                initial_delay=timedelta(seconds=1)),
+            stop_strategy=MaxRetriesStopStrategy(args.max_retries))
+
+        catalog = None
+        if not args.no_catalog:
+            catalog = Catalog(os.path.join(args.backup_dir, catalog_file))
+
+        with GarminClient(args.username, args.password,
+                          args.wellness_user) as client:
+            daemon = SyncDaemon(
+                client, args.backup_dir, args.format, retryer,
+                interval=args.interval,
+                overlap=timedelta(hours=args.overlap),
+                wellness=functools.partial(
+                    store_wellness, ledger_path=os.getenv(
+                        "BIO_LEDGER_PATH",
+                        os.path.join(args.backup_dir, ledger_file)))
+                if args.wellness_user else None,
+                wellness_start=parse_timestamp(args.wellness_start).date()
+                if args.wellness_start else None,
+                catalog=catalog, raw_json=args.raw_json)
+            signal.signal(signal.SIGTERM, lambda signum, frame: daemon.stop())
+            if args.status_port is not None:
+                serve_status(daemon, args.status_port, args.status_host)
+            log.info("syncing %s every %d seconds ...", args.username,
+                     args.interval)
+            try:
+                daemon.run()
+            except KeyboardInterrupt:
+                pass
+            log.info("stopped after %d poll(s)", daemon.polls)
+    except Exception as e:
+        log.error(u"failed with exception: %s", e)
+        return 1
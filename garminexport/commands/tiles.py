@@ -0,0 +1,76 @@
+"""
+Finds the activities in a backup directory that passed through a given
+area, using the spatial tile index of the backup directory rather than
+parsing every exported track file.
+"""
+import calendar
+from datetime import datetime, timezone
+import json
+import logging
+import os
+
+from garminexport.commands import add_log_level_argument
+from garminexport.commands.catalog import parse_bbox
+from garminexport.spatial import DEFAULT_TILE_SIZE
+
+log = logging.getLogger(__name__)
+
+description = ("Finds the activities in a backup directory that "
+               "passed through a bounding box.")
+
+
+def epoch(value):
+    """Parses a date/time command-line argument into epoch seconds (UTC)."""
+    from garminexport.timeutil import parse_timestamp
+    return calendar.timegm(parse_timestamp(value).utctimetuple())
+
+
+def add_arguments(parser):
+    # positional args
+    parser.add_argument(
+        "backup_dir", metavar="<backup-dir>", type=str,
+        help="Backup directory containing exported .gpx/.fit files.")
+    parser.add_argument(
+        "bbox", metavar="<bbox>", type=parse_bbox,
+        help="Bounding box: min_lat,min_lon,max_lat,max_lon.")
+    # optional args
+    parser.add_argument(
+        "--refresh", action='store_true',
+        help=("Index new or modified track files in the backup directory "
+              "before querying. Default: FALSE"))
+    parser.add_argument(
+        "--tile-size", metavar="DEG", type=float, default=DEFAULT_TILE_SIZE,
+        help=("Tile size in degrees, used when the index is created. "
+              "Default: %s" % DEFAULT_TILE_SIZE))
+    parser.add_argument(
+        "--after", type=epoch, help="Only activities in the area at or after this time.")
+    parser.add_argument(
+        "--before", type=epoch, help="Only activities in the area before this time.")
+    parser.add_argument(
+        "--json", action='store_true',
+        help="Print results as JSON lines. Default: FALSE")
+    add_log_level_argument(parser)
+
+
+def run(args):
+    from garminexport.spatial import TileIndex, tiles_file
+
+    try:
+        index_path = os.path.join(args.backup_dir, tiles_file)
+        with TileIndex(index_path, tile_size=args.tile_size) as index:
+            if args.refresh:
+                log.info("indexed %d track file(s)",
+                         index.update(args.backup_dir))
+            hits = index.query(args.bbox, start=args.after, end=args.before)
+        for hit in hits:
+            if args.json:
+                print(json.dumps(hit))
+            else:
+                start = hit["start_time"]
+                print(u"{}\t{}\t{}".format(
+                    datetime.fromtimestamp(start, timezone.utc).isoformat()
+                    if start is not None else "-",
+                    hit["activity_id"], hit["filename"]))
+    except Exception as e:
+        log.error(u"failed with exception: %s", e)
+        raise
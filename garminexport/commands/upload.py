@@ -0,0 +1,80 @@
+"""A program that uploads an activity file to a Garmin
+Connect account.
+"""
+import getpass
+import logging
+
+from garminexport.commands import add_log_level_argument
+
+log = logging.getLogger(__name__)
+
+description = "Uploads an activity file to a Garmin Connect account."
+
+
+def add_arguments(parser):
+    # positional args
+    parser.add_argument(
+        "username", metavar="<username>", type=str, help="Account user name.")
+    parser.add_argument(
+        "activity", nargs='+', metavar="<file>", type=str,
+        help="Activity file (.gpx, .tcx, or .fit).")
+
+    # optional args
+    parser.add_argument(
+        "--password", type=str, help="Account password.")
+    parser.add_argument(
+        '-N', '--name', help="Activity name on Garmin Connect.")
+    parser.add_argument(
+        '-D', '--description', help="Activity description on Garmin Connect.")
+    parser.add_argument(
+        '-P', '--private', action='store_true', help="Make activity private on Garmin Connect.")
+    parser.add_argument(
+        '-T', '--type', help="Override activity type (running, cycling, walking, hiking, strength_training, etc.)")
+    parser.add_argument(
+        '-W', '--workers', metavar="NUM", type=int, default=1,
+        help="Number of concurrent uploads. Default: 1")
+    parser.add_argument(
+        '-J', '--journal', metavar="FILE", type=str,
+        help=("Journal file that records uploaded files by content hash. "
+              "Files already in the journal are skipped, which allows an "
+              "interrupted batch upload to be resumed."))
+    add_log_level_argument(parser)
+
+
+def check_arguments(parser, args):
+    if len(args.activity)>1 and (args.description is not None or args.name is not None):
+        parser.error("When uploading multiple activities, --name or --description cannot be used.")
+
+
+def run(args):
+    from garminexport.garminclient import GarminClient
+    from garminexport.uploader import UploadJournal, upload_files
+
+    try:
+        if not args.password:
+            args.password = getpass.getpass("Enter password: ")
+        journal = UploadJournal(args.journal) if args.journal else None
+        failures = 0
+        with GarminClient(args.username, args.password) as client:
+            log.info("uploading %d activity file(s) ...", len(args.activity))
+            results = upload_files(
+                client, args.activity, journal=journal, workers=args.workers,
+                name=args.name, description=args.description,
+                private=args.private, activity_type=args.type)
+            for result in results:
+                if result.status == "failed":
+                    failures += 1
+                    log.error("upload of {} failed: {!r}".format(result.path, result.error))
+                elif result.status == "skipped":
+                    log.info("{} already uploaded (journal): https://connect.garmin.com/modern/activity/{}".format(result.path, result.activity_id))
+                elif result.status == "duplicate":
+                    log.info("{} already exists on Garmin Connect: https://connect.garmin.com/modern/activity/{}".format(result.path, result.activity_id))
+                else:
+                    log.info("upload of {} successful: https://connect.garmin.com/modern/activity/{}".format(result.path, result.activity_id))
+        if journal is not None:
+            journal.close()
+        if failures:
+            log.error("%d of %d upload(s) failed", failures, len(args.activity))
+    except Exception as e:
+        log.error(u"failed with exception: %s", e)
+        raise
@@ -0,0 +1,386 @@
+"""
+Module with a long-running sync daemon that keeps a backup directory (and,
+optionally, the wellness database) up to date.
+
+Instead of listing the whole account on every run, the daemon keeps an
+incremental cursor in a state file (``.sync_state.json`` in the backup
+directory): the start time of the newest activity it has seen and the last
+wellness day it has stored. Every poll only lists the most recent activities
+(back to the cursor, minus an overlap window for activities that are
+uploaded late) and only fetches the wellness days after the cursor, so that
+a quiet interval costs a single listing request. The authenticated
+:class:`garminexport.garminclient.GarminClient` is kept between polls and is
+re-authenticated whenever a poll fails.
+
+Example of use:
+    with GarminClient(username, password) as client:
+        daemon = SyncDaemon(client, "activities", default_export_formats,
+                            retryer, interval=900)
+        serve_status(daemon, 8080)
+        daemon.run()
+"""
+from datetime import date, datetime, timedelta
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import garminexport.backup
+from garminexport.metrics import registry
+from garminexport.timeutil import parse_timestamp
+
+log = logging.getLogger(__name__)
+
+state_file = ".sync_state.json"
+"""The file in the backup directory that holds the daemon's sync cursor."""
+
+DEFAULT_INTERVAL = 900
+"""The default number of seconds between two polls."""
+
+DEFAULT_OVERLAP = timedelta(days=1)
+"""How far before the activity cursor to look for late-uploaded activities."""
+
+LISTING_BATCH_SIZE = 20
+"""Activities listed per request when polling (a poll usually needs one)."""
+
+
+class SyncState(object):
+    """
+    The incremental sync cursor, persisted as a small JSON document.
+
+    :ivar activity_cursor: Start time of the newest activity seen (or None).
+    :ivar wellness_cursor: The last wellness day stored (or None).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.activity_cursor = None
+        self.wellness_cursor = None
+        if os.path.isfile(path):
+            with open(path, mode="r") as f:
+                document = json.load(f)
+            if document.get("activity_cursor"):
+                self.activity_cursor = parse_timestamp(
+                    document["activity_cursor"])
+            if document.get("wellness_cursor"):
+                self.wellness_cursor = parse_timestamp(
+                    document["wellness_cursor"]).date()
+
+    def to_dict(self):
+        return {
+            "activity_cursor": self.activity_cursor.isoformat()
+            if self.activity_cursor else None,
+            "wellness_cursor": self.wellness_cursor.isoformat()
+            if self.wellness_cursor else None,
+        }
+
+    def save(self):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(self.to_dict(), f)
+            os.rename(tmp_path, self.path)
+        except Exception:
+            os.remove(tmp_path)
+            raise
+
+
+def store_wellness(client, days, ledger_path):
+    """
+    Fetches the daily wellness data (sleep, heart rate, movement and user
+    summary) for the given days and inserts them in the wellness database
+    (see :func:`garminexport.database.open_database`). The outcome of every
+    day and kind is recorded in a ledger (see :mod:`garminexport.ledger`),
+    and only the days and kinds that it has no stored data of are fetched,
+    so that a day that was partly stored is completed rather than inserted
+    again. A failed day or kind does not keep the others from being stored.
+
+    :param client: A connected :class:`GarminClient` with its ``user`` set.
+    :param days: The days to store (consecutive, in order).
+    :type days: list of :class:`datetime.date`
+    :param ledger_path: Path to the ledger database.
+    :type ledger_path: str
+    :return: Every day, along with whether all of its kinds are stored (or
+      had no data).
+    :rtype: generator of tuples of `(date, bool)`
+    """
+    from garminexport.database import open_database
+    from garminexport.ledger import FAILED, OK, Ledger, status_of
+    if not days:
+        return
+    with Ledger(ledger_path) as ledger:
+        jobs = ledger.gaps(days[0], days[-1])
+        fetched = set(day for day, _ in jobs)
+        for day in days:
+            if day not in fetched:
+                yield day, True
+        if not jobs:
+            return
+        db = open_database()
+        try:
+            db.prefetch_daily_statistic_ids(jobs[0][0], jobs[-1][0])
+            for day, documents in client.get_wellness_days(
+                    jobs, return_exceptions=True):
+                log.info("storing wellness data for %s", day)
+                statuses, errors = {}, {}
+                for kind, document in documents.items():
+                    statuses[kind] = status_of(document)
+                    if statuses[kind] == OK:
+                        try:
+                            db.insert_wellness_data({kind: document})
+                        except Exception as e:
+                            log.warning("failed to store %s data for %s: %s",
+                                        kind, day, e)
+                            statuses[kind], document = FAILED, e
+                    if statuses[kind] == FAILED:
+                        errors[kind] = str(document)
+                ledger.record(day, statuses, errors)
+                yield day, FAILED not in statuses.values()
+        finally:
+            db.disconnect()
+
+
+class SyncDaemon(object):
+    """
+    Polls Garmin Connect on a schedule and backs up new activities and,
+    optionally, new wellness days.
+
+    :param client: A connected :class:`GarminClient`.
+    :param backup_dir: Destination directory for exported activities.
+    :param export_formats: The activity export formats to back up.
+    :param retryer: A :class:`garminexport.retryer.Retryer` for downloads.
+    :param interval: Seconds between the start of two polls.
+    :param overlap: How far before the activity cursor to look for
+      activities that were uploaded after newer ones.
+    :type overlap: :class:`datetime.timedelta`
+    :param wellness: A callable ``(client, days)`` that stores wellness data
+      and yields every day along with whether it was stored completely (such
+      as :func:`store_wellness` with its ledger), or None to only sync
+      activities.
+    :param wellness_start: The first wellness day to store when there is no
+      cursor yet. Default: yesterday.
+    :param catalog: An optional :class:`garminexport.catalog.Catalog` to
+      update with downloaded summaries.
+    :param raw_json: Store json exports as returned by Garmin Connect.
+    """
+
+    def __init__(self, client, backup_dir, export_formats, retryer,
+                 interval=DEFAULT_INTERVAL, overlap=DEFAULT_OVERLAP,
+                 wellness=None, wellness_start=None, catalog=None,
+                 raw_json=False):
+        self.client = client
+        self.backup_dir = backup_dir
+        self.export_formats = export_formats
+        self.retryer = retryer
+        self.interval = interval
+        self.overlap = overlap
+        self.wellness = wellness
+        self.wellness_start = wellness_start
+        self.catalog = catalog
+        self.raw_json = raw_json
+        self.state = SyncState(os.path.join(backup_dir, state_file))
+        self._stopped = threading.Event()
+        self._lock = threading.Lock()
+        self.started = time.time()
+        self.polls = 0
+        self.consecutive_failures = 0
+        self.last_success = None
+        self.last_error = None
+        self.activities_synced = 0
+        self.days_synced = 0
+
+    def stop(self):
+        """Makes :meth:`run` return after the current poll."""
+        self._stopped.set()
+
+    def run(self):
+        """Polls every ``interval`` seconds until :meth:`stop` is called."""
+        while not self._stopped.is_set():
+            started = time.time()
+            self.poll()
+            self._stopped.wait(max(0, self.interval - (time.time() - started)))
+
+    def poll(self):
+        """
+        Runs a single sync. Failures are logged and recorded in the status
+        rather than raised, and cause the client to re-authenticate before
+        the next poll.
+
+        :return: True if the sync succeeded.
+        """
+        with self._lock:
+            self.polls += 1
+        try:
+            if self.consecutive_failures:
+                self._reconnect()
+            activities = self.sync_activities()
+            days = self.sync_wellness() if self.wellness else 0
+        except Exception as e:
+            log.error(u"sync failed: %s", e)
+            registry.inc("sync_failures_total")
+            with self._lock:
+                self.consecutive_failures += 1
+                self.last_error = "{}: {}".format(
+                    datetime.now().isoformat(), e)
+            return False
+        with self._lock:
+            self.consecutive_failures = 0
+            self.last_success = time.time()
+            self.activities_synced += activities
+            self.days_synced += days
+        return True
+
+    def _reconnect(self):
+        log.info("re-authenticating after %d failed sync(s) ...",
+                 self.consecutive_failures)
+        self.client.disconnect()
+        self.client.connect()
+
+    def _new_activities(self):
+        cursor = self.state.activity_cursor
+        if cursor is None:
+            log.info("no sync cursor: listing all activities ...")
+            return self.retryer.call(self.client.list_activities)
+        horizon = cursor - self.overlap
+
+        def list_recent():
+            recent = []
+            for activity in self.client.iter_activities(LISTING_BATCH_SIZE):
+                if activity[1] < horizon:
+                    break
+                recent.append(activity)
+            return recent
+        return self.retryer.call(list_recent)
+
+    def sync_activities(self):
+        """
+        Backs up the activities that started after the activity cursor
+        (minus the overlap window) and aren't backed up yet.
+
+        :return: The number of activities backed up.
+        """
+        activities = self._new_activities()
+        missing = garminexport.backup.need_backup(
+            activities, self.backup_dir, self.export_formats)
+        log.info("%d new activit(y/ies) among %d listed",
+                 len(missing), len(activities))
+        # oldest first, so that the cursor only moves past activities that
+        # have been backed up
+        for activity in sorted(missing, key=lambda a: a[1]):
+            garminexport.backup.download(
+                self.client, activity, self.retryer, self.backup_dir,
+                self.export_formats, catalog=self.catalog,
+                raw_json=self.raw_json)
+            self._advance_activity_cursor(activity[1])
+        if activities:
+            self._advance_activity_cursor(max(a[1] for a in activities))
+        return len(missing)
+
+    def _advance_activity_cursor(self, start_time):
+        cursor = self.state.activity_cursor
+        if cursor is None or start_time > cursor:
+            self.state.activity_cursor = start_time
+            self.state.save()
+
+    def sync_wellness(self):
+        """
+        Stores the wellness data of every completed day after the wellness
+        cursor (today is left until it is over). The cursor moves past every
+        day that is stored completely, up to the first day that is not,
+        which is retried (along with the days after it) on the next poll.
+
+        :return: The number of days stored completely.
+        """
+        last_day = date.today() - timedelta(1)
+        if self.state.wellness_cursor is not None:
+            first_day = self.state.wellness_cursor + timedelta(1)
+        else:
+            first_day = self.wellness_start or last_day
+        days = [first_day + timedelta(i)
+                for i in range((last_day - first_day).days + 1)]
+        if not days:
+            return 0
+        complete = {}
+        for day, stored in self.wellness(self.client, days):
+            complete[day] = stored
+            self._advance_wellness_cursor(first_day, complete)
+        incomplete = sorted(day for day in days if not complete.get(day))
+        if incomplete:
+            log.warning("wellness data of %d day(s) from %s left to retry",
+                        len(incomplete), incomplete[0])
+        return sum(1 for stored in complete.values() if stored)
+
+    def _advance_wellness_cursor(self, first_day, complete):
+        # past the completely stored days that follow the cursor
+        day = self.state.wellness_cursor or first_day - timedelta(1)
+        advanced = day
+        while complete.get(advanced + timedelta(1)):
+            advanced += timedelta(1)
+        if advanced != day:
+            self.state.wellness_cursor = advanced
+            self.state.save()
+
+    def status(self):
+        """
+        Returns the daemon's health and progress as a JSON-serializable dict.
+        The daemon is healthy until a poll fails.
+        """
+        with self._lock:
+            return dict(
+                healthy=self.consecutive_failures == 0,
+                uptime_seconds=time.time() - self.started,
+                polls=self.polls,
+                consecutive_failures=self.consecutive_failures,
+                last_success=datetime.fromtimestamp(self.last_success)
+                .isoformat() if self.last_success else None,
+                last_error=self.last_error,
+                activities_synced=self.activities_synced,
+                days_synced=self.days_synced,
+                **self.state.to_dict())
+
+
+class _StatusHandler(BaseHTTPRequestHandler):
+
+    def log_message(self, format, *args):
+        log.debug(format, *args)
+
+    def do_GET(self):
+        daemon = self.server.sync_daemon
+        if self.path.split("?")[0] == "/metrics":
+            status, content_type = 200, "text/plain; version=0.0.4"
+            body = registry.prometheus().encode("utf-8")
+        elif self.path.split("?")[0] in ("/", "/health", "/status"):
+            document = daemon.status()
+            status = 200 if document["healthy"] else 503
+            content_type = "application/json"
+            body = json.dumps(document, indent=2).encode("utf-8")
+        else:
+            status, content_type, body = 404, "text/plain", b"not found\n"
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def serve_status(daemon, port, host="127.0.0.1"):
+    """
+    Serves the daemon's status on ``/health`` (200 when healthy, 503 after
+    a failed poll) and its metrics in Prometheus format on ``/metrics``,
+    from a background thread.
+
+    :return: The started :class:`http.server.ThreadingHTTPServer`.
+    """
+    server = ThreadingHTTPServer((host, port), _StatusHandler)
+    server.daemon_threads = True
+    server.sync_daemon = daemon
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    log.info("serving status on http://%s:%d/health", host,
+             server.server_address[1])
+    return server
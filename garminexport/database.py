@@ -1,109 +1,439 @@
+"""
+Module that stores daily wellness data (sleep, heart rate, movement and
+user summaries) in a relational database.
+
+The ingest logic lives in :class:`StorageBackend`, which leaves the
+connection to its subclasses:
+
+  - :class:`MySQLDatabase` stores the data in a MySQL server (see
+    ``schema.sql`` for its schema). It is also available under its
+    original name, :class:`Database`.
+
+  - :class:`SQLiteDatabase` stores the data in a local SQLite file, in WAL
+    mode, which suits single-user installs and lets the ingest path be
+    benchmarked without a database server.
+
+:func:`open_database` opens the backend that is configured through the
+``BIO_DB_*`` environment variables.
+
+Either backend can store the intraday heart rate and movement samples in
+one of two layouts: one row per sample (in ``hr_data`` and
+``movement_data``), or, in the ``compact`` layout, one row per day holding
+the day's samples as a compressed blob (in ``hr_series`` and
+``movement_series``, see :mod:`garminexport.timeseries`), which is read
+back with :meth:`StorageBackend.get_hr_series` and
+:meth:`StorageBackend.get_movement_series`.
+"""
+from contextlib import closing
 from datetime import date, timedelta, datetime
-from dateutil import parser
-import pymysql.cursors
+from garminexport.timeutil import (
+    epoch_to_datetime, epochs_to_datetimes, parse_timestamps)
+from garminexport.metrics import registry
+from garminexport import timeseries
 import os
+import sqlite3
+
+backends = ("mysql", "sqlite")
+"""The names of the storage backends (see :func:`open_database`)."""
+
+layouts = ("rows", "compact")
+"""The names of the intraday sample layouts (see :func:`open_database`)."""
+
+MOVEMENT_SCALE = 10000
+"""Movement values are stored with four decimals in the compact layout."""
+
 
-class Database(object):
-    def __init__(self):
-        self.connect()
+def open_database(backend=None, layout=None):
+    """
+    Opens the wellness database of the configured storage backend.
+
+    The backend is selected by ``BIO_DB_BACKEND`` (``mysql``, the default,
+    or ``sqlite``). The MySQL backend connects to ``BIO_DB`` on
+    ``BIO_DB_HOST`` as ``BIO_DB_USER``/``BIO_DB_PASS``; the SQLite backend
+    opens the file ``BIO_DB_PATH`` (default: ``biometrics.sqlite``).
+    ``BIO_DB_LAYOUT`` selects the layout of intraday samples (``rows``, the
+    default, or ``compact``).
+
+    :param backend: Overrides ``BIO_DB_BACKEND``.
+    :type backend: str
+    :param layout: Overrides ``BIO_DB_LAYOUT``.
+    :type layout: str
+    :rtype: :class:`StorageBackend`
+    """
+    backend = backend or os.getenv('BIO_DB_BACKEND', 'mysql')
+    layout = layout or os.getenv('BIO_DB_LAYOUT', 'rows')
+    if layout not in layouts:
+        raise ValueError("unknown BIO_DB_LAYOUT: {} (must be one of {})".format(
+            layout, ", ".join(layouts)))
+    compact = layout == "compact"
+    if backend == "mysql":
+        return MySQLDatabase(compact=compact)
+    if backend == "sqlite":
+        return SQLiteDatabase(
+            os.getenv('BIO_DB_PATH', 'biometrics.sqlite'), compact=compact)
+    raise ValueError("unknown BIO_DB_BACKEND: {} (must be one of {})".format(
+        backend, ", ".join(backends)))
+
+
+class StorageBackend(object):
+    """
+    The ingest logic of the wellness database. Subclasses implement
+    :meth:`connect` to open a connection to a storage backend; the
+    statements they are given use ``%s`` placeholders.
+    """
+    def __init__(self, compact=False, connection=None):
+        """
+        :param compact: If true, intraday samples are stored in the compact
+          layout (one blob per day) rather than one row per sample.
+        :type compact: bool
+        :param connection: An open (DB-API) connection to use rather than
+          connecting with :meth:`connect`.
+        """
+        self.compact = compact
+        # entry date (YYYY-MM-DD) -> daily_statistics id
+        self._daily_statistic_ids = {}
+        if connection is not None:
+            self.connection = connection
+        else:
+            self.connect()
 
     def connect(self):
-        self.connection = pymysql.connect(
-            host=os.getenv('BIO_DB_HOST', '127.0.0.1'),
-            user=os.getenv('BIO_DB_USER', 'root'),
-            password=os.getenv('BIO_DB_PASS', ''),
-            db=os.getenv('BIO_DB', 'biometrics'),
-            charset='utf8mb4',
-            cursorclass=pymysql.cursors.DictCursor)
+        """Opens ``self.connection`` to the storage backend."""
+        raise NotImplementedError()
 
     def disconnect(self):
         self.connection.close()
 
+    def _cursor(self):
+        """Returns a new cursor, for use in a with-statement."""
+        return self.connection.cursor()
+
+    def _execute(self, cursor, sql, args):
+        cursor.execute(sql, args)
+
+    def _executemany(self, cursor, sql, rows):
+        cursor.executemany(sql, rows)
+
+    INSERT_IGNORE = "INSERT IGNORE"
+    """The backend's INSERT that skips rows that violate a unique key."""
+
     def create_or_get_daily_statistic_id(self, date=None):
         if(date == None):
-            date = (date.today() - timedelta(1)).strftime('%y-%m-%d')
-        with self.connection.cursor() as cursor:
+            date = (datetime.now() - timedelta(1)).strftime('%Y-%m-%d')
+        date = str(date)
+        daily_statistics_id = self._daily_statistic_ids.get(date)
+        if daily_statistics_id is not None:
+            return daily_statistics_id
+
+        with self._cursor() as cursor:
             sql = "SELECT `id` FROM `daily_statistics` WHERE `entry_date`=%s"
-            cursor.execute(sql, date)
+            self._execute(cursor, sql, (date,))
             result = cursor.fetchone()
-            if result != None:
-                return result['id']
+            if result == None:
+                # when concurrent writers create the same day, the unique
+                # entry_date lets only one insert through and all of them
+                # read back its id
+                insert = self.INSERT_IGNORE + " INTO `daily_statistics` (`entry_date`) VALUES (%s)"
+                self._execute(cursor, insert, (date,))
+                self.connection.commit()
+                self._execute(cursor, sql, (date,))
+                result = cursor.fetchone()
+        self._daily_statistic_ids[date] = result['id']
+        return result['id']
 
-        with self.connection.cursor() as cursor:
-            sql = "INSERT INTO `daily_statistics` (`entry_date`) VALUES (%s)"
-            cursor.execute(sql, date)
+    def prefetch_daily_statistic_ids(self, start, end):
+        """
+        Looks up (and creates, where missing) the ``daily_statistics`` rows
+        of a range of days in bulk, so that inserting the days' data does
+        not look them up one by one.
+
+        :param start: The first day.
+        :type start: :class:`datetime.date`
+        :param end: The last day (inclusive).
+        :type end: :class:`datetime.date`
+        """
+        days = [(start + timedelta(i)).isoformat()
+                for i in range((end - start).days + 1)]
+        missing = [day for day in days if day not in self._daily_statistic_ids]
+        if not missing:
+            return
+        with self._cursor() as cursor:
+            sql = self.INSERT_IGNORE + " INTO `daily_statistics` (`entry_date`) VALUES (%s)"
+            self._executemany(cursor, sql, [(day,) for day in missing])
             self.connection.commit()
-            return cursor.lastrowid
+            sql = "SELECT `id`, `entry_date` FROM `daily_statistics` WHERE `entry_date` BETWEEN %s AND %s"
+            self._execute(cursor, sql, (missing[0], missing[-1]))
+            for row in cursor.fetchall():
+                self._daily_statistic_ids[str(row['entry_date'])] = row['id']
 
     def convert_epoch_to_datetime(self, epoch):
-        #TODO - Implement a better approach
-        if epoch == None:
-            return None
-
-        return datetime.fromtimestamp(int(str(epoch)[:10]))
+        return epoch_to_datetime(epoch)
 
+    @registry.timed("stage_duration_seconds", stage="db.insert_sleep_data")
     def insert_sleep_data(self, sleep_data):
         data_date = sleep_data['dailySleepDTO']['calendarDate']
         daily_statistics_id = self.create_or_get_daily_statistic_id(data_date)
 
-        with self.connection.cursor() as cursor:
+        with self._cursor() as cursor:
             daily_sleep_data = sleep_data['dailySleepDTO']
 
             sql = "UPDATE `daily_statistics` SET `total_sleep` = %s WHERE id = %s"
-            cursor.execute(sql, (daily_sleep_data['sleepTimeSeconds'], daily_statistics_id))
+            self._execute(cursor, sql, (daily_sleep_data['sleepTimeSeconds'], daily_statistics_id))
 
             sleep_start = self.convert_epoch_to_datetime(daily_sleep_data['sleepStartTimestampGMT'])
             sleep_end = self.convert_epoch_to_datetime(daily_sleep_data['sleepEndTimestampGMT'])
 
             sql = "INSERT INTO `sleep` (`daily_statistics_id`, `sleep_start`, `sleep_end`, `deep_sleep`, `light_sleep`, `rem_sleep`, `awake_sleep`) VALUES (%s, %s, %s, %s, %s, %s, %s)"
-            cursor.execute(sql, (daily_statistics_id, sleep_start, sleep_end, daily_sleep_data['deepSleepSeconds'],  daily_sleep_data['lightSleepSeconds'], daily_sleep_data['remSleepSeconds'], daily_sleep_data['awakeSleepSeconds']))
+            self._execute(cursor, sql, (daily_statistics_id, sleep_start, sleep_end, daily_sleep_data['deepSleepSeconds'],  daily_sleep_data['lightSleepSeconds'], daily_sleep_data['remSleepSeconds'], daily_sleep_data['awakeSleepSeconds']))
             sleep_id = cursor.lastrowid
 
-        with self.connection.cursor() as cursor:
+        with self._cursor() as cursor:
             sleep_movement = sleep_data['sleepMovement']
 
             if sleep_data['sleepMovement'] != None:
-                for movement in sleep_movement:
-                    sql = "INSERT INTO `sleep_movement` (`sleep_id`, `start`, `end`, `activity_level`) VALUES (%s, %s, %s, %s)"
-                    cursor.execute(sql, (sleep_id, parser.parse(movement['startGMT']), parser.parse(movement['endGMT']), movement['activityLevel']))
+                starts = parse_timestamps([movement['startGMT'] for movement in sleep_movement])
+                ends = parse_timestamps([movement['endGMT'] for movement in sleep_movement])
+                sql = "INSERT INTO `sleep_movement` (`sleep_id`, `start`, `end`, `activity_level`) VALUES (%s, %s, %s, %s)"
+                self._executemany(cursor, sql, [(sleep_id, start, end, movement['activityLevel']) for start, end, movement in zip(starts, ends, sleep_movement)])
 
         self.connection.commit()
 
+    @registry.timed("stage_duration_seconds", stage="db.insert_hr_data")
     def insert_hr_data(self, hr_data):
         data_date = hr_data['calendarDate']
         daily_statistics_id = self.create_or_get_daily_statistic_id(data_date)
 
-        with self.connection.cursor() as cursor:
+        with self._cursor() as cursor:
             sql = "UPDATE `daily_statistics` SET `max_hr` = %s, `min_hr` = %s, `resting_hr` = %s WHERE id = %s"
-            cursor.execute(sql, (hr_data['maxHeartRate'], hr_data['minHeartRate'], hr_data['restingHeartRate'], daily_statistics_id))
+            self._execute(cursor, sql, (hr_data['maxHeartRate'], hr_data['minHeartRate'], hr_data['restingHeartRate'], daily_statistics_id))
 
-            if hr_data['heartRateValues'] != None:
-                for hr_value in hr_data['heartRateValues']:
-                    time_entry = self.convert_epoch_to_datetime(hr_value[0])
-                    sql = "INSERT INTO `hr_data` (`daily_statistics_id`, `event_time`, `hr_value`) VALUES (%s, %s, %s)"
-                    cursor.execute(sql, (daily_statistics_id, time_entry, hr_value[1]))
+            if hr_data['heartRateValues'] != None and self.compact:
+                hr_values = hr_data['heartRateValues']
+                self._insert_series(cursor, "hr_series", daily_statistics_id, timeseries.encode(
+                    [hr_value[0] for hr_value in hr_values], [hr_value[1] for hr_value in hr_values]))
+            elif hr_data['heartRateValues'] != None:
+                hr_values = hr_data['heartRateValues']
+                time_entries = epochs_to_datetimes([hr_value[0] for hr_value in hr_values])
+                sql = "INSERT INTO `hr_data` (`daily_statistics_id`, `event_time`, `hr_value`) VALUES (%s, %s, %s)"
+                self._executemany(cursor, sql, [(daily_statistics_id, time_entry, hr_value[1]) for time_entry, hr_value in zip(time_entries, hr_values)])
 
         self.connection.commit()
 
+    @registry.timed("stage_duration_seconds", stage="db.insert_movement_data")
     def insert_movement_data(self, movement_data):
         data_date = movement_data['calendarDate']
         daily_statistics_id = self.create_or_get_daily_statistic_id(data_date)
 
-        with self.connection.cursor() as cursor:
-            if movement_data['movementValues'] != None:
-                for mv_data in movement_data['movementValues']:
-                    time_entry = self.convert_epoch_to_datetime(mv_data[0])
-                    sql = "INSERT INTO `movement_data` (`daily_statistics_id`, `event_time`, `movement`) VALUES (%s, %s, %s)"
-                    cursor.execute(sql, (daily_statistics_id, time_entry, mv_data[1]))
+        with self._cursor() as cursor:
+            if movement_data['movementValues'] != None and self.compact:
+                mv_values = movement_data['movementValues']
+                self._insert_series(cursor, "movement_series", daily_statistics_id, timeseries.encode(
+                    [mv_data[0] for mv_data in mv_values], [mv_data[1] for mv_data in mv_values], MOVEMENT_SCALE))
+            elif movement_data['movementValues'] != None:
+                mv_values = movement_data['movementValues']
+                time_entries = epochs_to_datetimes([mv_data[0] for mv_data in mv_values])
+                sql = "INSERT INTO `movement_data` (`daily_statistics_id`, `event_time`, `movement`) VALUES (%s, %s, %s)"
+                self._executemany(cursor, sql, [(daily_statistics_id, time_entry, mv_data[1]) for time_entry, mv_data in zip(time_entries, mv_values)])
 
         self.connection.commit()
 
+    @registry.timed("stage_duration_seconds", stage="db.insert_user_summary")
     def insert_user_summary(self, summary_data):
         data_date = summary_data['calendarDate']
         daily_statistics_id = self.create_or_get_daily_statistic_id(data_date)
 
-        with self.connection.cursor() as cursor:
+        with self._cursor() as cursor:
             sql = "UPDATE `daily_statistics` SET `total_steps` = %s, `highly_active_seconds` = %s, `active_seconds` = %s, `sedentary_seconds` = %s, `sleeping_seconds` = %s, `max_stress_level` = %s, `low_stress_duration` = %s, `medium_stress_duration` = %s, `high_stress_duration` = %s WHERE id = %s"
-            cursor.execute(sql, (summary_data['totalSteps'], summary_data['highlyActiveSeconds'], summary_data['activeSeconds'], summary_data['sedentarySeconds'], summary_data['sleepingSeconds'], summary_data['maxStressLevel'], summary_data['lowStressDuration'], summary_data['mediumStressDuration'], summary_data['highStressDuration'], daily_statistics_id))
+            self._execute(cursor, sql, (summary_data['totalSteps'], summary_data['highlyActiveSeconds'], summary_data['activeSeconds'], summary_data['sedentarySeconds'], summary_data['sleepingSeconds'], summary_data['maxStressLevel'], summary_data['lowStressDuration'], summary_data['mediumStressDuration'], summary_data['highStressDuration'], daily_statistics_id))
 
         self.connection.commit()
+
+    def _insert_series(self, cursor, table, daily_statistics_id, samples):
+        sql = "REPLACE INTO `{}` (`daily_statistics_id`, `samples`) VALUES (%s, %s)".format(table)
+        self._execute(cursor, sql, (daily_statistics_id, samples))
+
+    def _get_series(self, table, entry_date):
+        with self._cursor() as cursor:
+            sql = "SELECT `samples` FROM `{}` JOIN `daily_statistics` ON `daily_statistics`.`id` = `daily_statistics_id` WHERE `entry_date` = %s".format(table)
+            self._execute(cursor, sql, (entry_date,))
+            result = cursor.fetchone()
+        return timeseries.decode(bytes(result['samples'])) if result else None
+
+    def get_hr_series(self, entry_date):
+        """
+        Returns the heart rate samples of a day stored in the compact layout.
+
+        :param entry_date: The day (``YYYY-MM-DD``).
+        :type entry_date: str
+        :returns: The samples' timestamps (epoch milliseconds) and heart
+          rates, or `None` if the day has no samples.
+        :rtype: :class:`garminexport.timeseries.Series`
+        """
+        return self._get_series("hr_series", entry_date)
+
+    def get_movement_series(self, entry_date):
+        """
+        Returns the movement samples of a day stored in the compact layout
+        (see :meth:`get_hr_series`).
+
+        :rtype: :class:`garminexport.timeseries.Series`
+        """
+        return self._get_series("movement_series", entry_date)
+
+    def insert_wellness_data(self, documents):
+        """
+        Inserts the wellness documents of a day, as yielded by
+        :meth:`garminexport.garminclient.GarminClient.get_wellness_range`.
+        Kinds without data for the day are skipped.
+
+        :param documents: The day's documents by wellness kind.
+        :type documents: dict
+        """
+        inserts = [("sleep", self.insert_sleep_data),
+                   ("heart_rate", self.insert_hr_data),
+                   ("movement", self.insert_movement_data),
+                   ("user_summary", self.insert_user_summary)]
+        for kind, insert in inserts:
+            if documents.get(kind) is not None:
+                insert(documents[kind])
+
+
+class MySQLDatabase(StorageBackend):
+    """A wellness database in a MySQL server."""
+
+    def connect(self):
+        import pymysql.cursors
+        self.connection = pymysql.connect(
+            host=os.getenv('BIO_DB_HOST', '127.0.0.1'),
+            user=os.getenv('BIO_DB_USER', 'root'),
+            password=os.getenv('BIO_DB_PASS', ''),
+            db=os.getenv('BIO_DB', 'biometrics'),
+            charset='utf8mb4',
+            cursorclass=pymysql.cursors.DictCursor)
+
+
+Database = MySQLDatabase
+"""The MySQL wellness database (the name it has always had)."""
+
+
+_SQLITE_SCHEMA = """
+PRAGMA foreign_keys = ON;
+CREATE TABLE IF NOT EXISTS daily_statistics (
+    id INTEGER PRIMARY KEY,
+    entry_date TEXT NOT NULL UNIQUE,
+    max_hr INTEGER,
+    min_hr INTEGER,
+    resting_hr INTEGER,
+    total_sleep INTEGER,
+    total_steps INTEGER,
+    highly_active_seconds INTEGER,
+    active_seconds INTEGER,
+    sedentary_seconds INTEGER,
+    sleeping_seconds INTEGER,
+    max_stress_level INTEGER,
+    low_stress_duration INTEGER,
+    medium_stress_duration INTEGER,
+    high_stress_duration INTEGER
+);
+CREATE TABLE IF NOT EXISTS sleep (
+    id INTEGER PRIMARY KEY,
+    daily_statistics_id INTEGER NOT NULL UNIQUE
+        REFERENCES daily_statistics(id) ON UPDATE CASCADE ON DELETE CASCADE,
+    sleep_start TEXT,
+    sleep_end TEXT,
+    deep_sleep INTEGER,
+    light_sleep INTEGER,
+    rem_sleep INTEGER,
+    awake_sleep INTEGER
+);
+CREATE TABLE IF NOT EXISTS sleep_movement (
+    id INTEGER PRIMARY KEY,
+    sleep_id INTEGER NOT NULL
+        REFERENCES sleep(id) ON UPDATE CASCADE ON DELETE CASCADE,
+    start TEXT,
+    end TEXT,
+    activity_level REAL
+);
+CREATE INDEX IF NOT EXISTS sleep_movement_sleep ON sleep_movement (sleep_id);
+CREATE TABLE IF NOT EXISTS hr_data (
+    id INTEGER PRIMARY KEY,
+    daily_statistics_id INTEGER
+        REFERENCES daily_statistics(id) ON UPDATE CASCADE ON DELETE CASCADE,
+    event_time TEXT,
+    hr_value INTEGER
+);
+CREATE INDEX IF NOT EXISTS hr_data_day ON hr_data (daily_statistics_id, event_time);
+CREATE TABLE IF NOT EXISTS movement_data (
+    id INTEGER PRIMARY KEY,
+    daily_statistics_id INTEGER
+        REFERENCES daily_statistics(id) ON UPDATE CASCADE ON DELETE CASCADE,
+    event_time TEXT,
+    movement REAL
+);
+CREATE INDEX IF NOT EXISTS movement_data_day ON movement_data (daily_statistics_id, event_time);
+CREATE TABLE IF NOT EXISTS hr_series (
+    daily_statistics_id INTEGER PRIMARY KEY
+        REFERENCES daily_statistics(id) ON UPDATE CASCADE ON DELETE CASCADE,
+    samples BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS movement_series (
+    daily_statistics_id INTEGER PRIMARY KEY
+        REFERENCES daily_statistics(id) ON UPDATE CASCADE ON DELETE CASCADE,
+    samples BLOB NOT NULL
+);
+"""
+
+
+class SQLiteDatabase(StorageBackend):
+    """
+    A wellness database in a local SQLite file.
+
+    The database is opened in WAL mode with ``synchronous=NORMAL``, so that
+    a commit does not wait for the whole database to be synced and readers
+    are not blocked by an ingest. Timestamps are stored as ISO 8601 text
+    (``YYYY-MM-DD HH:MM:SS``), which sorts chronologically.
+    """
+
+    def __init__(self, path, compact=False):
+        """
+        Opens (and, if necessary, creates) a wellness database.
+
+        :param path: Path to the database file.
+        :type path: str
+        :param compact: See :class:`StorageBackend`.
+        :type compact: bool
+        """
+        self.path = path
+        self._statements = {}
+        super(SQLiteDatabase, self).__init__(compact)
+
+    def connect(self):
+        self.connection = sqlite3.connect(self.path)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.execute("PRAGMA journal_mode = WAL")
+        self.connection.execute("PRAGMA synchronous = NORMAL")
+        self.connection.executescript(_SQLITE_SCHEMA)
+
+    INSERT_IGNORE = "INSERT OR IGNORE"
+
+    def _cursor(self):
+        # sqlite3 cursors are not context managers
+        return closing(self.connection.cursor())
+
+    def _sql(self, sql):
+        statement = self._statements.get(sql)
+        if statement is None:
+            statement = self._statements[sql] = sql.replace("%s", "?")
+        return statement
+
+    def _execute(self, cursor, sql, args):
+        cursor.execute(self._sql(sql), args)
+
+    def _executemany(self, cursor, sql, rows):
+        cursor.executemany(self._sql(sql), rows)
+
+
+# the same text representations as sqlite3's default adapters, which are
+# deprecated as of Python 3.12
+sqlite3.register_adapter(datetime, lambda value: value.isoformat(" "))
+sqlite3.register_adapter(date, lambda value: value.isoformat())
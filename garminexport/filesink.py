@@ -0,0 +1,215 @@
+"""
+Module that archives daily wellness data as compressed files, as an
+alternative to storing it in a database (see :mod:`garminexport.database`).
+
+A :class:`FileSink` writes the documents of every wellness kind (see
+:attr:`garminexport.garminclient.WELLNESS_KINDS`) to one gzip-compressed
+newline-delimited JSON file per kind and month::
+
+    <directory>/heart_rate/2019-03.ndjson.gz
+    <directory>/sleep/2019-03.ndjson.gz
+    ...
+    <directory>/index.json
+
+Every line holds one day's document as ``{"date": "YYYY-MM-DD", "data":
+{...}}``. Days are appended as they arrive, so that a backfill streams
+straight to disk: every day is written as a complete gzip member of its
+own. ``index.json``, which lists the days present for every kind so that
+they are not written again, is replaced atomically every
+:attr:`INDEX_EVERY` days or :attr:`INDEX_INTERVAL` seconds (whichever comes
+first) and when the sink is closed. A run that is killed leaves at most a
+truncated member at the end of a file, which the next run that appends to
+the file cuts off, and which :func:`read_documents` skips; the days that
+were written since the index was last saved are written again and read
+back once.
+
+Example of use:
+    with FileSink("wellness") as sink:
+        for day, documents in client.get_wellness_range(start, end):
+            sink.write(day, documents)
+"""
+import gzip
+import json
+import logging
+import os
+import tempfile
+import time
+import zlib
+
+from garminexport import jsonutil
+
+log = logging.getLogger(__name__)
+
+index_file = "index.json"
+"""The name of the index of days present in a sink's directory."""
+
+INDEX_EVERY = 50
+"""The number of written days after which the index is saved."""
+
+INDEX_INTERVAL = 10.0
+"""The number of seconds after which the index of written days is saved."""
+
+
+class FileSink(object):
+    """
+    A directory of monthly, per-kind, compressed wellness data files.
+    """
+
+    def __init__(self, directory, compresslevel=6, index_every=INDEX_EVERY,
+                 index_interval=INDEX_INTERVAL):
+        """
+        Opens (and, if necessary, creates) a wellness data directory.
+
+        :param directory: The directory to write to.
+        :type directory: str
+        :param compresslevel: The gzip compression level (1-9).
+        :type compresslevel: int
+        :param index_every: See :attr:`INDEX_EVERY`.
+        :type index_every: int
+        :param index_interval: See :attr:`INDEX_INTERVAL`.
+        :type index_interval: float
+        """
+        self.directory = directory
+        self.compresslevel = compresslevel
+        self.index_every = index_every
+        self.index_interval = index_interval
+        # the days written since the index was saved, and when it was
+        self._unindexed = 0
+        self._indexed_at = time.monotonic()
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        self.days = {}
+        index_path = os.path.join(directory, index_file)
+        if os.path.exists(index_path):
+            with open(index_path) as f:
+                self.days = dict((kind, set(days))
+                                 for kind, days in json.load(f).items())
+        # the files that have been checked for a truncated tail
+        self._checked = set()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def path(self, kind, month):
+        """Returns the path of the file of a kind and month (``YYYY-MM``)."""
+        return os.path.join(self.directory, kind, month + ".ndjson.gz")
+
+    def write(self, day, documents):
+        """
+        Appends the wellness documents of a day. Kinds without data for the
+        day, and kinds of which the day is already present, are skipped.
+
+        :param day: The day.
+        :type day: :class:`datetime.date`
+        :param documents: The day's documents by wellness kind.
+        :type documents: dict
+        """
+        date = day.isoformat()
+        written = False
+        for kind, document in documents.items():
+            if document is None or date in self.days.get(kind, ()):
+                continue
+            member = gzip.compress(
+                b'{"date":"' + date.encode("ascii") + b'","data":' +
+                jsonutil.dumps(document) + b'}\n', self.compresslevel)
+            with open(self._file(kind, date[:7]), "ab") as f:
+                f.write(member)
+            self.days.setdefault(kind, set()).add(date)
+            written = True
+        if written:
+            self._unindexed += 1
+            if self._unindexed >= self.index_every or \
+                    time.monotonic() - self._indexed_at >= self.index_interval:
+                self._save_index()
+
+    def _file(self, kind, month):
+        path = self.path(kind, month)
+        if path in self._checked:
+            return path
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                data = f.read()
+            end = 0
+            for end, _ in _members(data):
+                pass
+            if end < len(data):
+                # the tail of an interrupted run, which would make the
+                # members appended after it unreadable
+                log.warning("dropping %d bytes of incomplete data from %s",
+                            len(data) - end, path)
+                with open(path, "r+b") as f:
+                    f.truncate(end)
+        self._checked.add(path)
+        return path
+
+    def _save_index(self):
+        index = dict((kind, sorted(days)) for kind, days in self.days.items())
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(index, f, indent=1, sort_keys=True)
+            os.rename(tmp_path, os.path.join(self.directory, index_file))
+        except Exception:
+            os.remove(tmp_path)
+            raise
+        self._unindexed = 0
+        self._indexed_at = time.monotonic()
+
+    def close(self):
+        if self._unindexed:
+            self._save_index()
+
+
+def _members(data):
+    # yields the end offset and contents of every complete gzip member
+    view = memoryview(data)
+    offset = 0
+    while offset < len(data):
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        try:
+            content = decompressor.decompress(view[offset:])
+        except zlib.error:
+            return
+        if not decompressor.eof:
+            return
+        offset = len(data) - len(decompressor.unused_data)
+        yield offset, content
+
+
+def read_documents(directory, kind):
+    """
+    Reads back the documents of a wellness kind from a :class:`FileSink`
+    directory, month by month. Days that were written more than once are
+    read once, and an incomplete member at the end of a file is skipped.
+
+    :param directory: The directory of the sink.
+    :type directory: str
+    :param kind: The wellness kind.
+    :type kind: str
+    :rtype: generator of tuples of `(str, dict)` (day and document)
+    """
+    kind_dir = os.path.join(directory, kind)
+    if not os.path.isdir(kind_dir):
+        return
+    seen = set()
+    for name in sorted(os.listdir(kind_dir)):
+        if not name.endswith(".ndjson.gz"):
+            continue
+        path = os.path.join(kind_dir, name)
+        with open(path, "rb") as f:
+            data = f.read()
+        end = 0
+        for end, content in _members(data):
+            for line in content.splitlines():
+                entry = jsonutil.loads(line)
+                if entry["date"] not in seen:
+                    seen.add(entry["date"])
+                    yield entry["date"], entry["data"]
+        if end < len(data):
+            log.warning("skipping %d bytes of incomplete data in %s",
+                        len(data) - end, path)
@@ -3,26 +3,66 @@
 A module for authenticating against and communicating with selected
 parts of the Garmin Connect REST API.
 """
+import collections
+import itertools
 import json
 import logging
 import os
 import re
-import requests
 import sys
-import zipfile
-import dateutil
-import dateutil.parser
+import threading
+import time
 import os.path
+from contextlib import contextmanager
+from datetime import timedelta
 from io import BytesIO
 from functools import wraps
 from builtins import range
+from garminexport import jsonutil, metrics
+from garminexport.activity import Activity
+from garminexport.singleflight import SingleFlight
+from garminexport.timeutil import parse_utc_timestamp
 
 log = logging.getLogger(__name__)
 
 logging.getLogger("requests").setLevel(logging.ERROR)
 
-SSO_LOGIN_URL = "https://sso.garmin.com/sso/login"
-GARMIN_API_URL = "https://connect.garmin.com/modern/proxy"
+# the service locations can be overridden through the environment, for
+# example to run against a local stand-in (see benchmarks/mockserver.py)
+SSO_LOGIN_URL = os.getenv("GARMIN_SSO_LOGIN_URL", "https://sso.garmin.com/sso/login")
+GARMIN_CONNECT_URL = os.getenv("GARMIN_CONNECT_URL", "https://connect.garmin.com")
+GARMIN_API_URL = GARMIN_CONNECT_URL + "/modern/proxy/"
+
+WELLNESS_KINDS = collections.OrderedDict([
+    ("sleep", "get_daily_sleep_data"),
+    ("heart_rate", "get_daily_hr_data"),
+    ("movement", "get_daily_movement"),
+    ("user_summary", "get_user_summary"),
+])
+"""The kinds of daily wellness data and the :class:`GarminClient` methods
+that fetch them (see :meth:`GarminClient.get_wellness_range`)."""
+
+class ActivityExistsError(Exception):
+    """
+    Raised by :meth:`GarminClient.upload_activity` when Garmin Connect
+    rejects an upload as a duplicate of an already existing activity.
+
+    :ivar activity_id: Identifier of the existing activity (if reported).
+    """
+    def __init__(self, message, activity_id=None):
+        super(ActivityExistsError, self).__init__(message)
+        self.activity_id = activity_id
+
+class _NotModified(object):
+    def __repr__(self):
+        return "NOT_MODIFIED"
+
+NOT_MODIFIED = _NotModified()
+"""
+Returned in place of a resource by a :class:`GarminClient` with
+``validators`` when the server reports that the resource hasn't changed
+since it was last fetched.
+"""
 
 def require_session(client_function):
     @wraps(client_function)
@@ -59,12 +99,24 @@ class GarminClient(object):
     :type username: str
     :param password: Garmin Connect account password.
     :type password: str
+    :param rate_limiter: If given, every request first takes a token from
+        this limiter, which may be shared with other clients.
+    :type rate_limiter: :class:`garminexport.ratelimit.RateLimiter`
     """
-    def __init__(self, username, password, user=None):
+    def __init__(self, username, password, user=None, rate_limiter=None):
         self.username = username
         self.password = password
         self.user = user
+        self.rate_limiter = rate_limiter
+        # an optional mapping of URLs to (etag, last_modified) validators.
+        # when set, GETs of known URLs are made conditional (and may return
+        # NOT_MODIFIED) and the validators of new responses are recorded
+        self.validators = None
         self.session = None
+        # concurrent GETs of the same URL share a single request
+        self._flight = SingleFlight()
+        # per-thread state, see unconditional()
+        self._local = threading.local()
 
     def __enter__(self):
         self.connect()
@@ -74,6 +126,9 @@ class GarminClient(object):
         self.disconnect()
 
     def connect(self):
+        # requests is imported on first use, so that programs that never
+        # talk to Garmin Connect (or only print --help) start quickly
+        import requests
         self.session = requests.Session()
         if self.password != None:
             self._authenticate()
@@ -91,11 +146,11 @@ class GarminClient(object):
             "embed": "false"
         }
         request_params = {
-            "service": "https://connect.garmin.com/modern"
+            "service": GARMIN_CONNECT_URL + "/modern"
         }
 
-        auth_response = self.session.post(
-            SSO_LOGIN_URL, params=request_params, data=form_data)
+        auth_response = self._request(
+            "POST", SSO_LOGIN_URL, params=request_params, data=form_data)
         log.debug("Got auth response: %s", auth_response.text)
         if auth_response.status_code != 200:
             raise ValueError("authentication failure: did you enter valid credentials?")
@@ -103,11 +158,11 @@ class GarminClient(object):
         log.debug("Auth ticket url: '%s'", auth_ticket_url)
 
         log.info("Claiming auth ticket ...")
-        response = self.session.get(auth_ticket_url)
+        response = self._request("GET", auth_ticket_url)
         if response.status_code != 200:
             raise RuntimeError("auth failure: failed to claim auth ticket: %s: %d\n%s" % (auth_ticket_url, response.status_code, response.text))
 
-        self.session.get('https://connect.garmin.com/legacy/session')
+        self._request("GET", GARMIN_CONNECT_URL + '/legacy/session')
 
     """
     Extracts an authentication ticket URL from the response of an
@@ -117,7 +172,7 @@ class GarminClient(object):
     :param auth_response: HTML response from an auth form submission.
     """
     def _extract_auth_ticket_url(self, auth_response):
-        match = re.search(r'response_url\s*=\s*"(https:[^"]+)"', auth_response)
+        match = re.search(r'response_url\s*=\s*"(https?:[^"]+)"', auth_response)
         if not match:
             raise RuntimeError("auth failure: unable to extract auth ticket URL. did you provide a correct username/password?")
         auth_ticket_url = match.group(1).replace("\\", "")
@@ -129,18 +184,54 @@ class GarminClient(object):
 
     :returns: The full list of activity identifiers (along with their
         starting timestamps).
-    :rtype: tuples of (int, datetime)
+    :rtype: list of :class:`garminexport.activity.Activity` (which behave
+        as tuples of (int, datetime))
     """
     @require_session
     def list_activities(self):
-        ids = []
-        batch_size = 100
-        for start_index in range(0, sys.maxsize, batch_size):
-            next_batch = self._fetch_activity_ids_and_ts(start_index, batch_size)
+        return list(self.iter_activities())
+
+    """
+    Iterate over the activity ids stored by the logged in user, along with
+    their starting timestamps, most recent activity first. Activities are
+    fetched lazily, one batch at a time, so a caller that only needs the
+    newest activities can stop early without listing the whole account.
+
+    :param batch_size: The number of activities to fetch per request.
+    :type batch_size: int
+    :param start_index: The index of the first activity to list.
+    :type start_index: int
+    :rtype: generator of :class:`garminexport.activity.Activity` (which
+        behave as tuples of (int, datetime))
+    """
+    @require_session
+    def iter_activities(self, batch_size=100, start_index=0):
+        for entry in self.iter_activity_entries(batch_size, start_index):
+            yield Activity(int(entry["activityId"]),
+                           parse_utc_timestamp(entry["startTimeGMT"]))
+
+    """
+    Iterate over the activity list entries of the logged in user, most
+    recent activity first, as returned by the activity search (that is,
+    JSON dicts with the activity's id, name, type, start time, distance,
+    duration and other summary fields).
+
+    :param batch_size: The number of activities to fetch per request.
+    :type batch_size: int
+    :param start_index: The index of the first activity to list.
+    :type start_index: int
+    :rtype: generator of dict
+    """
+    @require_session
+    def iter_activity_entries(self, batch_size=100, start_index=0):
+        for start_index in range(start_index, sys.maxsize, batch_size):
+            next_batch = self._fetch_activity_entries(start_index, batch_size)
             if not next_batch:
                 break
-            ids.extend(next_batch)
-        return ids
+            for entry in next_batch:
+                yield entry
+            if len(next_batch) < batch_size:
+                break
 
     """
     Return a sequence of activity ids (along with their starting
@@ -161,43 +252,137 @@ class GarminClient(object):
     """
     @require_session
     def _fetch_activity_ids_and_ts(self, start_index, max_limit=100):
+        entries = []
+        for activity in self._fetch_activity_entries(start_index, max_limit):
+            id = int(activity["activityId"])
+            timestamp_utc = parse_utc_timestamp(activity["startTimeGMT"])
+            entries.append( (id, timestamp_utc) )
+        return entries
+
+    @require_session
+    def _fetch_activity_entries(self, start_index, max_limit=100):
         log.debug("fetching activities {} through {} ...".format(start_index, start_index+max_limit-1))
-        response = self.session.get(GARMIN_API_URL + "activitylist-service/activities/search/activities", params={"start": start_index, "limit": max_limit})
+        response = self._request("GET", GARMIN_API_URL + "activitylist-service/activities/search/activities", params={"start": start_index, "limit": max_limit})
         if response.status_code != 200:
             raise Exception(u"failed to fetch activities {} to {} types: {}\n{}".format(start_index, (start_index+max_limit-1), response.status_code, response.text))
-        activities = json.loads(response.text)
+        activities = jsonutil.loads(response.content)
         if not activities:
             return []
-
-        entries = []
-        for activity in activities:
-            id = int(activity["activityId"])
-            timestamp_utc = dateutil.parser.parse(activity["startTimeGMT"])
-            timestamp_utc = timestamp_utc.replace(tzinfo=dateutil.tz.tzutc())
-            entries.append( (id, timestamp_utc) )
-        log.debug("got {} activities.".format(len(entries)))
-        return entries
+        log.debug("got {} activities.".format(len(activities)))
+        return activities
 
     @require_session
     def get_daily_sleep_data(self, request_date):
-        daily_sleep_url = GARMIN_API_URL + "/wellness-service/wellness/dailySleepData/{}?date={}&nonSleepBufferMinutes=60".format(self.user, request_date)
+        daily_sleep_url = GARMIN_API_URL + "wellness-service/wellness/dailySleepData/{}?date={}&nonSleepBufferMinutes=60".format(self.user, request_date)
         return self.get_json_data(daily_sleep_url)
 
     @require_session
     def get_daily_hr_data(self, request_date):
-        daily_hr_url = GARMIN_API_URL + "/wellness-service/wellness/dailyHeartRate/{}?date={}&_=1532359756927".format(self.user, request_date)
+        daily_hr_url = GARMIN_API_URL + "wellness-service/wellness/dailyHeartRate/{}?date={}&_=1532359756927".format(self.user, request_date)
         return self.get_json_data(daily_hr_url)
 
     @require_session
     def get_daily_movement(self, request_date):
-        daily_movement_url = GARMIN_API_URL + "/wellness-service/wellness/dailyMovement/{}?calendarDate={}&_=1532359756928".format(self.user, request_date)
+        daily_movement_url = GARMIN_API_URL + "wellness-service/wellness/dailyMovement/{}?calendarDate={}&_=1532359756928".format(self.user, request_date)
         return self.get_json_data(daily_movement_url)
 
     @require_session
     def get_user_summary(self, request_date):
-        user_summary_url = GARMIN_API_URL + "/usersummary-service/usersummary/daily/{}?calendarDate={}&_=1532359756925".format(self.user, request_date)
+        user_summary_url = GARMIN_API_URL + "usersummary-service/usersummary/daily/{}?calendarDate={}&_=1532359756925".format(self.user, request_date)
         return self.get_json_data(user_summary_url)
 
+    """
+    Fetch the daily wellness data of a range of days.
+
+    The wellness and user summary services serve the documents of
+    :attr:`WELLNESS_KINDS` one day at a time (their multi-day ``stats``
+    variants only return aggregates), so the per-day requests of the range
+    are made concurrently instead (see :meth:`get_wellness_days`). Days are
+    yielded in order, as soon as all of their documents have been fetched,
+    with a bounded number of requests in flight, so that a long backfill
+    can be consumed (and stored) while it is being fetched.
+
+    :param start: The first day.
+    :type start: :class:`datetime.date`
+    :param end: The last day (inclusive).
+    :type end: :class:`datetime.date`
+    :param kinds: The kinds of data to fetch. Default: all of
+        :attr:`WELLNESS_KINDS`.
+    :type kinds: list of str
+    :param workers: The maximum number of concurrent requests.
+    :type workers: int
+    :param return_exceptions: If true, a request that fails yields its
+        exception in place of the document rather than raising it.
+    :type return_exceptions: bool
+    :returns: Pairs of a day and a dict of its documents by kind (a
+        document is :obj:`None` if the day has no data of that kind).
+    :rtype: generator of tuples of `(date, dict)`
+    """
+    @require_session
+    def get_wellness_range(self, start, end, kinds=None, workers=4, return_exceptions=False):
+        kinds = list(kinds or WELLNESS_KINDS)
+        for kind in kinds:
+            if kind not in WELLNESS_KINDS:
+                raise ValueError("unknown wellness kind: {}".format(kind))
+        jobs = ((start + timedelta(i), kind)
+                    for i in range((end - start).days + 1) for kind in kinds)
+        return self.get_wellness_days(jobs, workers, return_exceptions)
+
+    """
+    Fetch the daily wellness documents of given days and kinds, such as
+    the gaps left in a range by an earlier run. The requests are made
+    concurrently, as by :meth:`get_wellness_range`.
+
+    :param jobs: Pairs of a day and a kind of :attr:`WELLNESS_KINDS`,
+        ordered by day.
+    :type jobs: iterable of tuples of `(date, str)`
+    :param workers: The maximum number of concurrent requests.
+    :type workers: int
+    :param return_exceptions: If true, a request that fails yields its
+        exception in place of the document rather than raising it.
+    :type return_exceptions: bool
+    :returns: Pairs of a day and a dict of its requested documents by kind.
+    :rtype: generator of tuples of `(date, dict)`
+    """
+    @require_session
+    def get_wellness_days(self, jobs, workers=4, return_exceptions=False):
+        from concurrent.futures import ThreadPoolExecutor
+        jobs = iter(jobs)
+        window = max(2 * workers, len(WELLNESS_KINDS))
+        pending = collections.deque()
+        executor = ThreadPoolExecutor(max_workers=workers)
+        try:
+            day, documents = None, {}
+            while True:
+                # keep the window of in-flight requests full, in day order
+                for request_day, kind in itertools.islice(
+                        jobs, window - len(pending)):
+                    if kind not in WELLNESS_KINDS:
+                        raise ValueError("unknown wellness kind: {}".format(kind))
+                    fetch = getattr(self, WELLNESS_KINDS[kind])
+                    pending.append((request_day, kind, executor.submit(
+                        fetch, request_day.isoformat())))
+                if not pending:
+                    break
+                request_day, kind, future = pending.popleft()
+                if request_day != day and day is not None:
+                    yield day, documents
+                    documents = {}
+                day = request_day
+                try:
+                    documents[kind] = future.result()
+                except Exception as e:
+                    if not return_exceptions:
+                        raise
+                    log.warning("failed to fetch %s data for %s: %s", kind, day, e)
+                    documents[kind] = e
+            if day is not None:
+                yield day, documents
+        finally:
+            for _, _, future in pending:
+                future.cancel()
+            executor.shutdown(wait=True)
+
     """
     Return a summary about a given activity. The
     summary contains several statistics, such as duration, GPS starting
@@ -206,13 +391,18 @@ class GarminClient(object):
 
     :param activity_id: Activity identifier.
     :type activity_id: int
-    :returns: The activity summary as a JSON dict.
+    :param raw: If true, the undecoded response body is returned.
+    :type raw: bool
+    :returns: The activity summary as a JSON dict (or as UTF-8 encoded
+        JSON bytes if ``raw`` is set).
     :rtype: dict
     """
     @require_session
-    def get_activity_summary(self, activity_id):
+    def get_activity_summary(self, activity_id, raw=False):
         activity_summary_url = GARMIN_API_URL + "activity-service/activity/{}".format(activity_id)
-        return get_json_data(activity_summary_url)
+        if raw:
+            return self.get_raw_data(activity_summary_url)
+        return self.get_json_data(activity_summary_url)
 
     """
     Return a JSON representation of a given activity including
@@ -221,13 +411,18 @@ class GarminClient(object):
 
     :param activity_id: Activity identifier.
     :type activity_id: int
-    :returns: The activity details as a JSON dict.
+    :param raw: If true, the undecoded response body is returned.
+    :type raw: bool
+    :returns: The activity details as a JSON dict (or as UTF-8 encoded
+        JSON bytes if ``raw`` is set).
     :rtype: dict
     """
     @require_session
-    def get_activity_details(self, activity_id):
+    def get_activity_details(self, activity_id, raw=False):
         activity_details_url = GARMIN_API_URL + "activity-service-1.3/json/activityDetails/{}".format(activity_id)
-        return get_json_url(activity_details_url)
+        if raw:
+            return self.get_raw_data(activity_details_url)
+        return self.get_json_data(activity_details_url)
 
     """
     Return a GPX (GPS Exchange Format) representation of a
@@ -273,23 +468,48 @@ class GarminClient(object):
     :param activity_id: Activity identifier.
     :type activity_id: int
     :returns: A tuple of the file type (e.g. 'fit', 'tcx', 'gpx') and
-        its contents, or :obj:`(None,None)` if no file is found.
+        its contents, or :obj:`(None,None)` if no file is found (or
+        :obj:`(None,NOT_MODIFIED)` if the file is unchanged since it was
+        last fetched, see ``validators``).
     :rtype: (str, str)
     """
     def get_original_activity(self, activity_id):
-        response = self.session.get(GARMIN_API_URL + "download-service/files/activity/{}".format(activity_id))
-        if response.status_code == 404:
+        response = self._get(GARMIN_API_URL + "download-service/files/activity/{}".format(activity_id))
+        if response is None:
             return (None, None)
-        if response.status_code != 200:
-            raise Exception(u"Failed to get original activity file for {}: {}\n{}".format(activity_id, response.status_code, response.text))
+        if response is NOT_MODIFIED:
+            return (None, NOT_MODIFIED)
 
-        zip = zipfile.ZipFile(StringIO(response.content), mode="r")
+        import zipfile
+        zip = zipfile.ZipFile(BytesIO(response.content), mode="r")
         for path in zip.namelist():
             fn, ext = os.path.splitext(path)
             if fn==str(activity_id):
                 return ext[1:], zip.open(path).read()
         return (None,None)
 
+    """
+    Stream the original file bundle of an activity (the zip archive served
+    by the download service, which holds the uploaded file(s) of the
+    activity, such as its ``.fit`` file) to a file, without holding it in
+    memory. The file is replaced atomically, once the download completes.
+
+    :param activity_id: Activity identifier.
+    :type activity_id: int
+    :param dest: The path to write the bundle to.
+    :type dest: str
+    :param chunk_size: The number of bytes to read at a time.
+    :type chunk_size: int
+    :returns: ``dest``, or :obj:`None` if the activity has no original file
+        (or :obj:`NOT_MODIFIED` if the bundle is unchanged since it was last
+        fetched, see ``validators``).
+    :rtype: str
+    """
+    @require_session
+    def download_original_activity(self, activity_id, dest, chunk_size=65536):
+        url = GARMIN_API_URL + "download-service/files/activity/{}".format(activity_id)
+        return self._get(url, dest=dest, chunk_size=chunk_size)
+
     """
     Return a FIT representation for a given activity. If the activity
     doesn't have a FIT source (for example, if it was entered manually
@@ -304,22 +524,127 @@ class GarminClient(object):
     """
     def get_activity_fit(self, activity_id):
         fmt, orig_file = self.get_original_activity(activity_id)
+        if orig_file is NOT_MODIFIED:
+            return NOT_MODIFIED
         return orig_file if fmt=='fit' else None
 
     def get_json_data(self, get_url):
-        data = json.loads(self.get_data(get_url))
-        return data
+        # decode straight from the response bytes (see garminexport.jsonutil)
+        content = self.get_raw_data(get_url)
+        if content is None or content is NOT_MODIFIED:
+            return content
+        with metrics.registry.timer("stage_duration_seconds", stage="json.decode"):
+            return jsonutil.loads(content)
 
     @require_session
     def get_data(self, get_url):
-        response = self.session.get(get_url)
-        if response.status_code in (404, 204):
-            log.info("Response unavailable for request {}".format(get_url))
-            return None
-        if response.status_code != 200:
-            raise Exception(u"Failed to fetch json {}\n{}".format(response.status_code, response.text))
+        response = self._get(get_url)
+        if response is None or response is NOT_MODIFIED:
+            return response
         return response.text
 
+    @require_session
+    def get_raw_data(self, get_url):
+        response = self._get(get_url)
+        if response is None or response is NOT_MODIFIED:
+            return response
+        return response.content
+
+    def _request(self, method, url, **kwargs):
+        # all API requests go through here to record per-endpoint metrics
+        endpoint = metrics.endpoint_name(url)
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire()
+        start = time.perf_counter()
+        try:
+            response = self.session.request(method, url, **kwargs)
+        except Exception:
+            metrics.registry.inc("http_requests_total", endpoint=endpoint, status="error")
+            raise
+        metrics.registry.observe("http_request_duration_seconds", time.perf_counter() - start, endpoint=endpoint)
+        metrics.registry.inc("http_requests_total", endpoint=endpoint, status=response.status_code)
+        if not kwargs.get("stream"):
+            # streamed bodies are counted by whoever reads them
+            metrics.registry.inc("http_response_bytes_total", len(response.content), endpoint=endpoint)
+        return response
+
+    def _get(self, get_url, dest=None, chunk_size=65536):
+        # the (immutable) response, and with it its content, is shared by
+        # all callers that ask for the URL while it is being fetched. with a
+        # dest, the body is streamed to that file instead (and the file is
+        # shared by the callers that ask for the URL to be written there)
+        conditional = not getattr(self._local, "unconditional", False)
+        return self._flight.do((get_url, dest, conditional), self._fetch, get_url, dest, chunk_size, conditional)
+
+    def _fetch(self, get_url, dest=None, chunk_size=65536, conditional=True):
+        headers = self._conditional_headers(get_url) if conditional else {}
+        response = self._request("GET", get_url, headers=headers, stream=dest is not None)
+        try:
+            if response.status_code == 304:
+                log.debug("Not modified: {}".format(get_url))
+                return NOT_MODIFIED
+            if response.status_code in (404, 204):
+                log.info("Response unavailable for request {}".format(get_url))
+                return None
+            if response.status_code != 200:
+                raise Exception(u"Failed to fetch json {}\n{}".format(response.status_code, response.text))
+            if dest is not None:
+                self._write_body(get_url, response, dest, chunk_size)
+            self._remember_validators(get_url, response)
+            return response if dest is None else dest
+        finally:
+            if dest is not None:
+                response.close()
+
+    def _write_body(self, get_url, response, dest, chunk_size):
+        # replaces dest atomically, once the whole body has been written
+        import tempfile
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(dest)), prefix=".tmp")
+        try:
+            size = 0
+            with os.fdopen(fd, "wb") as f:
+                for chunk in response.iter_content(chunk_size):
+                    f.write(chunk)
+                    size += len(chunk)
+            os.rename(tmp_path, dest)
+        except Exception:
+            os.remove(tmp_path)
+            raise
+        metrics.registry.inc("http_response_bytes_total", size, endpoint=metrics.endpoint_name(get_url))
+
+    """
+    Returns a context manager within which the GETs of the calling thread
+    are not made conditional, even for URLs with known ``validators``. It is
+    meant for resources whose local copy is missing, which a
+    :attr:`NOT_MODIFIED` answer would leave missing. The validators of the
+    responses are still recorded.
+    """
+    @contextmanager
+    def unconditional(self):
+        previous = getattr(self._local, "unconditional", False)
+        self._local.unconditional = True
+        try:
+            yield
+        finally:
+            self._local.unconditional = previous
+
+    def _conditional_headers(self, get_url):
+        headers = {}
+        if self.validators is not None:
+            etag, last_modified = self.validators.get(get_url) or (None, None)
+            if etag:
+                headers["If-None-Match"] = etag
+            if last_modified:
+                headers["If-Modified-Since"] = last_modified
+        return headers
+
+    def _remember_validators(self, get_url, response):
+        if self.validators is not None:
+            etag = response.headers.get("ETag")
+            last_modified = response.headers.get("Last-Modified")
+            if etag or last_modified:
+                self.validators[get_url] = (etag, last_modified)
+
     """
     Upload a GPX, TCX, or FIT file for an activity.
 
@@ -329,12 +654,17 @@ class GarminClient(object):
     :param description: Optional description for the activity on Garmin Connect
     :param activity_type: Optional activityType key (lowercase: e.g. running, cycling)
     :param private: If true, then activity will be set as private.
+    :param compress: If true, the file is gzip-compressed on the fly while
+        being uploaded. Only use this if the upload endpoint accepts
+        gzip-compressed files.
+    :param progress: Optional callback, called as ``progress(bytes_read, total_bytes)``
+        as the file is being streamed to Garmin Connect.
     :returns: ID of the newly-uploaded activity
     :rtype: int
     """
     @require_session
-    def upload_activity(self, file, format=None, name=None, description=None, activity_type=None, private=None):
-        if isinstance(file, basestring):
+    def upload_activity(self, file, format=None, name=None, description=None, activity_type=None, private=None, compress=False, progress=None):
+        if isinstance(file, str):
             file = open(file, "rb")
 
         fn = os.path.basename(file.name)
@@ -345,14 +675,21 @@ class GarminClient(object):
             else:
                 raise Exception(u"Could not guess file type for {}".format(fn))
 
-        files = dict(data=(fn, file))
-        response = self.session.post(GARMIN_API_URL + "upload-service/upload/.{}".format(format), files=files, headers={"nk": "NT"})
+        # stream the multipart body rather than building it in memory
+        from garminexport.multipart import MultipartEncoder
+        body = MultipartEncoder("data", fn, file, compress=compress, progress=progress)
+        response = self._request("POST", GARMIN_API_URL + "upload-service/upload/.{}".format(format), data=body, headers={"nk": "NT", "Content-Type": body.content_type})
 
         try:
             j = response.json()["detailedImportResult"]
-        except (json.JSONDecodeException, KeyError):
+        except (ValueError, KeyError):
             raise Exception(u"Failed to upload {} for activity: {}\n{}".format(format, response.status_code, response.text))
 
+        duplicate = self._duplicate_failure(j["failures"])
+        if duplicate is not None:
+            existing_id = duplicate.get("internalId")
+            raise ActivityExistsError(u"Uploading {} duplicates activity {}".format(fn, existing_id), existing_id)
+
         if len(j["failures"]) or len(j["successes"]) < 1:
             raise Exception(u"Failed to upload {} for activity: {}\n{}".format(format, response.status_code, j["failures"]))
 
@@ -369,8 +706,24 @@ class GarminClient(object):
         if data:
             data['activityId'] = activity_id
             encoding_headers = {"Content-Type": "application/json; charset=UTF-8"} # see Tapiriik
-            response = self.session.put("https://connect.garmin.com/proxy/activity-service/activity/{}".format(activity_id), data=json.dumps(data), headers=encoding_headers)
+            response = self._request("PUT", GARMIN_CONNECT_URL + "/proxy/activity-service/activity/{}".format(activity_id), data=json.dumps(data), headers=encoding_headers)
             if response.status_code != 204:
                 raise Exception(u"failed to set metadata for activity {}: {}\n{}".format(activity_id, response.status_code, response.text))
 
         return activity_id
+
+    """
+    Returns the "Duplicate Activity" failure (message code 202) among the
+    failures of an upload, if any. Such a failure carries the id of the
+    existing activity as its ``internalId``.
+
+    :param failures: The ``failures`` of an upload's ``detailedImportResult``.
+    :returns: The duplicate failure or :obj:`None` if the failures do not
+        indicate a duplicate.
+    :rtype: dict
+    """
+    def _duplicate_failure(self, failures):
+        for failure in failures:
+            if any(message.get("code") == 202 for message in failure.get("messages") or []):
+                return failure
+        return None
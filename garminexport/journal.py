@@ -0,0 +1,317 @@
+"""
+Module with a persistent job journal that makes (long) backup runs
+resumable.
+
+The journal is a SQLite database (by default stored as :attr:`journal_file`
+in the backup directory) that records the work of a backup run as it is
+planned and carried out:
+
+  - the activity listing, along with a cursor (the listing index to continue
+    from), so that an interrupted listing is picked up where it stopped,
+  - the plan: every activity that needs to be backed up and the export
+    formats that it is missing, and
+  - the state of every activity/format job (``pending``, ``done`` or
+    ``failed``).
+
+A run that finds a complete plan in the journal skips the listing and the
+comparison with the backup directory altogether and continues with the
+pending jobs, in a deterministic order (newest or oldest activity first).
+Once every job has been carried out, the journal is cleared, so the next
+run plans anew.
+
+Example of use:
+    with Journal("activities/.journal.sqlite") as journal:
+        if not journal.is_planned(formats):
+            journal.reset(formats)
+            journal.add_listing(client.iter_activities())
+            journal.plan("activities")
+        for activity, formats in journal.pending():
+            download(client, activity, retryer, "activities", formats)
+            journal.mark(activity, formats, "done")
+"""
+from datetime import datetime, timezone
+import calendar
+import json
+import logging
+import sqlite3
+import time
+
+from garminexport.activity import Activity
+from garminexport.planner import BackupIndex
+
+log = logging.getLogger(__name__)
+
+journal_file = ".journal.sqlite"
+"""The default name of the journal database in the backup directory."""
+
+orders = ("newest", "oldest")
+"""The orders in which planned activities can be processed."""
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS listing (
+    activity_id INTEGER PRIMARY KEY,
+    start_time REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS jobs (
+    activity_id INTEGER NOT NULL,
+    format TEXT NOT NULL,
+    start_time REAL NOT NULL,
+    state TEXT NOT NULL DEFAULT 'pending',
+    error TEXT,
+    updated REAL,
+    PRIMARY KEY (activity_id, format)
+);
+CREATE INDEX IF NOT EXISTS jobs_by_start_time ON jobs (start_time);
+"""
+
+LISTING_COMMIT_INTERVAL = 100
+"""The number of listed activities between two commits of the listing."""
+
+
+def _to_epoch(timestamp):
+    return calendar.timegm(timestamp.utctimetuple()) + \
+        timestamp.microsecond / 1e6
+
+
+def _to_activity(activity_id, epoch):
+    return Activity(activity_id, datetime.fromtimestamp(epoch, timezone.utc))
+
+
+class Journal(object):
+    """
+    A SQLite-backed journal of a backup run's listing, plan and progress.
+    """
+
+    def __init__(self, path):
+        """
+        Opens (and, if necessary, creates) a journal database.
+
+        :param path: Path to the journal database file.
+        :type path: str
+        """
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript(_SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        if self.connection:
+            self.connection.close()
+            self.connection = None
+
+    def _get(self, key, default=None):
+        row = self.connection.execute(
+            "SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def _set(self, key, value):
+        self.connection.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+            (key, json.dumps(value)))
+
+    def reset(self, export_formats):
+        """
+        Discards the journal's contents and starts a new run for the given
+        export formats.
+
+        :param export_formats: The export formats of the new run.
+        :type export_formats: list of str
+        """
+        with self.connection:
+            for table in ("meta", "listing", "jobs"):
+                self.connection.execute("DELETE FROM {}".format(table))
+            self._set("formats", sorted(export_formats))
+            self._set("listing_cursor", 0)
+            self._set("started", time.time())
+
+    def is_started(self, export_formats):
+        """True if the journal holds a run for the given export formats."""
+        return self._get("formats") == sorted(export_formats)
+
+    def is_planned(self, export_formats):
+        """True if the journal holds a complete plan for the given export
+        formats (and the planning phase can be skipped)."""
+        return self.is_started(export_formats) and self._get("planned", False)
+
+    @property
+    def listing_cursor(self):
+        """The listing index that the activity listing continues from."""
+        return self._get("listing_cursor", 0)
+
+    def add_listing(self, activities):
+        """
+        Records listed activities, committing (and advancing the listing
+        cursor) every :attr:`LISTING_COMMIT_INTERVAL` activities and when
+        the listing fails. Activities are expected to continue from
+        :attr:`listing_cursor`; activities that have been recorded before
+        are ignored.
+
+        :param activities: Activity tuples `(id, starttime)`, in listing
+          order.
+        :type activities: iterable of tuples of `(int, datetime)`
+        :return: The total number of activities in the listing.
+        :rtype: int
+        """
+        cursor = self.listing_cursor
+        batch = []
+        try:
+            for activity in activities:
+                batch.append((activity[0], _to_epoch(activity[1])))
+                if len(batch) >= LISTING_COMMIT_INTERVAL:
+                    cursor = self._add_listing_batch(batch, cursor)
+                    batch = []
+        finally:
+            # keep what was listed before a failure
+            cursor = self._add_listing_batch(batch, cursor)
+        with self.connection:
+            self._set("listed", True)
+        return self.listing_count()
+
+    def _add_listing_batch(self, batch, cursor):
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR IGNORE INTO listing (activity_id, start_time) "
+                "VALUES (?, ?)", batch)
+            cursor += len(batch)
+            self._set("listing_cursor", cursor)
+        return cursor
+
+    @property
+    def is_listed(self):
+        """True if the activity listing has been recorded completely."""
+        return self._get("listed", False)
+
+    def listing_count(self):
+        """Returns the number of recorded activities."""
+        return self.connection.execute(
+            "SELECT COUNT(*) FROM listing").fetchone()[0]
+
+    def listing(self):
+        """
+        Returns the recorded activity listing.
+
+        :rtype: list of tuples of `(int, datetime)`
+        """
+        return [_to_activity(activity_id, epoch) for activity_id, epoch in
+                self.connection.execute(
+                    "SELECT activity_id, start_time FROM listing")]
+
+    def plan(self, backup_dir, refresh=()):
+        """
+        Plans a job for every export format that a listed activity is
+        missing in the backup directory, and marks the plan as complete.
+        The listing is streamed past a :class:`BackupIndex` of the backup
+        directory, so planning runs in bounded memory.
+
+        :param backup_dir: Destination directory for exported activities.
+        :type backup_dir: str
+        :param refresh: Ids of activities to export in every format, also
+          if they are backed up already (for example, because they have
+          changed since).
+        :type refresh: set of int
+        :return: The number of activities that need to be backed up.
+        :rtype: int
+        """
+        formats = self._get("formats")
+        planned = 0
+        with BackupIndex(backup_dir) as index:
+            batch = []
+            for activity, missing in index.missing(
+                    self._iter_listing(), formats, refresh):
+                planned += 1
+                batch.extend((activity[0], export_format, _to_epoch(activity[1]))
+                             for export_format in missing)
+                if len(batch) >= LISTING_COMMIT_INTERVAL:
+                    self._add_jobs(batch)
+                    batch = []
+            self._add_jobs(batch)
+        with self.connection:
+            self._set("planned", True)
+        return planned
+
+    def _iter_listing(self, page_size=LISTING_COMMIT_INTERVAL):
+        # pages through the listing by id, so that jobs can be added while
+        # the listing is being read
+        last_id = -1
+        while True:
+            rows = self.connection.execute(
+                "SELECT activity_id, start_time FROM listing "
+                "WHERE activity_id > ? ORDER BY activity_id LIMIT ?",
+                (last_id, page_size)).fetchall()
+            if not rows:
+                return
+            for activity_id, epoch in rows:
+                yield _to_activity(activity_id, epoch)
+            last_id = rows[-1][0]
+
+    def _add_jobs(self, jobs):
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR IGNORE INTO jobs (activity_id, format, start_time) "
+                "VALUES (?, ?, ?)", jobs)
+
+    def pending(self, order="newest"):
+        """
+        Returns the activities with pending jobs, along with their pending
+        export formats.
+
+        :param order: ``newest`` or ``oldest`` activity first.
+        :type order: str
+        :rtype: list of tuples of `((int, datetime), list of str)`
+        """
+        if order not in orders:
+            raise ValueError("unknown order: {}".format(order))
+        rows = self.connection.execute(
+            "SELECT activity_id, start_time, format FROM jobs "
+            "WHERE state = 'pending' ORDER BY start_time {0}, activity_id {0}"
+            .format("DESC" if order == "newest" else "ASC"))
+        activities = []
+        for activity_id, epoch, export_format in rows:
+            if not activities or activities[-1][0][0] != activity_id:
+                activities.append((_to_activity(activity_id, epoch), []))
+            activities[-1][1].append(export_format)
+        return activities
+
+    def mark(self, activity, export_formats, state, error=None):
+        """
+        Sets the state of an activity's jobs.
+
+        :param activity: An activity tuple `(id, starttime)`
+        :param export_formats: The export formats of the jobs.
+        :param state: ``done``, ``failed`` or ``pending``.
+        :param error: The error of a failed job.
+        """
+        with self.connection:
+            self.connection.executemany(
+                "UPDATE jobs SET state = ?, error = ?, updated = ? "
+                "WHERE activity_id = ? AND format = ?",
+                [(state, str(error) if error is not None else None,
+                  time.time(), activity[0], export_format)
+                 for export_format in export_formats])
+
+    def counts(self):
+        """Returns the number of jobs in every state."""
+        return dict(self.connection.execute(
+            "SELECT state, COUNT(*) FROM jobs GROUP BY state"))
+
+    def finish(self):
+        """
+        Clears the journal if the run has no pending jobs left.
+
+        :return: True if the journal was cleared.
+        """
+        if self.counts().get("pending"):
+            return False
+        with self.connection:
+            for table in ("meta", "listing", "jobs"):
+                self.connection.execute("DELETE FROM {}".format(table))
+        return True
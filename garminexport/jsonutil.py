@@ -0,0 +1,83 @@
+"""
+Pluggable JSON encoding/decoding.
+
+Uses `orjson <https://github.com/ijl/orjson>`_ when it is installed and falls
+back to the standard library :mod:`json` module otherwise. The backend can be
+forced by setting the ``GARMINEXPORT_JSON`` environment variable to ``json``
+or ``orjson``.
+
+Pretty-printed documents (see :attr:`pretty_indent`) are indented by 4
+spaces, which only the standard library can encode (and slowly, in pure
+Python). Setting the ``GARMINEXPORT_JSON_INDENT`` environment variable to
+``2`` lets ``orjson`` encode them as well, several times faster.
+
+All functions work on UTF-8 encoded bytes, so that API responses can be
+decoded straight from the response body and documents can be written to
+disk without intermediate string copies.
+
+``orjson`` (which in turn imports a number of standard library modules) is
+only imported when the first document is encoded or decoded.
+"""
+import importlib.util
+import json
+import os
+
+_orjson_installed = importlib.util.find_spec("orjson") is not None
+orjson = None
+
+backend = os.getenv("GARMINEXPORT_JSON", "orjson" if _orjson_installed else "json")
+"""Name of the JSON backend in use (``orjson`` or ``json``)."""
+
+if backend not in ("orjson", "json"):
+    raise ValueError("unrecognized GARMINEXPORT_JSON backend: {}".format(backend))
+if backend == "orjson" and not _orjson_installed:
+    raise ValueError("GARMINEXPORT_JSON=orjson but orjson is not installed")
+
+_indent = os.getenv("GARMINEXPORT_JSON_INDENT", "4")
+if not _indent.isdigit():
+    raise ValueError("unrecognized GARMINEXPORT_JSON_INDENT: {}".format(_indent))
+
+pretty_indent = int(_indent)
+"""Number of spaces that pretty-printed documents are indented by."""
+
+
+def _load_orjson():
+    global orjson
+    if orjson is None:
+        import orjson as module
+        orjson = module
+    return orjson
+
+
+def loads(data):
+    """
+    Decodes a JSON document.
+
+    :param data: A JSON document as UTF-8 encoded bytes (or str).
+    :type data: bytes
+    :return: The decoded document.
+    """
+    if backend == "orjson":
+        return _load_orjson().loads(data)
+    if isinstance(data, bytes):
+        data = data.decode("utf-8")
+    return json.loads(data)
+
+
+def dumps(obj, indent=None):
+    """
+    Encodes a JSON document as UTF-8 encoded bytes. Non-ASCII characters
+    are not escaped.
+
+    :param obj: The document to encode.
+    :param indent: Number of spaces to indent nested structures by, or
+      `None` for a compact document. The ``orjson`` backend only supports
+      an indent of 2; other indents are handled by the standard library.
+    :type indent: int
+    :rtype: bytes
+    """
+    if backend == "orjson" and indent in (None, 2):
+        orjson = _load_orjson()
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else 0)
+    return json.dumps(obj, ensure_ascii=False, indent=indent,
+                      separators=None if indent else (",", ":")).encode("utf-8")
@@ -0,0 +1,187 @@
+"""
+Module with a persistent ledger of the wellness data that has been stored,
+so that a range of days can be repaired without being fetched again as a
+whole.
+
+The ledger is a SQLite database that records, for every day and kind of
+wellness data (see :attr:`garminexport.garminclient.WELLNESS_KINDS`), the
+outcome of its last ingestion:
+
+  - ``ok``: the document was fetched and stored,
+  - ``empty``: Garmin Connect had no data of that kind for the day (it
+    answered 404 or 204), and
+  - ``failed``: the request or the insert of the document failed.
+
+The gaps of a range are the days and kinds that are either ``failed`` or
+not in the ledger at all; only those need to be fetched again. Days that
+were ``empty`` when they were fetched soon after the fact (within
+:attr:`EMPTY_RECHECK_DAYS`) are gaps as well, since a device may sync its
+data late. A day and kind that is ``ok`` stays so: it is never recorded as
+``empty`` or ``failed`` afterwards.
+
+Example of use:
+    with Ledger("wellness_ledger.sqlite") as ledger:
+        gaps = ledger.gaps(start, end)
+        for day, documents in client.get_wellness_days(gaps):
+            ...
+            ledger.record(day, statuses)
+"""
+from datetime import date, datetime, timedelta
+import logging
+import sqlite3
+import time
+
+from garminexport.garminclient import WELLNESS_KINDS
+
+log = logging.getLogger(__name__)
+
+ledger_file = ".wellness_ledger.sqlite"
+"""The default name of the ledger database in a wellness data directory."""
+
+OK = "ok"
+EMPTY = "empty"
+FAILED = "failed"
+
+EMPTY_RECHECK_DAYS = 3
+"""An ``empty`` day is fetched again unless it was fetched at least this
+many days after the day itself."""
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS ingestion (
+    day TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    status TEXT NOT NULL,
+    error TEXT,
+    updated REAL,
+    PRIMARY KEY (day, kind)
+);
+"""
+
+
+def status_of(document):
+    """
+    Returns the ledger status of a document as yielded by
+    :meth:`garminexport.garminclient.GarminClient.get_wellness_days` (with
+    ``return_exceptions`` set).
+
+    :rtype: str
+    """
+    if document is None:
+        return EMPTY
+    if isinstance(document, Exception):
+        return FAILED
+    return OK
+
+
+class Ledger(object):
+    """
+    A SQLite-backed ledger of the ingestion status of every wellness day
+    and kind.
+    """
+
+    def __init__(self, path):
+        """
+        Opens (and, if necessary, creates) a ledger database.
+
+        :param path: Path to the ledger database file.
+        :type path: str
+        """
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript(_SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        if self.connection:
+            self.connection.close()
+            self.connection = None
+
+    def record(self, day, statuses, errors=None):
+        """
+        Records the outcome of the ingestion of a day.
+
+        :param day: The day.
+        :type day: :class:`datetime.date`
+        :param statuses: The status (``ok``, ``empty`` or ``failed``) of
+          every ingested kind.
+        :type statuses: dict
+        :param errors: Optional error messages of failed kinds.
+        :type errors: dict
+        """
+        errors = errors or {}
+        now = time.time()
+        with self.connection:
+            # an ok day and kind (whose data is stored) is never downgraded
+            self.connection.executemany(
+                "INSERT INTO ingestion (day, kind, status, error, updated) "
+                "VALUES (?, ?, ?, ?, ?) ON CONFLICT (day, kind) DO UPDATE SET "
+                "status = excluded.status, error = excluded.error, "
+                "updated = excluded.updated "
+                "WHERE ingestion.status != 'ok' OR excluded.status = 'ok'",
+                [(day.isoformat(), kind, status, errors.get(kind), now)
+                 for kind, status in statuses.items()])
+
+    def status(self, day, kind):
+        """
+        Returns the recorded status of a day and kind, or :obj:`None` if it
+        has not been ingested.
+
+        :rtype: str
+        """
+        row = self.connection.execute(
+            "SELECT status FROM ingestion WHERE day = ? AND kind = ?",
+            (day.isoformat(), kind)).fetchone()
+        return row[0] if row else None
+
+    def gaps(self, start, end, kinds=None,
+             empty_recheck_days=EMPTY_RECHECK_DAYS):
+        """
+        Returns the days and kinds of a range that have not been ingested,
+        whose ingestion failed, or that were empty when they were last
+        fetched within ``empty_recheck_days`` of the day.
+
+        :param start: The first day.
+        :type start: :class:`datetime.date`
+        :param end: The last day (inclusive).
+        :type end: :class:`datetime.date`
+        :param kinds: The kinds of data to consider. Default: all of
+          :attr:`garminexport.garminclient.WELLNESS_KINDS`.
+        :type kinds: list of str
+        :param empty_recheck_days: See :attr:`EMPTY_RECHECK_DAYS`. If
+          :obj:`None`, every ``empty`` day is a gap (so that only ``ok``
+          days and kinds are left out).
+        :type empty_recheck_days: int
+        :return: Pairs of a day and a kind, ordered by day (as taken by
+          :meth:`garminexport.garminclient.GarminClient.get_wellness_days`).
+        :rtype: list of tuples of `(date, str)`
+        """
+        kinds = list(kinds or WELLNESS_KINDS)
+        done = set()
+        for day, kind, status, updated in self.connection.execute(
+                "SELECT day, kind, status, updated FROM ingestion "
+                "WHERE day BETWEEN ? AND ? AND status != ?",
+                (start.isoformat(), end.isoformat(), FAILED)):
+            if status == EMPTY and not self._empty_is_final(
+                    day, updated, empty_recheck_days):
+                continue
+            done.add((day, kind))
+        gaps = []
+        for i in range((end - start).days + 1):
+            day = start + timedelta(i)
+            for kind in kinds:
+                if (day.isoformat(), kind) not in done:
+                    gaps.append((day, kind))
+        return gaps
+
+    @staticmethod
+    def _empty_is_final(day, updated, empty_recheck_days):
+        if empty_recheck_days is None:
+            return False
+        fetched = date.fromtimestamp(updated)
+        day = datetime.strptime(day, "%Y-%m-%d").date()
+        return fetched - day >= timedelta(days=empty_recheck_days)
@@ -0,0 +1,254 @@
+"""
+Module with a lightweight, in-process metrics registry used to instrument
+backup and ingest runs.
+
+The registry keeps labeled counters and histograms, for example per-endpoint
+request counts, latencies and bytes transferred, retry counts and backoff
+time, and per-stage timings. At the end of a run the collected metrics can
+be rendered as a human-readable summary, written as a JSON report, or
+written in the Prometheus text exposition format (suitable for the
+node_exporter textfile collector).
+
+Example of use:
+    from garminexport.metrics import registry
+
+    registry.inc("http_requests_total", endpoint="activity-service/activity/{id}")
+    with registry.timer("stage_duration_seconds", stage="download.write"):
+        write_files()
+"""
+import functools
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+                   10.0, 30.0, 60.0)
+"""Default histogram bucket upper bounds (in seconds)."""
+
+PROMETHEUS_PREFIX = "garminexport_"
+"""Prefix of all metric names in Prometheus output."""
+
+
+def endpoint_name(url):
+    """
+    Returns a low-cardinality endpoint label for a request URL: the path
+    below the API proxy, with the query string dropped and ids and dates
+    replaced by placeholders. For example,
+    ``https://connect.garmin.com/modern/proxy/activity-service/activity/123``
+    becomes ``activity-service/activity/{id}``.
+
+    :param url: Request URL.
+    :type url: str
+    :rtype: str
+    """
+    path = url.split("?", 1)[0]
+    path = re.sub(r"^https?://[^/]+", "", path)
+    path = re.sub(r"^/(modern/)?proxy/?", "", path).lstrip("/")
+    path = re.sub(r"/\d{4}-\d{2}-\d{2}(?=/|$)", "/{date}", path)
+    path = re.sub(r"/\d+(?=/|$)", "/{id}", path)
+    return path
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join('{}="{}"'.format(
+        name, str(value).replace("\\", "\\\\").replace('"', '\\"'))
+        for name, value in pairs) + "}"
+
+
+class Histogram(object):
+    """A cumulative histogram of observed values."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+
+    def to_dict(self):
+        return {"count": self.count, "sum": self.sum, "max": self.max,
+                "buckets": dict(zip([str(b) for b in self.buckets],
+                                    self.counts))}
+
+
+class Metrics(object):
+    """A thread-safe registry of labeled counters and histograms."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        self.started = time.time()
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+            self.started = time.time()
+
+    def inc(self, name, value=1, **labels):
+        """Increments a counter by ``value``."""
+        key = _label_key(labels)
+        with self._lock:
+            series = self.counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        """Adds an observation to a histogram."""
+        key = _label_key(labels)
+        with self._lock:
+            series = self.histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram()
+            histogram.observe(value)
+
+    @contextmanager
+    def timer(self, name, **labels):
+        """A context manager that observes the duration (in seconds) of its
+        block in a histogram."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def timed(self, name, **labels):
+        """A decorator that observes the duration of every call to the
+        decorated function in a histogram."""
+        def decorator(function):
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                with self.timer(name, **labels):
+                    return function(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def to_dict(self):
+        """Returns all metrics as a JSON-serializable dict."""
+        with self._lock:
+            return {
+                "elapsed_seconds": time.time() - self.started,
+                "counters": {
+                    name: [dict(labels=dict(key), value=value)
+                           for key, value in sorted(series.items())]
+                    for name, series in self.counters.items()},
+                "histograms": {
+                    name: [dict(labels=dict(key), **histogram.to_dict())
+                           for key, histogram in sorted(series.items())]
+                    for name, series in self.histograms.items()},
+            }
+
+    def summary(self):
+        """Returns a human-readable summary of all metrics."""
+        lines = ["run time: {:.1f}s".format(time.time() - self.started)]
+        with self._lock:
+            for name in sorted(self.counters):
+                for key, value in sorted(self.counters[name].items()):
+                    lines.append("{}{} {:g}".format(
+                        name, _format_labels(key), value))
+            for name in sorted(self.histograms):
+                for key, h in sorted(self.histograms[name].items()):
+                    lines.append(
+                        "{}{} count={} total={:.3f} mean={:.3f} max={:.3f}"
+                        .format(name, _format_labels(key), h.count, h.sum,
+                                h.sum / h.count if h.count else 0.0, h.max))
+        return "\n".join(lines)
+
+    def prometheus(self):
+        """Returns all metrics in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            for name in sorted(self.counters):
+                full_name = PROMETHEUS_PREFIX + name
+                lines.append("# TYPE {} counter".format(full_name))
+                for key, value in sorted(self.counters[name].items()):
+                    lines.append("{}{} {:g}".format(
+                        full_name, _format_labels(key), value))
+            for name in sorted(self.histograms):
+                full_name = PROMETHEUS_PREFIX + name
+                lines.append("# TYPE {} histogram".format(full_name))
+                for key, h in sorted(self.histograms[name].items()):
+                    for bound, count in zip(h.buckets, h.counts):
+                        lines.append("{}_bucket{} {}".format(
+                            full_name, _format_labels(key, [("le", bound)]),
+                            count))
+                    lines.append("{}_bucket{} {}".format(
+                        full_name, _format_labels(key, [("le", "+Inf")]),
+                        h.count))
+                    lines.append("{}_sum{} {:g}".format(
+                        full_name, _format_labels(key), h.sum))
+                    lines.append("{}_count{} {}".format(
+                        full_name, _format_labels(key), h.count))
+        return "\n".join(lines) + "\n"
+
+    def write_json(self, path):
+        """Writes a JSON report of all metrics to a file."""
+        _write_atomically(path, json.dumps(self.to_dict(), indent=4))
+
+    def write_prometheus(self, path):
+        """Writes all metrics to a Prometheus textfile. The file is replaced
+        atomically, so a collector never reads a partially written file."""
+        _write_atomically(path, self.prometheus())
+
+
+def _write_atomically(path, content):
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(content)
+        os.chmod(tmp_path, 0o644)
+        os.rename(tmp_path, path)
+    except Exception:
+        os.remove(tmp_path)
+        raise
+
+
+registry = Metrics()
+"""The default registry that the garminexport modules report to."""
+
+
+def add_arguments(parser):
+    """Adds the ``--stats``, ``--stats-json`` and ``--prometheus-textfile``
+    options to a command-line :class:`argparse.ArgumentParser`."""
+    parser.add_argument(
+        "--stats", action='store_true',
+        help="Print a summary of request, retry and stage metrics at exit.")
+    parser.add_argument(
+        "--stats-json", metavar="FILE", type=str,
+        help="Write a JSON report of the run's metrics to FILE at exit.")
+    parser.add_argument(
+        "--prometheus-textfile", metavar="FILE", type=str,
+        help=("Write the run's metrics to FILE in Prometheus text format "
+              "at exit (for the node_exporter textfile collector)."))
+
+
+def report(args, log):
+    """Reports the metrics of the default registry as requested by the
+    options added by :func:`add_arguments`."""
+    if args.stats:
+        log.info("run statistics:\n%s", registry.summary())
+    if args.stats_json:
+        registry.write_json(args.stats_json)
+    if args.prometheus_textfile:
+        registry.write_prometheus(args.prometheus_textfile)
@@ -0,0 +1,147 @@
+"""
+A streaming ``multipart/form-data`` encoder for file uploads.
+
+Unlike passing ``files=...`` to :mod:`requests`, which builds the entire
+request body in memory, a :class:`MultipartEncoder` produces the body in
+fixed-size chunks as it is being sent, so the memory used per upload stays
+constant regardless of file size.
+"""
+import io
+import os
+import uuid
+import zlib
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+"""Number of file bytes read per chunk."""
+
+
+def _remaining_size(fileobj):
+    """Returns the number of bytes left to read from a file object, or
+    ``None`` if it cannot be determined without reading."""
+    try:
+        return os.fstat(fileobj.fileno()).st_size - fileobj.tell()
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        pass
+    try:
+        position = fileobj.tell()
+        fileobj.seek(0, os.SEEK_END)
+        size = fileobj.tell() - position
+        fileobj.seek(position)
+        return size
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        return None
+
+
+class MultipartEncoder(object):
+    """
+    Encodes a single file as a ``multipart/form-data`` request body that can
+    be passed as ``data`` to :mod:`requests`. The encoder is both file-like
+    (:meth:`read`) and iterable, and reports its length when it is known in
+    advance, so that requests sends it with a ``Content-Length`` header.
+    Otherwise (when compressing) the body is sent with chunked transfer
+    encoding.
+
+    Example of use:
+        with open("activity.fit", "rb") as f:
+            body = MultipartEncoder("data", "activity.fit", f)
+            session.post(url, data=body,
+                         headers={"Content-Type": body.content_type})
+    """
+
+    def __init__(self, field_name, filename, fileobj,
+                 content_type="application/octet-stream", compress=False,
+                 progress=None, chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        :param field_name: Name of the form field holding the file.
+        :type field_name: str
+        :param filename: File name to report for the file.
+        :type filename: str
+        :param fileobj: A binary file object to read the file from.
+        :param content_type: Content type of the file part.
+        :type content_type: str
+        :param compress: If `True`, the file is gzip-compressed on the fly
+          and ``.gz`` is appended to its file name. Only use this for
+          endpoints that accept gzip-compressed files.
+        :type compress: bool
+        :param progress: Optional callback, called as
+          ``progress(bytes_read, total_bytes)`` every time a chunk of the
+          file has been read (``total_bytes`` may be `None`).
+        :type progress: `function(int, int)`
+        :param chunk_size: Number of file bytes to read at a time.
+        :type chunk_size: int
+        """
+        self.boundary = uuid.uuid4().hex
+        self.content_type = "multipart/form-data; boundary=" + self.boundary
+        if compress:
+            filename += ".gz"
+            content_type = "application/gzip"
+        self._header = (
+            u'--{}\r\nContent-Disposition: form-data; name="{}"; '
+            u'filename="{}"\r\nContent-Type: {}\r\n\r\n'.format(
+                self.boundary, field_name, filename.replace('"', "%22"),
+                content_type)).encode("utf-8")
+        self._trailer = u"\r\n--{}--\r\n".format(self.boundary).encode("utf-8")
+        self._fileobj = fileobj
+        self._size = _remaining_size(fileobj)
+        self._compress = compress
+        self._progress = progress
+        self._chunk_size = chunk_size
+        self._chunks = self._generate()
+        self._buffer = b""
+
+    def __len__(self):
+        """The total body length, or 0 if it is not known in advance."""
+        if self._compress or self._size is None:
+            return 0
+        return len(self._header) + self._size + len(self._trailer)
+
+    def __bool__(self):
+        return True
+
+    __nonzero__ = __bool__
+
+    def __iter__(self):
+        if self._buffer:
+            buffered, self._buffer = self._buffer, b""
+            yield buffered
+        for chunk in self._chunks:
+            yield chunk
+
+    def _generate(self):
+        yield self._header
+        compressor = zlib.compressobj(9, zlib.DEFLATED, 16 + zlib.MAX_WBITS) \
+            if self._compress else None
+        bytes_read = 0
+        while True:
+            chunk = self._fileobj.read(self._chunk_size)
+            if not chunk:
+                break
+            bytes_read += len(chunk)
+            if self._progress is not None:
+                self._progress(bytes_read, self._size)
+            if compressor is not None:
+                chunk = compressor.compress(chunk)
+            if chunk:
+                yield chunk
+        if compressor is not None:
+            yield compressor.flush()
+        yield self._trailer
+
+    def read(self, size=-1):
+        """
+        Reads up to ``size`` bytes of the body (or the remainder of the
+        body if ``size`` is negative).
+
+        :rtype: bytes
+        """
+        if size is None or size < 0:
+            data = self._buffer + b"".join(self._chunks)
+            self._buffer = b""
+            return data
+        while len(self._buffer) < size:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                break
+            self._buffer += chunk
+        data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
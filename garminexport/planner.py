@@ -0,0 +1,163 @@
+"""
+Module that plans backups in bounded memory, also for accounts with a very
+long history.
+
+Planning compares the activity listing with the export files in the backup
+directory. Rather than holding both in memory (a set of all activities and
+a list of all file names, see :func:`garminexport.backup.missing_exports`),
+the file names are first loaded into a :class:`BackupIndex`: a sorted,
+on-disk (SQLite) index of the backup directory and its ``.not_found``
+entries. The activity listing is then streamed past the index in batches,
+each batch being looked up with a single query, and the activities that
+miss exports are yielded as they are found. Memory use is thereby bounded
+by the batch size and SQLite's page cache, whatever the size of the
+account, and only the planned work itself is kept by the caller.
+
+Example of use:
+    with BackupIndex("activities") as index:
+        for activity, formats in index.missing(
+                client.iter_activities(), ["fit", "json_summary"]):
+            ...
+"""
+import logging
+import os
+import sqlite3
+
+from garminexport.backup import export_filename, not_found_file
+
+log = logging.getLogger(__name__)
+
+BATCH_SIZE = 1000
+"""The number of file names or export file lookups per statement."""
+
+_SQLITE_MAX_VARIABLES = 999
+"""The lowest limit on the number of parameters of a SQLite statement."""
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    name TEXT PRIMARY KEY
+) WITHOUT ROWID;
+"""
+
+
+class BackupIndex(object):
+    """
+    A sorted, on-disk index of the export files that are backed up (or
+    listed as not found) in a backup directory.
+    """
+
+    def __init__(self, backup_dir, path=""):
+        """
+        Indexes a backup directory.
+
+        :param backup_dir: Destination directory for exported activities.
+        :type backup_dir: str
+        :param path: Path to the index database. Default: a private,
+          temporary on-disk database that is removed when it is closed.
+        :type path: str
+        """
+        self.backup_dir = backup_dir
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript(_SCHEMA)
+        self.listed = 0
+        self.refresh()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        if self.connection:
+            self.connection.close()
+            self.connection = None
+
+    def _add(self, names):
+        batch = []
+        for name in names:
+            batch.append((name,))
+            if len(batch) >= BATCH_SIZE:
+                self.connection.executemany(
+                    "INSERT OR IGNORE INTO files (name) VALUES (?)", batch)
+                batch = []
+        self.connection.executemany(
+            "INSERT OR IGNORE INTO files (name) VALUES (?)", batch)
+
+    def refresh(self):
+        """
+        (Re)loads the backup directory's file names and ``.not_found``
+        entries into the index.
+
+        :return: The number of indexed names.
+        :rtype: int
+        """
+        with self.connection:
+            self.connection.execute("DELETE FROM files")
+            with os.scandir(self.backup_dir) as entries:
+                self._add(entry.name for entry in entries)
+            not_found = os.path.join(self.backup_dir, not_found_file)
+            if os.path.isfile(not_found):
+                with open(not_found, mode="r") as f:
+                    self._add(line.strip() for line in f)
+        count = self.connection.execute(
+            "SELECT COUNT(*) FROM files").fetchone()[0]
+        log.debug("indexed %d backed up (or not found) files in %s",
+                  count, self.backup_dir)
+        return count
+
+    def missing(self, activities, export_formats, refresh=()):
+        """
+        Streams the activities that haven't been backed up in a given set
+        of export formats (see :func:`garminexport.backup.missing_exports`),
+        in the order of ``activities``. The number of activities that were
+        looked up is kept in :attr:`listed`.
+
+        :param activities: Activity tuples `(id, starttime)`, such as the
+          (newest-first) listing of an account.
+        :type activities: iterable of tuples of `(int, datetime)`
+        :param export_formats: The export formats to back up.
+        :type export_formats: list of str
+        :param refresh: Ids of activities to export in every format, also
+          if they are backed up already, or a function that returns the ids
+          to refresh among a list of activity ids (which is called as the
+          activities are looked up, such as
+          :meth:`garminexport.changes.ChangeStore.changed`).
+        :type refresh: set of int or callable
+        :return: Pairs of an activity and its missing export formats, in
+          the order of ``export_formats``.
+        :rtype: generator of tuples of `((int, datetime), list of str)`
+        """
+        self.listed = 0
+        batch_size = max(1, min(
+            BATCH_SIZE, _SQLITE_MAX_VARIABLES // max(1, len(export_formats))))
+        batch = []
+        for activity in activities:
+            self.listed += 1
+            batch.append(activity)
+            if len(batch) >= batch_size:
+                for item in self._missing(batch, export_formats, refresh):
+                    yield item
+                batch = []
+        for item in self._missing(batch, export_formats, refresh):
+            yield item
+
+    def _missing(self, activities, export_formats, refresh):
+        names = [[export_filename(activity, f) for f in export_formats]
+                 for activity in activities]
+        wanted = [name for activity_names in names for name in activity_names]
+        if not wanted:
+            return
+        present = set(row[0] for row in self.connection.execute(
+            "SELECT name FROM files WHERE name IN ({})".format(
+                ",".join("?" * len(wanted))), wanted))
+        if callable(refresh):
+            refresh = refresh([activity[0] for activity in activities])
+        for activity, activity_names in zip(activities, names):
+            if activity[0] in refresh:
+                yield activity, list(export_formats)
+                continue
+            formats = [f for f, name in zip(export_formats, activity_names)
+                       if name not in present]
+            if formats:
+                yield activity, formats
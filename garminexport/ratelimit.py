@@ -0,0 +1,58 @@
+"""
+Module with a thread-safe token-bucket rate limiter, used to cap the request
+rate towards Garmin Connect, also when it is shared by several clients.
+
+Example of use:
+    limiter = RateLimiter(rate=5, burst=10)
+    with GarminClient(username, password, rate_limiter=limiter) as client:
+        ...
+"""
+import threading
+import time
+
+from garminexport.metrics import registry
+
+
+class RateLimiter(object):
+    """
+    A token bucket that admits ``rate`` operations per second on average
+    and up to ``burst`` operations back-to-back.
+    """
+
+    def __init__(self, rate, burst=1):
+        """
+        :param rate: Sustained operations per second.
+        :type rate: float
+        :param burst: Maximum number of operations admitted without delay
+          after an idle period.
+        :type burst: int
+        """
+        if rate <= 0:
+            raise ValueError("rate must be positive: {}".format(rate))
+        self.rate = float(rate)
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Takes a token from the bucket, blocking until one is available.
+        Callers are admitted in the order in which they ask.
+
+        :return: The time (in seconds) spent waiting.
+        :rtype: float
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(float(self.burst),
+                               self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            # the token is reserved right away (possibly running the bucket
+            # into debt), so that the wait happens outside the lock
+            self._tokens -= 1
+            delay = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if delay > 0:
+            registry.inc("rate_limit_wait_seconds_total", delay)
+            time.sleep(delay)
+        return delay
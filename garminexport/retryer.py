@@ -5,6 +5,8 @@ from datetime import timedelta
 import logging
 import time
 
+from garminexport.metrics import registry
+
 log = logging.getLogger(__name__)
 
 class GaveUpError(Exception):
@@ -221,10 +223,14 @@ class Retryer(object):
             elapsed_time = datetime.now() - start
             # should we make another attempt?
             if not self.stop_strategy.should_continue(attempts, elapsed_time):
+                registry.inc('retry_give_ups_total', function=name)
                 raise GaveUpError(
                     '{%s}: gave up after %d failed attempt(s)' %
                     (name, attempts))
             delay = self.delay_strategy.next_delay(attempts)
             log.info('{%s}: waiting %d seconds for next attempt' %
                      (name, delay.total_seconds()))
+            registry.inc('retries_total', function=name)
+            registry.inc('retry_backoff_seconds_total',
+                         delay.total_seconds(), function=name)
             time.sleep(delay.total_seconds())
@@ -0,0 +1,143 @@
+"""
+Module that orders backup work by priority and keeps it within a time
+budget.
+
+The unit of work is a :class:`Job`: one activity exported to one format.
+Jobs are ordered by the priority of their export format first and the
+recency of their activity second, so that by default the original ``.fit``
+files of all activities are backed up (newest first) before the cheaper
+derived formats, and the large ``json_details`` documents come last. A run
+with a time budget thereby ends with the most valuable data backed up,
+rather than with a random mix of partially exported activities.
+
+Example of use:
+    jobs = prioritize(missing_exports(activities, backup_dir, formats))
+    for job in schedule(jobs, TimeBudget(3600)):
+        download(client, job.activity, retryer, backup_dir, [job.export_format])
+"""
+import collections
+import logging
+import time
+
+log = logging.getLogger(__name__)
+
+default_format_priority = [
+    "original", "fit", "json_summary", "gpx", "tcx", "gpx_reduced", "json_details"]
+"""The default export format priority (highest priority first)."""
+
+Job = collections.namedtuple("Job", ["activity", "export_format"])
+"""An activity tuple `(id, starttime)` to be exported to a given format."""
+
+
+def parse_format_priority(value):
+    """
+    Parses a comma-separated export format priority list (as given on the
+    command line). Formats that are left out keep their default relative
+    order, after the listed ones.
+
+    :param value: For example ``fit,json_summary``.
+    :type value: str
+    :rtype: list of str
+    """
+    formats = [f.strip() for f in value.split(",") if f.strip()]
+    for export_format in formats:
+        if export_format not in default_format_priority:
+            raise ValueError("unknown export format: {}".format(export_format))
+    return formats + [f for f in default_format_priority if f not in formats]
+
+
+def prioritize(missing, format_priority=None, order="newest"):
+    """
+    Breaks the missing exports of a set of activities into jobs and orders
+    them by export format priority and then by activity start time.
+
+    :param missing: Activities and the export formats they are missing, as
+      returned by :func:`garminexport.backup.missing_exports` (a dict) or
+      :meth:`garminexport.journal.Journal.pending` (a list of pairs).
+    :type missing: dict or list of tuples of `(activity, list of str)`
+    :param format_priority: Export formats, highest priority first. Default:
+      :attr:`default_format_priority`.
+    :type format_priority: list of str
+    :param order: ``newest`` or ``oldest`` activity first.
+    :type order: str
+    :rtype: list of :class:`Job`
+    """
+    rank = dict((f, i) for i, f in enumerate(
+        format_priority or default_format_priority))
+    items = missing.items() if isinstance(missing, dict) else missing
+    jobs = [Job(activity, export_format)
+            for activity, formats in items for export_format in formats]
+    # two stable sorts: by recency, then by format rank
+    jobs.sort(key=lambda job: (job.activity[1], job.activity[0]),
+              reverse=order == "newest")
+    jobs.sort(key=lambda job: rank.get(job.export_format, len(rank)))
+    return jobs
+
+
+class TimeBudget(object):
+    """
+    A wall-clock budget for a run. The budget keeps a running mean of the
+    time each export format takes, and only admits a job if it is expected
+    to finish within the remaining time.
+    """
+
+    def __init__(self, seconds, clock=time.monotonic):
+        """
+        :param seconds: The length of the budget (from now).
+        :type seconds: float
+        """
+        self.seconds = seconds
+        self.clock = clock
+        self.started = clock()
+        self.durations = {}
+
+    @property
+    def remaining(self):
+        return self.seconds - (self.clock() - self.started)
+
+    def estimate(self, export_format):
+        """The mean duration of jobs of an export format so far (or 0)."""
+        count, total = self.durations.get(export_format, (0, 0.0))
+        return total / count if count else 0.0
+
+    def allows(self, job):
+        """True if a job is expected to finish within the budget."""
+        return self.remaining > self.estimate(job.export_format)
+
+    def record(self, job, duration):
+        count, total = self.durations.get(job.export_format, (0, 0.0))
+        self.durations[job.export_format] = (count + 1, total + duration)
+
+
+def schedule(jobs, budget=None):
+    """
+    Yields jobs in order for as long as the time budget allows. The time
+    that the caller spends between receiving a job and asking for the next
+    one is taken to be the job's duration.
+
+    Jobs that are not expected to fit in the remaining budget are skipped
+    (a cheaper job further down the list may still be run), and the run
+    ends when the budget is spent.
+
+    :param jobs: Prioritized jobs (see :func:`prioritize`).
+    :type jobs: list of :class:`Job`
+    :param budget: Optional time budget.
+    :type budget: :class:`TimeBudget`
+    :rtype: generator of :class:`Job`
+    """
+    clock = budget.clock if budget is not None else time.monotonic
+    skipped = 0
+    for index, job in enumerate(jobs):
+        if budget is not None:
+            if budget.remaining <= 0:
+                skipped += len(jobs) - index
+                break
+            if not budget.allows(job):
+                skipped += 1
+                continue
+        started = clock()
+        yield job
+        if budget is not None:
+            budget.record(job, clock() - started)
+    if skipped:
+        log.info("time budget spent: %d job(s) left for a later run", skipped)
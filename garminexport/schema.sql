@@ -64,4 +64,22 @@ CREATE TABLE IF NOT EXISTS movement_data (
         REFERENCES daily_statistics(id)
         ON UPDATE CASCADE ON DELETE CASCADE,
     PRIMARY KEY(id)
-) ENGINE=INNODB;
\ No newline at end of file
+) ENGINE=INNODB;
+
+CREATE TABLE IF NOT EXISTS hr_series (
+    daily_statistics_id INT NOT NULL,
+    samples MEDIUMBLOB NOT NULL,
+    FOREIGN KEY(daily_statistics_id)
+        REFERENCES daily_statistics(id)
+        ON UPDATE CASCADE ON DELETE CASCADE,
+    PRIMARY KEY(daily_statistics_id)
+) ENGINE=INNODB;
+
+CREATE TABLE IF NOT EXISTS movement_series (
+    daily_statistics_id INT NOT NULL,
+    samples MEDIUMBLOB NOT NULL,
+    FOREIGN KEY(daily_statistics_id)
+        REFERENCES daily_statistics(id)
+        ON UPDATE CASCADE ON DELETE CASCADE,
+    PRIMARY KEY(daily_statistics_id)
+) ENGINE=INNODB;
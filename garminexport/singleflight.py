@@ -0,0 +1,75 @@
+"""
+Module that coalesces concurrent identical calls ("single flight"): while
+a call for a key is in flight, further calls for the same key wait for it
+and share its outcome instead of being made themselves.
+
+:class:`garminexport.garminclient.GarminClient` runs its GETs through a
+:class:`SingleFlight` keyed by URL, so that code paths that happen to ask
+for the same resource at the same time (such as concurrent exports of an
+activity's original file, or overlapping wellness requests) cost a single
+request.
+
+Example of use:
+    flight = SingleFlight()
+    response = flight.do(url, session.get, url)
+"""
+import threading
+
+from garminexport.metrics import registry
+
+
+class _Call(object):
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight(object):
+    """
+    A thread-safe group of calls of which at most one per key is in flight.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, function, *args, **kwargs):
+        """
+        Calls ``function(*args, **kwargs)``, unless a call for the same key
+        is already in flight, in which case its result is waited for and
+        returned (or its exception raised) instead. A call that completes
+        is forgotten: later calls for the key are made anew.
+
+        :param key: Identifies calls that are interchangeable.
+        :type key: hashable
+        :param function: The function to call.
+        :return: The result of the (shared) call.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        if not leader:
+            registry.inc("singleflight_coalesced_total")
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = function(*args, **kwargs)
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def in_flight(self):
+        """Returns the number of calls in flight."""
+        with self._lock:
+            return len(self._calls)
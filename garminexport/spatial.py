@@ -0,0 +1,376 @@
+"""
+Module that maintains a spatial index over the activity tracks stored in a
+backup directory.
+
+Track points are read from exported ``.gpx`` and ``.fit`` files and mapped
+onto a regular grid of tiles (``tile_size`` degrees wide and high). For
+every tile that an activity passes through, the index records the activity
+id together with the time range the activity spent in the tile. Finding all
+activities that passed through a given area is then a range lookup over the
+tiles covering its bounding box, without opening any activity files.
+
+The index is a SQLite database (by default stored as :attr:`tiles_file` in
+the backup directory) and is updated incrementally: only files that are new
+or have changed since the last update are parsed, and the tiles of deleted
+files are dropped.
+"""
+import calendar
+import logging
+import math
+import os
+import sqlite3
+import struct
+import xml.etree.ElementTree as ElementTree
+from datetime import datetime
+
+log = logging.getLogger(__name__)
+
+tiles_file = ".tiles.sqlite"
+"""Default name of the tile index database within a backup directory."""
+
+DEFAULT_TILE_SIZE = 0.01
+"""Default tile width/height in degrees (roughly 1 km in latitude)."""
+
+track_suffixes = (".gpx", ".fit")
+"""Suffixes of the exported files that track points are read from, in order
+of preference when an activity has been exported to several formats."""
+
+_FIT_EPOCH = 631065600
+"""The FIT epoch (1989-12-31T00:00:00Z) in unix epoch seconds."""
+
+_FIT_RECORD_MESSAGE = 20
+_FIT_INVALID_SINT32 = 0x7FFFFFFF
+_SEMICIRCLES_TO_DEGREES = 180.0 / 2 ** 31
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS tiles (
+    ty INTEGER NOT NULL,
+    tx INTEGER NOT NULL,
+    activity_id INTEGER NOT NULL,
+    start_time INTEGER,
+    end_time INTEGER,
+    PRIMARY KEY (ty, tx, activity_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS tiles_activity ON tiles(activity_id);
+CREATE TABLE IF NOT EXISTS sources (
+    activity_id INTEGER PRIMARY KEY,
+    filename TEXT NOT NULL,
+    mtime REAL NOT NULL
+);
+"""
+
+
+def read_gpx_points(path):
+    """
+    Reads the track points of a GPX file.
+
+    :param path: Path to a GPX file.
+    :type path: str
+    :return: A generator of `(lat, lon, epoch_seconds)` tuples. The time
+      is ``None`` for points without a timestamp.
+    :rtype: generator of `(float, float, int)`
+    """
+    time = None
+    for event, element in ElementTree.iterparse(path, events=("end",)):
+        tag = element.tag.rsplit("}", 1)[-1]
+        if tag == "time":
+            time = element.text
+        elif tag == "trkpt":
+            yield (float(element.get("lat")), float(element.get("lon")),
+                   _parse_gpx_time(time))
+            time = None
+            element.clear()
+
+
+def _parse_gpx_time(value):
+    if not value:
+        return None
+    value = value.strip().rstrip("Z").split(".")[0]
+    timestamp = datetime.strptime(value[:19], "%Y-%m-%dT%H:%M:%S")
+    return calendar.timegm(timestamp.timetuple())
+
+
+def read_fit_points(path):
+    """
+    Reads the positions of the ``record`` messages of a FIT file. Only the
+    subset of the FIT protocol needed to locate the ``position_lat``,
+    ``position_long`` and ``timestamp`` fields is decoded; all other
+    messages are skipped.
+
+    :param path: Path to a FIT file.
+    :type path: str
+    :return: A generator of `(lat, lon, epoch_seconds)` tuples.
+    :rtype: generator of `(float, float, int)`
+    """
+    with open(path, mode="rb") as f:
+        data = f.read()
+    if len(data) < 12 or data[8:12] != b".FIT":
+        raise ValueError("not a FIT file: {}".format(path))
+    header_size = data[0]
+    end = header_size + struct.unpack("<I", data[4:8])[0]
+    definitions = {}
+    timestamp = None
+    pos = header_size
+    while pos < end:
+        header = data[pos]
+        pos += 1
+        if header & 0x80:
+            # compressed timestamp header (always a data message)
+            local_type = (header >> 5) & 0x03
+            offset = header & 0x1F
+            if timestamp is not None:
+                timestamp = (timestamp & ~0x1F) + offset + (
+                    0x20 if offset < (timestamp & 0x1F) else 0)
+        elif header & 0x40:
+            # definition message
+            local_type = header & 0x0F
+            endian = ">" if data[pos + 1] == 1 else "<"
+            global_type = struct.unpack(endian + "H", data[pos + 2:pos + 4])[0]
+            num_fields = data[pos + 4]
+            pos += 5
+            fields = []
+            for _ in range(num_fields):
+                fields.append((data[pos], data[pos + 1]))
+                pos += 3
+            size = sum(field_size for _, field_size in fields)
+            if header & 0x20:
+                num_dev_fields = data[pos]
+                pos += 1
+                size += sum(data[pos + 3 * i + 1]
+                            for i in range(num_dev_fields))
+                pos += 3 * num_dev_fields
+            definitions[local_type] = (endian, global_type, fields, size)
+            continue
+        else:
+            local_type = header & 0x0F
+        endian, global_type, fields, size = definitions[local_type]
+        lat = lon = None
+        field_pos = pos
+        for number, field_size in fields:
+            if field_size == 4:
+                if number == 253:
+                    timestamp = struct.unpack(
+                        endian + "I", data[field_pos:field_pos + 4])[0]
+                elif global_type == _FIT_RECORD_MESSAGE and number in (0, 1):
+                    value = struct.unpack(
+                        endian + "i", data[field_pos:field_pos + 4])[0]
+                    if value != _FIT_INVALID_SINT32:
+                        if number == 0:
+                            lat = value * _SEMICIRCLES_TO_DEGREES
+                        else:
+                            lon = value * _SEMICIRCLES_TO_DEGREES
+            field_pos += field_size
+        if lat is not None and lon is not None:
+            yield (lat, lon, timestamp + _FIT_EPOCH
+                   if timestamp is not None else None)
+        pos += size
+
+
+def read_track_points(path):
+    """Reads the track points of a ``.gpx`` or ``.fit`` file (see
+    :func:`read_gpx_points` and :func:`read_fit_points`)."""
+    if path.lower().endswith(".fit"):
+        return read_fit_points(path)
+    return read_gpx_points(path)
+
+
+def _activity_id(filename):
+    """Extracts the activity id from an exported file name
+    (``<timestamp>_<activity_id><suffix>``)."""
+    stem = os.path.splitext(filename)[0]
+    return int(stem.rsplit("_", 1)[1])
+
+
+class TileIndex(object):
+    """
+    A SQLite-backed index that maps map tiles to the activities (and time
+    ranges) that passed through them.
+
+    Example of use:
+        with TileIndex("activities/.tiles.sqlite") as index:
+            index.update("activities")
+            hits = index.query((59.30, 18.00, 59.35, 18.10))
+    """
+
+    def __init__(self, path, tile_size=DEFAULT_TILE_SIZE):
+        """
+        Opens (and, if necessary, creates) a tile index database.
+
+        :param path: Path to the index database file.
+        :type path: str
+        :param tile_size: Tile width/height in degrees. Only used when the
+          index is created; an existing index keeps its tile size.
+        :type tile_size: float
+        """
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript(_SCHEMA)
+        row = self.connection.execute(
+            "SELECT value FROM meta WHERE key = 'tile_size'").fetchone()
+        if row is None:
+            self.connection.execute(
+                "INSERT INTO meta (key, value) VALUES ('tile_size', ?)",
+                (repr(float(tile_size)),))
+            self.connection.commit()
+            self.tile_size = float(tile_size)
+        else:
+            self.tile_size = float(row[0])
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        if self.connection:
+            self.connection.close()
+            self.connection = None
+
+    def tile(self, lat, lon):
+        """Returns the `(ty, tx)` tile coordinates of a position."""
+        return (int(math.floor(lat / self.tile_size)),
+                int(math.floor(lon / self.tile_size)))
+
+    def add(self, activity_id, points):
+        """
+        Replaces the tiles of an activity with the tiles covered by a
+        sequence of track points.
+
+        :param activity_id: Activity identifier.
+        :type activity_id: int
+        :param points: Track points as `(lat, lon, epoch_seconds)` tuples.
+        :type points: iterable of `(float, float, int)`
+        :return: The number of tiles covered by the activity.
+        :rtype: int
+        """
+        count = self._add(activity_id, points)
+        self.connection.commit()
+        return count
+
+    def _add(self, activity_id, points):
+        ranges = {}
+        for lat, lon, time in points:
+            key = self.tile(lat, lon)
+            time_range = ranges.get(key)
+            if time_range is None:
+                ranges[key] = [time, time]
+            elif time is not None:
+                if time_range[0] is None or time < time_range[0]:
+                    time_range[0] = time
+                if time_range[1] is None or time > time_range[1]:
+                    time_range[1] = time
+        self.connection.execute(
+            "DELETE FROM tiles WHERE activity_id = ?", (activity_id,))
+        self.connection.executemany(
+            "INSERT INTO tiles (ty, tx, activity_id, start_time, end_time) "
+            "VALUES (?, ?, ?, ?, ?)",
+            [(ty, tx, activity_id, start, end)
+             for (ty, tx), (start, end) in ranges.items()])
+        return len(ranges)
+
+    def update(self, backup_dir):
+        """
+        Indexes the track files in a backup directory that are new or have
+        been modified since they were last indexed, and removes the tiles of
+        activities whose track files have since been deleted. For activities
+        exported to several track formats, only one file is read (in the
+        order of preference given by :attr:`track_suffixes`).
+
+        :param backup_dir: Backup directory to scan.
+        :type backup_dir: str
+        :return: The number of (re)indexed track files.
+        :rtype: int
+        """
+        indexed = {
+            activity_id: (filename, mtime) for activity_id, filename, mtime
+            in self.connection.execute(
+                "SELECT activity_id, filename, mtime FROM sources")}
+        candidates = {}
+        for entry in os.scandir(backup_dir):
+            suffix = os.path.splitext(entry.name)[1].lower()
+            if suffix not in track_suffixes:
+                continue
+            try:
+                activity_id = _activity_id(entry.name)
+            except (IndexError, ValueError):
+                continue
+            rank = track_suffixes.index(suffix)
+            best = candidates.get(activity_id)
+            if best is None or rank < best[0]:
+                candidates[activity_id] = (rank, entry)
+
+        updated = 0
+        for activity_id, (_, entry) in candidates.items():
+            # what is left of indexed after the scan has been deleted
+            indexed_entry = indexed.pop(activity_id, None)
+            mtime = entry.stat().st_mtime
+            if indexed_entry == (entry.name, mtime):
+                continue
+            try:
+                self._add(activity_id, read_track_points(entry.path))
+            except Exception as e:
+                log.warning("skipping unreadable track %s: %s", entry.name, e)
+                continue
+            self.connection.execute(
+                "INSERT OR REPLACE INTO sources (activity_id, filename, mtime) "
+                "VALUES (?, ?, ?)", (activity_id, entry.name, mtime))
+            updated += 1
+            if updated % 100 == 0:
+                self.connection.commit()
+        self._remove(indexed)
+        self.connection.commit()
+        log.debug("indexed %d track file(s) in %s, removed %d",
+                  updated, backup_dir, len(indexed))
+        return updated
+
+    def _remove(self, activity_ids):
+        # drops the tiles of activities whose track files were deleted
+        for activity_id in activity_ids:
+            self.connection.execute(
+                "DELETE FROM tiles WHERE activity_id = ?", (activity_id,))
+            self.connection.execute(
+                "DELETE FROM sources WHERE activity_id = ?", (activity_id,))
+
+    def query(self, bbox, start=None, end=None):
+        """
+        Returns the candidate activities that have track points within the
+        tiles covering a bounding box. Since matching is done at tile
+        granularity, candidates may have passed just outside the box.
+
+        :param bbox: A `(min_lat, min_lon, max_lat, max_lon)` box.
+        :type bbox: tuple of float
+        :param start: Only include activities that were within the box at
+          or after this time (epoch seconds).
+        :type start: int
+        :param end: Only include activities that were within the box
+          before this time (epoch seconds).
+        :type end: int
+        :return: Dicts with ``activity_id``, ``filename`` and the
+          ``start_time``/``end_time`` (epoch seconds) range spent within the
+          box, ordered by start time.
+        :rtype: list of dict
+        """
+        min_lat, min_lon, max_lat, max_lon = bbox
+        min_ty, min_tx = self.tile(min_lat, min_lon)
+        max_ty, max_tx = self.tile(max_lat, max_lon)
+        sql = ("SELECT t.activity_id, s.filename, MIN(t.start_time), "
+               "MAX(t.end_time) FROM tiles t "
+               "LEFT JOIN sources s ON s.activity_id = t.activity_id "
+               "WHERE t.ty BETWEEN ? AND ? AND t.tx BETWEEN ? AND ?")
+        params = [min_ty, max_ty, min_tx, max_tx]
+        if start is not None:
+            sql += " AND t.end_time >= ?"
+            params.append(start)
+        if end is not None:
+            sql += " AND t.start_time < ?"
+            params.append(end)
+        sql += " GROUP BY t.activity_id ORDER BY MIN(t.start_time)"
+        return [{"activity_id": activity_id, "filename": filename,
+                 "start_time": start_time, "end_time": end_time}
+                for activity_id, filename, start_time, end_time
+                in self.connection.execute(sql, params)]
@@ -0,0 +1,102 @@
+"""
+Module with a compact binary encoding of intraday time series, such as the
+heart rate and movement samples of a day.
+
+A series of `(timestamp, value)` samples is stored as one blob: a small
+header followed by the zlib-compressed deltas between consecutive
+timestamps and between consecutive (scaled integer) values. Samples come at
+regular intervals and values change slowly, so most deltas are repeats of
+a handful of small numbers, which compress to a small fraction of the size
+of the samples stored one row (with its keys and indexes) each.
+
+Example of use:
+    blob = encode([1551398400000, 1551398520000], [60, 62])
+    series = decode(blob)
+    series.timestamps  # array('q', [1551398400000, 1551398520000])
+    series.values      # array('d', [60.0, 62.0])
+"""
+from array import array
+import collections
+import itertools
+import struct
+import sys
+import zlib
+
+Series = collections.namedtuple("Series", ["timestamps", "values"])
+"""A decoded series: timestamps as an ``array('q')`` (in the unit they were
+encoded in, such as epoch milliseconds) and values as an ``array('d')``
+(NaN for missing values)."""
+
+_VERSION = 1
+_HEADER = struct.Struct("<BIIq")
+"""Version, value scale, sample count and first timestamp."""
+
+_MISSING = -(2 ** 62)
+"""Stands in for a missing (`None`) value among the scaled values."""
+
+
+def _deltas(values):
+    return array("q", [value - previous for previous, value in zip(
+        itertools.chain((0,), values), values)])
+
+
+def _bytes(integers):
+    if sys.byteorder == "big":
+        integers.byteswap()
+    return integers.tobytes()
+
+
+def _integers(data):
+    integers = array("q")
+    integers.frombytes(data)
+    if sys.byteorder == "big":
+        integers.byteswap()
+    return integers
+
+
+def encode(timestamps, values, scale=1):
+    """
+    Encodes a series of samples.
+
+    :param timestamps: Sample timestamps as integers (such as epoch
+      milliseconds), in any order.
+    :type timestamps: sequence of int
+    :param values: Sample values (`None` for missing values).
+    :type values: sequence of float
+    :param scale: Values are stored as integers after being multiplied by
+      this factor, so ``scale=10000`` keeps four decimals.
+    :type scale: int
+    :rtype: bytes
+    """
+    if len(timestamps) != len(values):
+        raise ValueError("got {} timestamps but {} values".format(
+            len(timestamps), len(values)))
+    first = timestamps[0] if len(timestamps) else 0
+    scaled = [_MISSING if value is None else int(round(value * scale))
+              for value in values]
+    payload = zlib.compress(
+        _bytes(_deltas([int(t) - first for t in timestamps])) +
+        _bytes(_deltas(scaled)))
+    return _HEADER.pack(_VERSION, scale, len(timestamps), first) + payload
+
+
+def decode(blob):
+    """
+    Decodes a series encoded by :func:`encode`.
+
+    :param blob: An encoded series.
+    :type blob: bytes
+    :rtype: :class:`Series`
+    """
+    version, scale, count, first = _HEADER.unpack_from(blob)
+    if version != _VERSION:
+        raise ValueError("unsupported series version: {}".format(version))
+    integers = _integers(zlib.decompress(blob[_HEADER.size:]))
+    if len(integers) != 2 * count:
+        raise ValueError("corrupt series: expected {} samples".format(count))
+    timestamps = array("q", (first + offset for offset in itertools.accumulate(
+        integers[:count])))
+    nan = float("nan")
+    values = array("d", (nan if value == _MISSING else value / scale
+                         for value in itertools.accumulate(integers[count:])))
+    return Series(timestamps, values)
@@ -0,0 +1,95 @@
+"""
+Module with fast (batch) conversions of the timestamp representations used
+by the Garmin Connect API.
+
+Timestamps in API responses come in a handful of fixed formats, such as
+``2019-03-01 06:30:00`` or ``2019-03-01T06:30:00.0``, and as epoch
+milliseconds. The fixed formats are parsed by slicing rather than by a
+general-purpose parser, which is an order of magnitude faster;
+:func:`dateutil.parser.parse` is only used as a fallback for anything else.
+"""
+from datetime import datetime, timezone
+
+_EPOCH_MILLIS_THRESHOLD = 10 ** 11
+"""Epoch values at or above this threshold are taken to be milliseconds
+(10**11 seconds is far into the future, 10**11 milliseconds is 1973)."""
+
+
+def parse_timestamp(value, tzinfo=None):
+    """
+    Parses a timestamp of form ``YYYY-MM-DD HH:MM:SS`` or
+    ``YYYY-MM-DDTHH:MM:SS``, optionally followed by fractional seconds.
+    Other formats are handed to :func:`dateutil.parser.parse`.
+
+    :param value: The timestamp string.
+    :type value: str
+    :param tzinfo: Time zone to attach to the parsed timestamp (the
+      timestamp is returned naive if `None`).
+    :type tzinfo: `datetime.tzinfo`
+    :return: The parsed timestamp, or `None` if ``value`` is `None`.
+    :rtype: datetime
+    """
+    if value is None:
+        return None
+    try:
+        if len(value) >= 19 and value[10] in " T" and (
+                len(value) == 19 or value[19] == "."):
+            microsecond = 0
+            if len(value) > 20:
+                fraction = value[20:26]
+                microsecond = int(fraction) * 10 ** (6 - len(fraction))
+            return datetime(
+                int(value[0:4]), int(value[5:7]), int(value[8:10]),
+                int(value[11:13]), int(value[14:16]), int(value[17:19]),
+                microsecond, tzinfo)
+    except ValueError:
+        pass
+    import dateutil.parser
+    timestamp = dateutil.parser.parse(value)
+    return timestamp.replace(tzinfo=tzinfo) if tzinfo is not None else timestamp
+
+
+def parse_timestamps(values, tzinfo=None):
+    """
+    Parses a sequence of timestamps (see :func:`parse_timestamp`).
+
+    :rtype: list of datetime
+    """
+    return [parse_timestamp(value, tzinfo) for value in values]
+
+
+def parse_utc_timestamp(value):
+    """Parses a GMT timestamp (such as an activity's ``startTimeGMT``) into
+    a tz-aware UTC datetime (see :func:`parse_timestamp`)."""
+    return parse_timestamp(value, timezone.utc)
+
+
+def epoch_to_datetime(epoch):
+    """
+    Converts an epoch timestamp in seconds or milliseconds to a naive local
+    datetime, truncated to whole seconds.
+
+    :param epoch: Epoch timestamp (or `None`).
+    :type epoch: int
+    :rtype: datetime
+    """
+    if epoch is None:
+        return None
+    epoch = int(epoch)
+    if epoch >= _EPOCH_MILLIS_THRESHOLD:
+        epoch //= 1000
+    return datetime.fromtimestamp(epoch)
+
+
+def epochs_to_datetimes(epochs):
+    """
+    Converts a sequence of epoch timestamps (see :func:`epoch_to_datetime`)
+    in bulk.
+
+    :rtype: list of datetime
+    """
+    fromtimestamp = datetime.fromtimestamp
+    return [None if epoch is None else
+            fromtimestamp(int(epoch) // 1000 if epoch >= _EPOCH_MILLIS_THRESHOLD
+                          else int(epoch))
+            for epoch in epochs]
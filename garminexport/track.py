@@ -0,0 +1,383 @@
+"""
+Module with vectorized (NumPy) operations on activity tracks: distance
+computation, simplification and resampling.
+
+A track is represented as parallel arrays of latitudes and longitudes (in
+degrees) and, optionally, elevations (in meters) and times (in epoch
+seconds). Missing elevations or times are represented as ``NaN``.
+
+NumPy is an optional dependency (the ``track`` extra of ``setup.py``) that is
+only imported when this module's operations are first used.
+"""
+import calendar
+import heapq
+import logging
+import re
+import xml.etree.ElementTree as ElementTree
+from datetime import datetime, timezone
+from xml.sax.saxutils import escape
+
+log = logging.getLogger(__name__)
+
+
+class _LazyNumpy(object):
+    # stands in for the numpy module until it is first used
+
+    def __getattr__(self, name):
+        global np
+        try:
+            import numpy
+        except ImportError:
+            raise ImportError(
+                "garminexport.track (and with it the gpx_reduced export) "
+                "requires numpy, which is not installed. Install it with "
+                "'pip install numpy' or the 'track' extra of garminexport.")
+        np = numpy
+        return getattr(np, name)
+
+
+np = _LazyNumpy()
+
+EARTH_RADIUS = 6371008.8
+"""Mean earth radius in meters."""
+
+DEFAULT_TOLERANCE = 5.0
+"""Default simplification tolerance (in meters) of the reduced GPX export."""
+
+
+class Track(object):
+    """
+    A track as parallel arrays of positions, elevations and times.
+
+    :ivar lat: Latitudes in degrees.
+    :ivar lon: Longitudes in degrees.
+    :ivar ele: Elevations in meters (``NaN`` where unknown).
+    :ivar time: Times in epoch seconds (``NaN`` where unknown).
+    :ivar name: The track name (``None`` if it has none).
+    """
+
+    def __init__(self, lat, lon, ele=None, time=None, name=None):
+        self.lat = np.asarray(lat, dtype=np.float64)
+        self.lon = np.asarray(lon, dtype=np.float64)
+        n = len(self.lat)
+        self.ele = (np.asarray(ele, dtype=np.float64) if ele is not None
+                    else np.full(n, np.nan))
+        self.time = (np.asarray(time, dtype=np.float64) if time is not None
+                     else np.full(n, np.nan))
+        self.name = name
+
+    def __len__(self):
+        return len(self.lat)
+
+    def take(self, indices):
+        """Returns a new :class:`Track` with the points at the given
+        indices (or boolean mask)."""
+        return Track(self.lat[indices], self.lon[indices],
+                     self.ele[indices], self.time[indices], self.name)
+
+
+def haversine(lat1, lon1, lat2, lon2):
+    """
+    Computes great-circle distances between (arrays of) positions.
+
+    :param lat1: Latitude(s) of the first position(s) in degrees.
+    :param lon1: Longitude(s) of the first position(s) in degrees.
+    :param lat2: Latitude(s) of the second position(s) in degrees.
+    :param lon2: Longitude(s) of the second position(s) in degrees.
+    :return: The distance(s) in meters.
+    :rtype: `numpy.ndarray`
+    """
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(v, dtype=np.float64))
+                              for v in (lat1, lon1, lat2, lon2))
+    a = (np.sin((lat2 - lat1) / 2) ** 2 +
+         np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def cumulative_distance(lat, lon):
+    """
+    Computes the distance along a track at every track point.
+
+    :return: Cumulative distances in meters, starting at ``0.0``.
+    :rtype: `numpy.ndarray`
+    """
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+    distances = np.zeros(len(lat))
+    if len(lat) > 1:
+        np.cumsum(haversine(lat[:-1], lon[:-1], lat[1:], lon[1:]),
+                  out=distances[1:])
+    return distances
+
+
+def _project(lat, lon):
+    """Projects positions onto a local equirectangular plane (in meters),
+    which is accurate enough for the extent of a single activity."""
+    lat = np.radians(lat)
+    lon = np.radians(lon)
+    lat0 = np.mean(lat) if len(lat) else 0.0
+    return (EARTH_RADIUS * lon * np.cos(lat0), EARTH_RADIUS * lat)
+
+
+def simplify_rdp(lat, lon, tolerance):
+    """
+    Simplifies a track with the Ramer-Douglas-Peucker algorithm. Distances
+    from all points of a segment to its chord are computed in one
+    vectorized operation per segment.
+
+    :param lat: Latitudes in degrees.
+    :param lon: Longitudes in degrees.
+    :param tolerance: Maximum distance (in meters) between a removed point
+      and the simplified track.
+    :type tolerance: float
+    :return: A boolean mask of the points to keep.
+    :rtype: `numpy.ndarray`
+    """
+    x, y = _project(np.asarray(lat, dtype=np.float64),
+                    np.asarray(lon, dtype=np.float64))
+    n = len(x)
+    keep = np.zeros(n, dtype=bool)
+    if n == 0:
+        return keep
+    keep[0] = keep[-1] = True
+    stack = [(0, n - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        dx = x[last] - x[first]
+        dy = y[last] - y[first]
+        px = x[first + 1:last] - x[first]
+        py = y[first + 1:last] - y[first]
+        chord = np.hypot(dx, dy)
+        if chord > 0:
+            distances = np.abs(dx * py - dy * px) / chord
+        else:
+            distances = np.hypot(px, py)
+        index = int(np.argmax(distances))
+        if distances[index] > tolerance:
+            split = first + 1 + index
+            keep[split] = True
+            stack.append((first, split))
+            stack.append((split, last))
+    return keep
+
+
+def _triangle_areas(x, y, prev, nxt, indices):
+    return 0.5 * np.abs(
+        (x[prev[indices]] - x[indices]) * (y[nxt[indices]] - y[indices]) -
+        (x[nxt[indices]] - x[indices]) * (y[prev[indices]] - y[indices]))
+
+
+def simplify_visvalingam(lat, lon, min_area):
+    """
+    Simplifies a track with the Visvalingam-Whyatt algorithm: points are
+    removed in order of the area of the triangle they form with their
+    neighbours until all remaining triangles are at least ``min_area``
+    large. Initial areas are computed in one vectorized operation.
+
+    :param lat: Latitudes in degrees.
+    :param lon: Longitudes in degrees.
+    :param min_area: Minimum effective area (in square meters) of a kept
+      point.
+    :type min_area: float
+    :return: A boolean mask of the points to keep.
+    :rtype: `numpy.ndarray`
+    """
+    x, y = _project(np.asarray(lat, dtype=np.float64),
+                    np.asarray(lon, dtype=np.float64))
+    n = len(x)
+    keep = np.ones(n, dtype=bool)
+    if n < 3:
+        return keep
+    prev = np.arange(-1, n - 1)
+    nxt = np.arange(1, n + 1)
+    inner = np.arange(1, n - 1)
+    areas = np.full(n, np.inf)
+    areas[inner] = _triangle_areas(x, y, prev, nxt, inner)
+    heap = [(areas[i], i) for i in inner.tolist()]
+    heapq.heapify(heap)
+    while heap:
+        area, i = heapq.heappop(heap)
+        if area >= min_area:
+            break
+        if not keep[i] or area != areas[i]:
+            # stale entry
+            continue
+        keep[i] = False
+        p, q = prev[i], nxt[i]
+        nxt[p] = q
+        prev[q] = p
+        for j in (p, q):
+            if 0 < j < n - 1:
+                new_area = max(
+                    _triangle_areas(x, y, prev, nxt, np.array([j]))[0], area)
+                areas[j] = new_area
+                heapq.heappush(heap, (new_area, j))
+    return keep
+
+
+def resample_time(track, interval):
+    """
+    Resamples a track to fixed time intervals by linear interpolation.
+    Points without a time are ignored.
+
+    :param track: The track to resample.
+    :type track: :class:`Track`
+    :param interval: Sampling interval in seconds.
+    :type interval: float
+    :rtype: :class:`Track`
+    """
+    valid = ~np.isnan(track.time)
+    time = track.time[valid]
+    if len(time) == 0:
+        return Track([], [], [], [])
+    samples = np.arange(time[0], time[-1] + interval / 2.0, interval)
+    return Track(np.interp(samples, time, track.lat[valid]),
+                 np.interp(samples, time, track.lon[valid]),
+                 np.interp(samples, time, track.ele[valid]),
+                 samples)
+
+
+def resample_distance(track, interval):
+    """
+    Resamples a track to fixed distance intervals (along the track) by
+    linear interpolation.
+
+    :param track: The track to resample.
+    :type track: :class:`Track`
+    :param interval: Sampling interval in meters.
+    :type interval: float
+    :rtype: :class:`Track`
+    """
+    if len(track) == 0:
+        return Track([], [], [], [])
+    distance = cumulative_distance(track.lat, track.lon)
+    # drop points that don't advance along the track (np.interp requires
+    # increasing sample points)
+    advancing = np.concatenate(([True], np.diff(distance) > 0))
+    distance = distance[advancing]
+    samples = np.arange(0.0, distance[-1] + interval / 2.0, interval)
+    return Track(*(np.interp(samples, distance, values[advancing])
+                   for values in (track.lat, track.lon,
+                                  track.ele, track.time)))
+
+
+_TIME_SUFFIX = re.compile(r"(\.\d+)?(?:Z|([+-])(\d\d):?(\d\d))?$")
+"""The optional fractional seconds and UTC offset of a GPX time."""
+
+
+def _parse_time(value):
+    # parses a GPX (xsd:dateTime) time into epoch seconds
+    if not value:
+        return float("nan")
+    value = value.strip()
+    timestamp = datetime.strptime(value[:19], "%Y-%m-%dT%H:%M:%S")
+    seconds = calendar.timegm(timestamp.timetuple())
+    match = _TIME_SUFFIX.match(value, 19)
+    if match is None:
+        raise ValueError("unrecognized GPX time: {}".format(value))
+    fraction, sign, hours, minutes = match.groups()
+    if fraction:
+        seconds += float("0" + fraction)
+    if sign:
+        offset = 3600 * int(hours) + 60 * int(minutes)
+        seconds += -offset if sign == "+" else offset
+    return seconds
+
+
+def parse_gpx(gpx):
+    """
+    Parses the track points (and the name of the first named track) of a
+    GPX document.
+
+    :param gpx: A GPX document, as returned by
+      :meth:`garminexport.garminclient.GarminClient.get_activity_gpx`.
+    :type gpx: str
+    :rtype: :class:`Track`
+    """
+    root = ElementTree.fromstring(
+        gpx.encode("utf-8") if isinstance(gpx, str) else gpx)
+    lat, lon, ele, time = [], [], [], []
+    name = None
+    for element in root.iter():
+        tag = element.tag.rsplit("}", 1)[-1]
+        if tag == "trk" and name is None:
+            for child in element:
+                if child.tag.rsplit("}", 1)[-1] == "name":
+                    name = child.text
+                    break
+        if tag != "trkpt":
+            continue
+        lat.append(float(element.get("lat")))
+        lon.append(float(element.get("lon")))
+        point_ele = point_time = None
+        for child in element:
+            tag = child.tag.rsplit("}", 1)[-1]
+            if tag == "ele":
+                point_ele = child.text
+            elif tag == "time":
+                point_time = child.text
+        ele.append(float(point_ele) if point_ele else np.nan)
+        time.append(_parse_time(point_time))
+    return Track(lat, lon, ele, time, name)
+
+
+def _format_time(seconds):
+    # formats epoch seconds as a GPX time, with microseconds if there are any
+    seconds, microseconds = divmod(int(round(seconds * 1000000)), 1000000)
+    value = datetime.fromtimestamp(seconds, timezone.utc).strftime(
+        "%Y-%m-%dT%H:%M:%S")
+    if microseconds:
+        value += ".{:06d}".format(microseconds)
+    return value + "Z"
+
+
+def to_gpx(track, name=None):
+    """
+    Renders a track as a GPX 1.1 document.
+
+    :param track: The track to render.
+    :type track: :class:`Track`
+    :param name: Optional track name. Defaults to the name of the track.
+    :type name: str
+    :rtype: str
+    """
+    if name is None:
+        name = track.name
+    lines = [
+        '<?xml version="1.0" encoding="UTF-8"?>',
+        '<gpx version="1.1" creator="garminexport" '
+        'xmlns="http://www.topografix.com/GPX/1/1">',
+        '  <trk>']
+    if name:
+        lines.append('    <name>{}</name>'.format(escape(name)))
+    lines.append('    <trkseg>')
+    for lat, lon, ele, time in zip(track.lat.tolist(), track.lon.tolist(),
+                                   track.ele.tolist(), track.time.tolist()):
+        point = '      <trkpt lat="{:.7f}" lon="{:.7f}">'.format(lat, lon)
+        if ele == ele:
+            point += '<ele>{:.1f}</ele>'.format(ele)
+        if time == time:
+            point += '<time>{}</time>'.format(_format_time(time))
+        lines.append(point + '</trkpt>')
+    lines.extend(['    </trkseg>', '  </trk>', '</gpx>', ''])
+    return "\n".join(lines)
+
+
+def reduce_gpx(gpx, tolerance=DEFAULT_TOLERANCE):
+    """
+    Produces a reduced version of a GPX document, simplified with
+    :func:`simplify_rdp`. The track name is kept.
+
+    :param gpx: A GPX document.
+    :type gpx: str
+    :param tolerance: Simplification tolerance in meters.
+    :type tolerance: float
+    :return: The reduced GPX document.
+    :rtype: str
+    """
+    track = parse_gpx(gpx)
+    reduced = track.take(simplify_rdp(track.lat, track.lon, tolerance))
+    log.debug("reduced track from %d to %d points", len(track), len(reduced))
+    return to_gpx(reduced)
@@ -0,0 +1,154 @@
+"""
+Module with methods useful when uploading (large numbers of) activity
+files.
+
+Uploads are carried out concurrently by a bounded pool of worker threads
+that share a single (connected) :class:`garminexport.garminclient.GarminClient`.
+Progress is tracked in an :class:`UploadJournal`, which records the content
+hash of every successfully uploaded file, so that an interrupted batch can be
+resumed without re-uploading files that already made it to Garmin Connect.
+"""
+import collections
+import hashlib
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from garminexport.garminclient import ActivityExistsError
+
+log = logging.getLogger(__name__)
+
+UploadResult = collections.namedtuple(
+    "UploadResult", ["path", "status", "activity_id", "error"])
+"""
+The outcome of uploading a single file. The ``status`` is one of
+``uploaded``, ``duplicate`` (Garmin Connect already had the activity),
+``skipped`` (the journal already had the file) or ``failed`` (in which case
+``error`` holds the raised exception).
+"""
+
+
+def file_digest(path, chunk_size=1 << 20):
+    """
+    Returns the SHA-256 content hash of a file.
+
+    :param path: File path.
+    :type path: str
+    :rtype: str
+    """
+    digest = hashlib.sha256()
+    with open(path, mode="rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class UploadJournal(object):
+    """
+    An append-only log of uploaded files. Every line holds the content hash
+    of an uploaded file, the id of the resulting activity (empty if it is
+    unknown, as for some duplicates) and the file's path at the time of
+    upload, separated by tabs.
+    """
+
+    def __init__(self, path):
+        """
+        Opens (and, if necessary, creates) a journal file.
+
+        :param path: Path to the journal file.
+        :type path: str
+        """
+        self.path = path
+        self.entries = {}
+        if os.path.isfile(path):
+            with open(path, mode="r") as f:
+                for line in f:
+                    fields = line.rstrip("\n").split("\t")
+                    if len(fields) == 3:
+                        self.entries[fields[0]] = fields[1] or None
+        log.debug("%d uploaded file(s) in %s", len(self.entries), path)
+        self._lock = threading.Lock()
+        self._file = open(path, mode="a")
+
+    def __contains__(self, digest):
+        return digest in self.entries
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+
+    def record(self, digest, activity_id, path):
+        """Records a successfully uploaded file (``activity_id`` may be
+        :obj:`None` if it is unknown)."""
+        activity_id = str(activity_id) if activity_id is not None else None
+        with self._lock:
+            self.entries[digest] = activity_id
+            self._file.write(u"{}\t{}\t{}\n".format(
+                digest, activity_id or "", path))
+            self._file.flush()
+
+
+def _upload(client, path, journal, upload_args):
+    digest = file_digest(path) if journal is not None else None
+    if digest is not None and digest in journal:
+        return UploadResult(path, "skipped", journal.entries[digest], None)
+    try:
+        with open(path, mode="rb") as f:
+            activity_id = client.upload_activity(f, **upload_args)
+        status = "uploaded"
+    except ActivityExistsError as e:
+        activity_id = e.activity_id
+        status = "duplicate"
+    except Exception as e:
+        return UploadResult(path, "failed", None, e)
+    if journal is not None:
+        journal.record(digest, activity_id, path)
+    return UploadResult(path, status, activity_id, None)
+
+
+def upload_files(client, paths, journal=None, workers=1, **upload_args):
+    """
+    Uploads activity files concurrently. Files listed in the journal are
+    skipped, and uploads rejected as duplicates of existing activities are
+    treated as successful.
+
+    At most ``2 * workers`` files are in flight at any time, so ``paths``
+    may be a (lazy) iterable over arbitrarily many files.
+
+    :param client: A :class:`garminexport.garminclient.GarminClient`
+      instance that is assumed to be connected.
+    :type client: :class:`garminexport.garminclient.GarminClient`
+    :param paths: Paths of the files to upload.
+    :type paths: iterable of str
+    :param journal: Journal to skip already uploaded files by and to record
+      successful uploads in.
+    :type journal: :class:`UploadJournal`
+    :param workers: Number of concurrent uploads.
+    :type workers: int
+    :param upload_args: Additional keyword arguments to pass to
+      :meth:`garminexport.garminclient.GarminClient.upload_activity`.
+    :return: A generator of results, in order of completion.
+    :rtype: generator of :class:`UploadResult`
+    """
+    paths = iter(paths)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = set()
+        while True:
+            for path in paths:
+                pending.add(executor.submit(
+                    _upload, client, path, journal, upload_args))
+                if len(pending) >= 2 * workers:
+                    break
+            if not pending:
+                return
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
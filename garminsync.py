@@ -0,0 +1,13 @@
+#! /usr/bin/env python
+"""
+Runs a long-lived sync daemon that keeps a backup directory (and optionally
+the wellness database) up to date with a given Garmin Connect account.
+
+Unlike scheduled ``garminbackup.py``/``get_data.py`` runs, the daemon logs in
+once and keeps an incremental cursor, so that every poll only asks for the
+activities and wellness days that are new since the last one.
+"""
+from garminexport.commands import main, sync
+
+if __name__ == "__main__":
+    main(sync)
@@ -0,0 +1,10 @@
+#! /usr/bin/env python
+"""
+Finds the activities in a backup directory that passed through a given
+area, using the spatial tile index of the backup directory rather than
+parsing every exported track file.
+"""
+from garminexport.commands import main, tiles
+
+if __name__ == "__main__":
+    main(tiles)
@@ -2,17 +2,23 @@
 
 """Setup information for the Garmin Connect api exporter."""
 
-from setuptools import find_packages
-from distutils.core import setup
+from setuptools import find_packages, setup
 
 setup(name="Garmin Connect api exporter",
       version="1.0.0",
       description=("A program that downloads all activities for a given Garmin Connect account and stores them locally on the user's computer."),
       long_description=open('README.md').read(),
       install_requires=open('requirements.txt').read(),
+      extras_require={
+          # the gpx_reduced export (garminexport.track)
+          "track": ["numpy>=1.26"],
+      },
       license=open('LICENSE').read(),
       url="https://github.com/petergardfjall/garminexport",
-      packages=["garminexport"],
+      packages=["garminexport", "garminexport.commands"],
+      entry_points={
+          "console_scripts": ["garminexport = garminexport.cli:main"],
+      },
       classifiers=[
           'Development Status :: 4 - Beta',
           'Intended Audience :: Developers',
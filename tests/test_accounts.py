@@ -0,0 +1,116 @@
+from datetime import datetime, timedelta
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+from garminexport.accounts import Account, backup_accounts, load_config
+from garminexport.ratelimit import RateLimiter
+from garminexport.retryer import Retryer
+
+
+class FakeClient(object):
+
+    def __init__(self, username, password, rate_limiter=None):
+        self.username = username
+
+    def connect(self):
+        pass
+
+    def disconnect(self):
+        pass
+
+    def list_activities(self):
+        count = {"big": 40, "small": 4}[self.username]
+        return [(i, datetime(2019, 1, 1) + timedelta(days=i))
+                for i in range(count)]
+
+
+class TestBackupAccounts(unittest.TestCase):
+    """Exercise `backup_accounts`."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.order = []
+        self.lock = threading.Lock()
+        self.in_flight = {}
+        self.max_in_flight = 0
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _download(self, client, activity, retryer, backup_dir,
+                  export_formats, catalog=None, raw_json=False):
+        with self.lock:
+            self.in_flight[client.username] = \
+                self.in_flight.get(client.username, 0) + 1
+            self.max_in_flight = max(self.max_in_flight,
+                                     self.in_flight[client.username])
+        time.sleep(0.001)
+        with self.lock:
+            self.in_flight[client.username] -= 1
+            self.order.append((client.username, activity[0]))
+
+    def test_fair_scheduling(self):
+        accounts = [Account(name, name, "secret",
+                            os.path.join(self.directory, name))
+                    for name in ("big", "small")]
+        with mock.patch("garminexport.accounts.GarminClient", FakeClient), \
+                mock.patch("garminexport.backup.download", self._download):
+            backup_accounts(accounts, Retryer(), workers=2,
+                            use_catalog=False)
+
+        self.assertEqual([a.downloaded for a in accounts], [40, 4])
+        # the small account is done long before the big one, and every
+        # account is backed up newest first
+        small = [i for i, (name, _) in enumerate(self.order)
+                 if name == "small"]
+        self.assertLess(max(small), 12)
+        self.assertEqual([i for name, i in self.order if name == "big"][:3],
+                         [39, 38, 37])
+
+    def test_one_download_in_flight_per_account(self):
+        accounts = [Account(name, name, "secret",
+                            os.path.join(self.directory, name))
+                    for name in ("big", "small")]
+        with mock.patch("garminexport.accounts.GarminClient", FakeClient), \
+                mock.patch("garminexport.backup.download", self._download):
+            backup_accounts(accounts, Retryer(), workers=4,
+                            use_catalog=False)
+
+        self.assertEqual([a.downloaded for a in accounts], [40, 4])
+        self.assertEqual(self.max_in_flight, 1)
+
+    def test_load_config(self):
+        path = os.path.join(self.directory, "accounts.json")
+        with open(path, "w") as f:
+            json.dump({"workers": 3, "rate": 2.5, "accounts": [
+                {"name": "a", "username": "a@example.com",
+                 "password_env": "TEST_ACCOUNTS_PASSWORD",
+                 "formats": ["fit"]}]}, f)
+        with mock.patch.dict(os.environ, {"TEST_ACCOUNTS_PASSWORD": "pw"}):
+            accounts, settings = load_config(path)
+        self.assertEqual(settings, {"workers": 3, "rate": 2.5, "burst": 1})
+        self.assertEqual(accounts[0].password, "pw")
+        self.assertEqual(accounts[0].export_formats, ["fit"])
+
+
+class TestRateLimiter(unittest.TestCase):
+    """Exercise `RateLimiter`."""
+
+    def test_burst_then_rate(self):
+        limiter = RateLimiter(rate=100, burst=5)
+        start = time.monotonic()
+        for _ in range(5):
+            self.assertEqual(limiter.acquire(), 0.0)
+        for _ in range(10):
+            limiter.acquire()
+        self.assertGreaterEqual(time.monotonic() - start, 0.09)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,37 @@
+from datetime import datetime, timezone
+import unittest
+
+from garminexport.activity import Activity
+from garminexport.backup import export_filename
+
+START = datetime(2015, 2, 17, 5, 45, tzinfo=timezone.utc)
+
+
+class TestActivity(unittest.TestCase):
+    """Exercise `Activity`."""
+
+    def test_behaves_as_tuple(self):
+        activity = Activity(123456789, START)
+        activity_id, start = activity
+        self.assertEqual((activity_id, start), (123456789, START))
+        self.assertEqual((activity[0], activity[1], activity[-1]),
+                         (123456789, START, START))
+        self.assertEqual(activity[:1], (123456789,))
+        with self.assertRaises(IndexError):
+            activity[2]
+        self.assertEqual(activity, (123456789, START))
+        self.assertEqual((123456789, START), activity)
+        self.assertNotEqual(activity, Activity(1, START))
+        self.assertEqual({(123456789, START): "fit"}[activity], "fit")
+        self.assertEqual(sorted([Activity(2, START), Activity(1, START)]),
+                         [(1, START), (2, START)])
+
+    def test_stem(self):
+        activity = Activity(123456789, START)
+        self.assertEqual(activity.stem, "2015-02-17T05:45:00+00:00_123456789")
+        self.assertEqual(export_filename(activity, "fit"),
+                         export_filename((123456789, START), "fit"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,205 @@
+from datetime import datetime, timezone
+import importlib.util
+import json
+import os
+import shutil
+import tempfile
+import unittest
+import zipfile
+
+from garminexport.backup import bundle_members, download, export_filename
+from garminexport.garminclient import GarminClient
+
+ACTIVITY = (123, datetime(2019, 3, 1, 6, 30, tzinfo=timezone.utc))
+
+
+class DirectRetryer(object):
+
+    def call(self, function, *args, **kwargs):
+        return function(*args, **kwargs)
+
+
+class FakeBundleClient(object):
+    """A client whose original bundle holds a .fit and a .gpx file."""
+
+    def __init__(self, members=None):
+        self.members = members if members is not None else {
+            "123.fit": b"FIT", "123.gpx": b"<gpx/>"}
+        self.requests = []
+
+    def download_original_activity(self, activity_id, dest):
+        self.requests.append("original")
+        if not self.members:
+            return None
+        with zipfile.ZipFile(dest, mode="w") as bundle:
+            for name, content in self.members.items():
+                bundle.writestr(name, content)
+        return dest
+
+    def get_activity_fit(self, activity_id):
+        self.requests.append("fit")
+        return b"FIT"
+
+    def get_activity_gpx(self, activity_id):
+        self.requests.append("gpx")
+        return u"<gpx/>"
+
+    def get_activity_tcx(self, activity_id):
+        self.requests.append("tcx")
+        return u"<tcx/>"
+
+
+class FakeResponse(object):
+
+    def __init__(self, status_code, text=u""):
+        self.status_code = status_code
+        self.text = text
+        self.headers = {"ETag": '"v1"'} if status_code == 200 else {}
+
+
+class FakeJsonClient(object):
+    """A client whose JSON exports are returned as raw bytes on request."""
+
+    content = b'{"activityId":123,"activityName":"L\xc3\xb6pning"}'
+
+    def get_activity_summary(self, activity_id, raw=False):
+        return self.content if raw else json.loads(self.content)
+
+    get_activity_details = get_activity_summary
+
+
+class TestJsonExports(unittest.TestCase):
+    """Exercise the JSON exports of `download`."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def read(self, export_format):
+        with open(os.path.join(self.directory, export_filename(
+                ACTIVITY, export_format)), "rb") as f:
+            return f.read()
+
+    def test_raw_json_is_written_as_is(self):
+        download(FakeJsonClient(), ACTIVITY, DirectRetryer(), self.directory,
+                 ["json_summary", "json_details"], raw_json=True)
+        self.assertEqual(self.read("json_summary"), FakeJsonClient.content)
+        self.assertEqual(self.read("json_details"), FakeJsonClient.content)
+
+    def test_json_is_pretty_printed(self):
+        download(FakeJsonClient(), ACTIVITY, DirectRetryer(), self.directory,
+                 ["json_summary"])
+        document = json.loads(FakeJsonClient.content)
+        self.assertEqual(self.read("json_summary"), json.dumps(
+            document, ensure_ascii=False, indent=4).encode("utf-8"))
+
+
+class TestConditionalRequests(unittest.TestCase):
+    """Exercise `download` with a client that has validators."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.client = GarminClient("user", None)
+        self.client.session = object()
+        self.client.validators = {}
+        self.conditional = []
+
+        def request(method, url, headers=None, **kwargs):
+            self.conditional.append("If-None-Match" in headers)
+            if headers.get("If-None-Match") == '"v1"':
+                return FakeResponse(304)
+            return FakeResponse(200, u"<gpx/>")
+        self.client._request = request
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_missing_files_are_fetched_unconditionally(self):
+        dest = os.path.join(self.directory, export_filename(ACTIVITY, "gpx"))
+        download(self.client, ACTIVITY, DirectRetryer(), self.directory,
+                 ["gpx"])
+        download(self.client, ACTIVITY, DirectRetryer(), self.directory,
+                 ["gpx"])
+        self.assertEqual(self.conditional, [False, True])
+
+        # a not modified answer would leave the deleted file missing
+        os.remove(dest)
+        download(self.client, ACTIVITY, DirectRetryer(), self.directory,
+                 ["gpx"])
+        self.assertEqual(self.conditional, [False, True, False])
+        with open(dest) as f:
+            self.assertEqual(f.read(), "<gpx/>")
+
+
+class TestOriginalBundle(unittest.TestCase):
+    """Exercise the `original` export of `download`."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def read(self, export_format):
+        with open(os.path.join(self.directory, export_filename(
+                ACTIVITY, export_format)), "rb") as f:
+            return f.read()
+
+    def test_exports_are_taken_from_bundle(self):
+        client = FakeBundleClient()
+        download(client, ACTIVITY, DirectRetryer(), self.directory,
+                 ["original", "fit", "gpx", "tcx"])
+        self.assertEqual(client.requests, ["original", "gpx", "tcx"])
+        self.assertEqual(self.read("fit"), b"FIT")
+        self.assertEqual(self.read("gpx"), b"<gpx/>")
+        self.assertEqual(self.read("tcx"), b"<tcx/>")
+        bundle = os.path.join(self.directory,
+                              export_filename(ACTIVITY, "original"))
+        self.assertEqual(bundle_members(bundle, 123, ["gpx", "tcx"]),
+                         {"gpx": b"<gpx/>", "tcx": None})
+
+        # a bundle of an earlier run serves later single-format jobs
+        os.remove(os.path.join(self.directory,
+                               export_filename(ACTIVITY, "fit")))
+        client.requests = []
+        download(client, ACTIVITY, DirectRetryer(), self.directory, ["fit"])
+        self.assertEqual(client.requests, [])
+        self.assertEqual(self.read("fit"), b"FIT")
+
+    def test_original_uploads(self):
+        client = FakeBundleClient(members={"123.gpx": b"<gpx uploaded/>"})
+        download(client, ACTIVITY, DirectRetryer(), self.directory,
+                 ["original", "gpx", "tcx"], original_uploads=True)
+        self.assertEqual(client.requests, ["original", "tcx"])
+        self.assertEqual(self.read("gpx"), b"<gpx uploaded/>")
+        self.assertEqual(self.read("tcx"), b"<tcx/>")
+
+    @unittest.skipIf(importlib.util.find_spec("numpy") is None,
+                     "numpy is not installed")
+    def test_reduced_gpx_is_derived_from_backed_up_gpx(self):
+        client = FakeBundleClient()
+        gpx = (u'<gpx xmlns="http://www.topografix.com/GPX/1/1"><trk><trkseg>'
+               u'<trkpt lat="59.0" lon="18.0"/><trkpt lat="59.0001" lon="18.0"/>'
+               u'<trkpt lat="59.0002" lon="18.0"/></trkseg></trk></gpx>')
+        client.get_activity_gpx = lambda activity_id: gpx
+        download(client, ACTIVITY, DirectRetryer(), self.directory, ["gpx"])
+        client.get_activity_gpx = lambda activity_id: self.fail("refetched")
+        download(client, ACTIVITY, DirectRetryer(), self.directory,
+                 ["gpx_reduced"])
+        self.assertEqual(self.read("gpx_reduced").count(b"<trkpt"), 2)
+
+    def test_missing_bundle(self):
+        client = FakeBundleClient(members={})
+        download(client, ACTIVITY, DirectRetryer(), self.directory,
+                 ["original", "fit"])
+        self.assertEqual(client.requests, ["original"])
+        with open(os.path.join(self.directory, ".not_found")) as f:
+            self.assertEqual(f.read().split(), [
+                export_filename(ACTIVITY, "original"),
+                export_filename(ACTIVITY, "fit")])
+
+
+if __name__ == '__main__':
+    unittest.main()
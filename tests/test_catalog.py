@@ -0,0 +1,140 @@
+from datetime import datetime
+import json
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+from garminexport.catalog import Catalog, catalog_file
+
+
+def summary(activity_type, start, distance, duration, lat=None, lon=None):
+    return {
+        "activityName": "{} activity".format(activity_type),
+        "activityTypeDTO": {"typeKey": activity_type},
+        "summaryDTO": {
+            "startTimeGMT": start,
+            "distance": distance,
+            "duration": duration,
+            "averageHR": 140.0,
+            "maxHR": 170.0,
+            "startLatitude": lat,
+            "startLongitude": lon,
+            "endLatitude": lat + 0.01 if lat is not None else None,
+            "endLongitude": lon + 0.01 if lon is not None else None,
+        }
+    }
+
+
+class TestCatalog(unittest.TestCase):
+    """Exercise `Catalog`."""
+
+    def setUp(self):
+        self.backup_dir = tempfile.mkdtemp()
+        self.catalog = Catalog(os.path.join(self.backup_dir, catalog_file))
+
+    def tearDown(self):
+        self.catalog.close()
+        shutil.rmtree(self.backup_dir)
+
+    def write_summary(self, activity_id, data):
+        fn = "2019-03-01T06:30:00+00:00_{}_summary.json".format(activity_id)
+        with open(os.path.join(self.backup_dir, fn), "w") as f:
+            json.dump(data, f)
+        return fn
+
+    def test_query_by_type_time_and_distance(self):
+        """Entries should be filterable on type, start time and distance."""
+        self.catalog.add((1, None), summary(
+            "running", "2019-03-02 06:30:00", 12000.0, 3600.0))
+        self.catalog.add((2, None), summary(
+            "running", "2019-03-05 06:30:00", 5000.0, 1500.0))
+        self.catalog.add((3, None), summary(
+            "cycling", "2019-03-06 06:30:00", 40000.0, 5400.0))
+        self.catalog.add((4, None), summary(
+            "running", "2019-04-01 06:30:00", 15000.0, 4800.0))
+
+        runs = self.catalog.query(
+            activity_type="running", start=datetime(2019, 3, 1),
+            end=datetime(2019, 4, 1), min_distance=10000)
+        self.assertEqual([entry["id"] for entry in runs], [1])
+
+    def test_query_orders_most_recent_first(self):
+        """Entries should be returned in descending start time order."""
+        self.catalog.add((1, None), summary(
+            "running", "2019-03-02 06:30:00", 1.0, 1.0))
+        self.catalog.add((2, None), summary(
+            "running", "2019-03-05T06:30:00.0", 1.0, 1.0))
+        entries = self.catalog.query()
+        self.assertEqual([entry["id"] for entry in entries], [2, 1])
+        self.assertEqual(entries[0]["start_time_gmt"], "2019-03-05T06:30:00")
+
+    def test_query_by_bounding_box(self):
+        """Only entries whose bounding box intersects should be returned."""
+        self.catalog.add((1, None), summary(
+            "running", "2019-03-02 06:30:00", 1.0, 1.0, 59.3, 18.0))
+        self.catalog.add((2, None), summary(
+            "running", "2019-03-03 06:30:00", 1.0, 1.0, 40.7, -74.0))
+        self.catalog.add((3, None), summary(
+            "running", "2019-03-04 06:30:00", 1.0, 1.0))
+        entries = self.catalog.query(bbox=(59.0, 17.5, 59.5, 18.5))
+        self.assertEqual([entry["id"] for entry in entries], [1])
+
+    def test_update_is_incremental(self):
+        """Only new or modified summary files should be (re)indexed."""
+        self.write_summary(1, summary(
+            "running", "2019-03-01 06:30:00", 1.0, 1.0))
+        self.assertEqual(self.catalog.update(self.backup_dir), 1)
+        self.assertEqual(self.catalog.update(self.backup_dir), 0)
+
+        fn = self.write_summary(1, summary(
+            "cycling", "2019-03-01 06:30:00", 1.0, 1.0))
+        path = os.path.join(self.backup_dir, fn)
+        os.utime(path, (0, os.path.getmtime(path) + 10))
+        self.assertEqual(self.catalog.update(self.backup_dir), 1)
+        self.assertEqual(self.catalog.query()[0]["activity_type"], "cycling")
+
+    def test_update_removes_deleted_summaries(self):
+        fn = self.write_summary(1, summary(
+            "running", "2019-03-01 06:30:00", 1.0, 1.0))
+        self.write_summary(2, summary(
+            "cycling", "2019-03-02 06:30:00", 1.0, 1.0))
+        self.assertEqual(self.catalog.update(self.backup_dir), 2)
+        os.remove(os.path.join(self.backup_dir, fn))
+        self.assertEqual(self.catalog.update(self.backup_dir), 0)
+        self.assertEqual([e["id"] for e in self.catalog.query()], [2])
+
+    def test_update_skips_bad_summaries(self):
+        self.write_summary(1, ["not", "an", "object"])
+        with open(os.path.join(self.backup_dir,
+                               "x_2_summary.json"), "w") as f:
+            f.write("{truncated")
+        os.mkdir(os.path.join(self.backup_dir, "y_3_summary.json"))
+        self.write_summary(4, summary(
+            "running", "2019-03-01 06:30:00", 1.0, 1.0))
+        self.assertEqual(self.catalog.update(self.backup_dir), 1)
+        self.assertEqual([e["id"] for e in self.catalog.query()], [4])
+
+    def test_concurrent_use(self):
+        self.write_summary(1, summary(
+            "running", "2019-03-01 06:30:00", 1.0, 1.0))
+        errors = []
+
+        def use():
+            try:
+                for _ in range(20):
+                    self.catalog.update(self.backup_dir)
+                    self.catalog.query(activity_type="running")
+            except Exception as e:
+                errors.append(e)
+        threads = [threading.Thread(target=use) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from garminexport.backup import export_filename
+from garminexport.changes import (
+    ChangeStore, changes_file, fingerprint, fingerprinted_activities)
+from garminexport.planner import BackupIndex
+
+ENTRY = {
+    "activityId": 123, "activityName": "Morning Run",
+    "startTimeGMT": "2019-03-01 06:30:00",
+    "activityType": {"typeId": 1, "typeKey": "running"},
+    "distance": 10012.5, "duration": 3010.0, "ownerId": 42,
+}
+
+
+class FakeClient(object):
+
+    def __init__(self, entries):
+        self.entries = entries
+
+    def iter_activity_entries(self, batch_size=100, start_index=0):
+        return iter(self.entries[start_index:])
+
+
+class TestFingerprint(unittest.TestCase):
+    """Exercise `fingerprint`."""
+
+    def test_edits_change_fingerprint(self):
+        self.assertEqual(fingerprint(ENTRY), fingerprint(dict(ENTRY)))
+        self.assertEqual(fingerprint(ENTRY),
+                         fingerprint(dict(ENTRY, ownerId=43)))
+        for field, value in [("activityName", "Evening Run"),
+                             ("activityType", {"typeKey": "trail_running"}),
+                             ("distance", 8000.0)]:
+            self.assertNotEqual(fingerprint(ENTRY),
+                                fingerprint(dict(ENTRY, **{field: value})))
+
+
+class TestChangeStore(unittest.TestCase):
+    """Exercise `ChangeStore`."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.store = ChangeStore(os.path.join(self.directory, changes_file))
+
+    def tearDown(self):
+        self.store.close()
+        shutil.rmtree(self.directory)
+
+    def test_changes_are_detected_and_accepted(self):
+        entries = [dict(ENTRY, activityId=i) for i in range(3)]
+        listed = list(fingerprinted_activities(FakeClient(entries), self.store))
+        self.assertEqual([activity[0] for activity in listed], [0, 1, 2])
+        self.assertEqual(listed[0][1].isoformat(), "2019-03-01T06:30:00+00:00")
+        self.assertEqual(self.store.changed(), set())
+
+        entries[1]["activityName"] = "Renamed"
+        list(fingerprinted_activities(FakeClient(entries), self.store))
+        self.assertEqual(self.store.changed(), {1})
+        self.store.accept([1])
+        self.assertEqual(self.store.changed(), set())
+
+    def test_changes_are_known_as_activities_are_listed(self):
+        # the journal-less backup plans from the listing as it streams by
+        entries = [dict(ENTRY, activityId=i) for i in range(3)]
+        for activity in fingerprinted_activities(
+                FakeClient(entries), self.store):
+            open(os.path.join(self.directory, export_filename(
+                activity, "json_summary")), "w").close()
+        entries[1]["activityName"] = "Renamed"
+        with BackupIndex(self.directory) as index:
+            missing = list(index.missing(
+                fingerprinted_activities(
+                    FakeClient(entries), self.store, batch_size=2),
+                ["json_summary"], self.store.changed))
+        self.assertEqual([(activity[0], formats)
+                          for activity, formats in missing],
+                         [(1, ["json_summary"])])
+        self.assertEqual(self.store.changed([0, 1]), {1})
+        self.assertEqual(self.store.changed([]), set())
+
+    def test_validators(self):
+        self.assertIsNone(self.store.get("http://x/1"))
+        self.store["http://x/1"] = ('"abc"', None)
+        self.assertEqual(self.store.get("http://x/1"), ('"abc"', None))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,33 @@
+import importlib
+import subprocess
+import sys
+import unittest
+
+from garminexport import commands
+from garminexport.cli import COMMANDS
+
+
+class TestCommands(unittest.TestCase):
+    """Exercise the `garminexport` subcommands."""
+
+    def test_parsers(self):
+        for name, module, _ in COMMANDS:
+            command = importlib.import_module("garminexport.commands." + module)
+            parser = commands.build_parser(command, "garminexport " + name)
+            self.assertTrue(parser.format_help().startswith(
+                "usage: garminexport " + name))
+
+    def test_heavy_dependencies_are_lazy(self):
+        # run in a fresh interpreter: other tests may have imported them
+        code = ("import sys, garminexport.cli\n"
+                "for name, module, _ in garminexport.cli.COMMANDS:\n"
+                "    __import__('garminexport.commands.' + module)\n"
+                "print(sorted(m for m in ('requests', 'pymysql', 'dateutil')"
+                " if m in sys.modules))")
+        output = subprocess.check_output(
+            [sys.executable, "-c", code], universal_newlines=True)
+        self.assertEqual(output.strip(), "[]")
+
+
+if __name__ == '__main__':
+    unittest.main()
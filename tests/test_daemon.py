@@ -0,0 +1,188 @@
+from datetime import date, datetime, timedelta, timezone
+import functools
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from garminexport.daemon import (
+    SyncDaemon, SyncState, state_file, store_wellness)
+from garminexport.database import open_database
+from garminexport.garminclient import GarminClient
+from garminexport.ledger import ledger_file
+from garminexport.retryer import Retryer, MaxRetriesStopStrategy
+
+NEWEST = datetime(2019, 3, 1, 6, 0, tzinfo=timezone.utc)
+
+
+class FakeClient(object):
+    """A client stand-in with a newest-first activity list."""
+
+    def __init__(self, count):
+        self.activities = [(1000 + count - i, NEWEST - timedelta(hours=12 * i))
+                           for i in range(count)]
+        self.listed = 0
+        self.connects = 0
+
+    def list_activities(self):
+        self.listed += len(self.activities)
+        return list(self.activities)
+
+    def iter_activities(self, batch_size=100):
+        for activity in self.activities:
+            self.listed += 1
+            yield activity
+
+    def connect(self):
+        self.connects += 1
+
+    def disconnect(self):
+        pass
+
+
+class FakeWellnessClient(GarminClient):
+    """A client with sleep and heart rate data for every day, whose
+    requests of the days and kinds in `failing` fail."""
+
+    def __init__(self):
+        super(FakeWellnessClient, self).__init__("user", None, "user")
+        self.session = object()
+        self.failing = set()
+
+    def _check(self, kind, request_date):
+        day = datetime.strptime(request_date, "%Y-%m-%d").date()
+        if (day, kind) in self.failing:
+            raise ValueError("boom")
+
+    def get_daily_sleep_data(self, request_date):
+        self._check("sleep", request_date)
+        return {"dailySleepDTO": {
+            "calendarDate": request_date, "sleepTimeSeconds": 27000,
+            "sleepStartTimestampGMT": None, "sleepEndTimestampGMT": None,
+            "deepSleepSeconds": 5000, "lightSleepSeconds": 15000,
+            "remSleepSeconds": 6000, "awakeSleepSeconds": 1000},
+            "sleepMovement": []}
+
+    def get_daily_hr_data(self, request_date):
+        self._check("heart_rate", request_date)
+        return {"calendarDate": request_date, "maxHeartRate": 160,
+                "minHeartRate": 45, "restingHeartRate": 52,
+                "heartRateValues": []}
+
+    def get_daily_movement(self, request_date):
+        return None
+
+    def get_user_summary(self, request_date):
+        return None
+
+
+def fake_download(client, activity, retryer, backup_dir, export_formats,
+                  catalog=None, raw_json=False):
+    if getattr(client, "fail", False):
+        raise ValueError("download failed")
+    from garminexport.backup import export_filename
+    for export_format in export_formats:
+        open(os.path.join(
+            backup_dir, export_filename(activity, export_format)), "w").close()
+
+
+@mock.patch("garminexport.backup.download", fake_download)
+class TestSyncDaemon(unittest.TestCase):
+    """Exercise `SyncDaemon`."""
+
+    def setUp(self):
+        self.backup_dir = tempfile.mkdtemp()
+        self.client = FakeClient(10)
+        self.daemon = self._daemon()
+
+    def tearDown(self):
+        shutil.rmtree(self.backup_dir)
+
+    def _daemon(self, **kwargs):
+        return SyncDaemon(
+            self.client, self.backup_dir, ["gpx"],
+            Retryer(stop_strategy=MaxRetriesStopStrategy(0)),
+            overlap=timedelta(hours=1), **kwargs)
+
+    def test_incremental_polls(self):
+        self.assertTrue(self.daemon.poll())
+        self.assertEqual(self.daemon.activities_synced, 10)
+        self.assertEqual(self.daemon.state.activity_cursor, NEWEST)
+
+        # a quiet poll only lists back to the cursor (minus the overlap)
+        self.client.listed = 0
+        self.assertTrue(self.daemon.poll())
+        self.assertEqual(self.client.listed, 2)
+        self.assertEqual(self.daemon.activities_synced, 10)
+
+        # a new activity is picked up, also by a restarted daemon
+        newer = NEWEST + timedelta(hours=2)
+        self.client.activities.insert(0, (2000, newer))
+        daemon = self._daemon()
+        self.assertTrue(daemon.poll())
+        self.assertEqual(daemon.activities_synced, 1)
+        self.assertEqual(SyncState(os.path.join(
+            self.backup_dir, state_file)).activity_cursor, newer)
+
+    def test_failure_reconnects(self):
+        self.client.fail = True
+        self.assertFalse(self.daemon.poll())
+        self.assertFalse(self.daemon.status()["healthy"])
+        self.assertIsNone(self.daemon.state.activity_cursor)
+
+        self.client.fail = False
+        self.assertTrue(self.daemon.poll())
+        self.assertEqual(self.client.connects, 1)
+        self.assertTrue(self.daemon.status()["healthy"])
+
+    def test_wellness_days(self):
+        stored = []
+        daemon = self._daemon(
+            wellness=lambda client, days: [
+                (day, stored.append(day) is None) for day in days],
+            wellness_start=date.today() - timedelta(3))
+        self.assertTrue(daemon.poll())
+        self.assertEqual(stored, [date.today() - timedelta(i)
+                                  for i in (3, 2, 1)])
+        self.assertTrue(daemon.poll())
+        self.assertEqual(len(stored), 3)
+        self.assertEqual(daemon.status()["wellness_cursor"],
+                         (date.today() - timedelta(1)).isoformat())
+
+    def test_wellness_partial_failure_restart(self):
+        client = FakeWellnessClient()
+        yesterday = date.today() - timedelta(1)
+        client.failing.add((yesterday - timedelta(1), "heart_rate"))
+        environment = {"BIO_DB_BACKEND": "sqlite", "BIO_DB_PATH": os.path.join(
+            self.backup_dir, "biometrics.sqlite")}
+        wellness = functools.partial(store_wellness, ledger_path=os.path.join(
+            self.backup_dir, ledger_file))
+        with mock.patch.dict(os.environ, environment):
+            daemon = SyncDaemon(
+                client, self.backup_dir, ["gpx"], Retryer(),
+                wellness=wellness, wellness_start=yesterday - timedelta(2))
+            self.assertEqual(daemon.sync_wellness(), 2)
+            # the cursor stops before the failed day
+            self.assertEqual(daemon.state.wellness_cursor,
+                             yesterday - timedelta(2))
+
+            # a restarted daemon completes the failed day, without
+            # inserting the stored days and kinds again
+            client.failing.clear()
+            daemon = SyncDaemon(
+                client, self.backup_dir, ["gpx"], Retryer(),
+                wellness=wellness)
+            self.assertEqual(daemon.sync_wellness(), 2)
+            self.assertEqual(daemon.state.wellness_cursor, yesterday)
+            db = open_database()
+            self.assertEqual(db.connection.execute(
+                "SELECT COUNT(*) FROM sleep").fetchone()[0], 3)
+            self.assertEqual(db.connection.execute(
+                "SELECT COUNT(*) FROM daily_statistics "
+                "WHERE resting_hr IS NOT NULL").fetchone()[0], 3)
+            db.disconnect()
+
+
+if __name__ == '__main__':
+    unittest.main()
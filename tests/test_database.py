@@ -0,0 +1,130 @@
+from datetime import date, datetime
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from garminexport.database import (
+    Database, MySQLDatabase, SQLiteDatabase, open_database)
+
+START_MS = int(time.mktime(datetime(2019, 3, 1).timetuple())) * 1000
+
+DAY = {
+    "sleep": {
+        "dailySleepDTO": {
+            "calendarDate": "2019-03-01", "sleepTimeSeconds": 27000,
+            "sleepStartTimestampGMT": START_MS - 3 * 3600 * 1000,
+            "sleepEndTimestampGMT": START_MS + 5 * 3600 * 1000,
+            "deepSleepSeconds": 5000, "lightSleepSeconds": 15000,
+            "remSleepSeconds": 6000, "awakeSleepSeconds": 1000},
+        "sleepMovement": [
+            {"startGMT": "2019-03-01T00:00:00.0",
+             "endGMT": "2019-03-01T00:01:00.0", "activityLevel": 0.5}],
+    },
+    "heart_rate": {
+        "calendarDate": "2019-03-01", "maxHeartRate": 160,
+        "minHeartRate": 45, "restingHeartRate": 52,
+        "heartRateValues": [[START_MS, 60], [START_MS + 120000, 62]],
+    },
+    "movement": {"calendarDate": "2019-03-01", "movementValues": None},
+    "user_summary": None,
+}
+
+
+class TestSQLiteDatabase(unittest.TestCase):
+    """Exercise `SQLiteDatabase`."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "biometrics.sqlite")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_insert_wellness_data(self):
+        db = SQLiteDatabase(self.path)
+        db.insert_wellness_data(DAY)
+        row = db.connection.execute(
+            "SELECT * FROM daily_statistics").fetchone()
+        self.assertEqual((row["entry_date"], row["total_sleep"],
+                          row["resting_hr"], row["total_steps"]),
+                         ("2019-03-01", 27000, 52, None))
+        self.assertEqual(tuple(db.connection.execute(
+            "SELECT start, activity_level FROM sleep_movement").fetchone()),
+            ("2019-03-01 00:00:00", 0.5))
+        self.assertEqual([tuple(r) for r in db.connection.execute(
+            "SELECT event_time, hr_value FROM hr_data ORDER BY event_time")],
+            [("2019-03-01 00:00:00", 60), ("2019-03-01 00:02:00", 62)])
+        self.assertEqual(db.create_or_get_daily_statistic_id("2019-03-01"),
+                         row["id"])
+        self.assertEqual(db.connection.execute(
+            "PRAGMA journal_mode").fetchone()[0], "wal")
+        db.disconnect()
+
+    def test_compact_layout(self):
+        db = SQLiteDatabase(self.path, compact=True)
+        db.insert_wellness_data(DAY)
+        self.assertEqual(db.connection.execute(
+            "SELECT COUNT(*) FROM hr_data").fetchone()[0], 0)
+        series = db.get_hr_series("2019-03-01")
+        self.assertEqual(list(series.timestamps), [START_MS, START_MS + 120000])
+        self.assertEqual(list(series.values), [60, 62])
+        self.assertIsNone(db.get_movement_series("2019-03-01"))
+        db.disconnect()
+
+    def test_daily_statistic_ids(self):
+        db = SQLiteDatabase(self.path)
+        other = SQLiteDatabase(self.path)
+        day_id = other.create_or_get_daily_statistic_id("2019-03-02")
+        db.prefetch_daily_statistic_ids(date(2019, 3, 1), date(2019, 3, 3))
+        self.assertEqual(db.connection.execute(
+            "SELECT COUNT(*) FROM daily_statistics").fetchone()[0], 3)
+        with mock.patch.object(db, "_execute") as execute:
+            self.assertEqual(
+                db.create_or_get_daily_statistic_id("2019-03-02"), day_id)
+            summary = dict((key, 1) for key in (
+                "totalSteps", "highlyActiveSeconds", "activeSeconds",
+                "sedentarySeconds", "sleepingSeconds", "maxStressLevel",
+                "lowStressDuration", "mediumStressDuration",
+                "highStressDuration"))
+            summary["calendarDate"] = "2019-03-03"
+            db.insert_user_summary(summary)
+            # only the UPDATE of the summary, no id lookups
+            self.assertEqual(execute.call_count, 1)
+        # a day created concurrently by another writer is read back
+        other_id = other.create_or_get_daily_statistic_id("2019-03-04")
+        self.assertEqual(db.create_or_get_daily_statistic_id("2019-03-04"),
+                         other_id)
+        db.disconnect()
+        other.disconnect()
+
+    def test_open_database(self):
+        environment = {"BIO_DB_BACKEND": "sqlite", "BIO_DB_PATH": self.path}
+        with mock.patch.dict(os.environ, environment):
+            db = open_database()
+        self.assertIsInstance(db, SQLiteDatabase)
+        db.disconnect()
+        with self.assertRaises(ValueError):
+            open_database("postgres")
+        with self.assertRaises(ValueError):
+            open_database("sqlite", "columns")
+
+
+class TestMySQLDatabase(unittest.TestCase):
+    """Exercise `MySQLDatabase` (without a server)."""
+
+    def test_database_is_the_mysql_backend(self):
+        self.assertIs(Database, MySQLDatabase)
+        connection = object()
+        with mock.patch.object(MySQLDatabase, "connect") as connect:
+            db = Database(connection=connection)
+            connect.assert_not_called()
+            self.assertIs(db.connection, connection)
+            Database()
+            connect.assert_called_once_with()
+
+
+if __name__ == '__main__':
+    unittest.main()
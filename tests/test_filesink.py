@@ -0,0 +1,105 @@
+from datetime import date, timedelta
+import gzip
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from garminexport.filesink import FileSink, index_file, read_documents
+
+
+def documents(day):
+    return {"sleep": {"calendarDate": day.isoformat(), "sleepTimeSeconds": 1},
+            "heart_rate": {"calendarDate": day.isoformat(),
+                           "heartRateValues": [[1, 60], [2, 61]]},
+            "movement": None}
+
+
+class TestFileSink(unittest.TestCase):
+    """Exercise `FileSink`."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_round_trip(self):
+        days = [date(2019, 2, 27), date(2019, 2, 28), date(2019, 3, 1)]
+        with FileSink(self.directory) as sink:
+            for day in days:
+                sink.write(day, documents(day))
+        self.assertEqual(
+            sorted(os.listdir(os.path.join(self.directory, "sleep"))),
+            ["2019-02.ndjson.gz", "2019-03.ndjson.gz"])
+        self.assertFalse(os.path.exists(
+            os.path.join(self.directory, "movement")))
+        self.assertEqual(list(read_documents(self.directory, "heart_rate")),
+                         [(day.isoformat(), documents(day)["heart_rate"])
+                          for day in days])
+        self.assertEqual(list(read_documents(self.directory, "movement")), [])
+        with open(os.path.join(self.directory, index_file)) as f:
+            self.assertEqual(json.load(f)["sleep"],
+                             ["2019-02-27", "2019-02-28", "2019-03-01"])
+
+    def test_present_days_are_skipped(self):
+        with FileSink(self.directory) as sink:
+            sink.write(date(2019, 3, 1), documents(date(2019, 3, 1)))
+        with FileSink(self.directory) as sink:
+            self.assertIn("2019-03-01", sink.days["sleep"])
+            sink.write(date(2019, 3, 1), documents(date(2019, 3, 1)))
+            sink.write(date(2019, 3, 2), documents(date(2019, 3, 2)))
+        self.assertEqual([day for day, _ in read_documents(
+            self.directory, "sleep")], ["2019-03-01", "2019-03-02"])
+        # the second run appended a gzip member of its own
+        path = os.path.join(self.directory, "sleep", "2019-03.ndjson.gz")
+        with gzip.open(path, "rb") as f:
+            self.assertEqual(len(f.readlines()), 2)
+
+    def test_interrupted_run(self):
+        with FileSink(self.directory) as sink:
+            sink.write(date(2019, 3, 1), documents(date(2019, 3, 1)))
+            sink.write(date(2019, 3, 2), documents(date(2019, 3, 2)))
+        # a run killed while writing 2019-03-03, after 2019-03-02 was
+        # written again but before it was indexed
+        path = os.path.join(self.directory, "sleep", "2019-03.ndjson.gz")
+        with open(os.path.join(self.directory, index_file), "w") as f:
+            json.dump({"sleep": ["2019-03-01"]}, f)
+        with open(path, "ab") as f:
+            f.write(gzip.compress(b'{"date":"2019-03-03","data":{}}\n')[:-6])
+        self.assertEqual([day for day, _ in read_documents(
+            self.directory, "sleep")], ["2019-03-01", "2019-03-02"])
+
+        with FileSink(self.directory) as sink:
+            sink.write(date(2019, 3, 2), documents(date(2019, 3, 2)))
+            sink.write(date(2019, 3, 3), documents(date(2019, 3, 3)))
+        self.assertEqual(list(read_documents(self.directory, "sleep")),
+                         [(day, documents(date(2019, 3, int(day[-1])))["sleep"])
+                          for day in ("2019-03-01", "2019-03-02",
+                                      "2019-03-03")])
+        # the truncated member was cut off, so the file reads as a whole
+        with gzip.open(path, "rb") as f:
+            self.assertEqual(len(f.readlines()), 4)
+
+    def test_killed_run_loses_at_most_the_unindexed_days(self):
+        sink = FileSink(self.directory, index_every=4, index_interval=3600)
+        days = [date(2019, 3, 1) + timedelta(i) for i in range(10)]
+        for day in days:
+            sink.write(day, documents(day))
+        # killed without closing: the index has the first 8 days
+        with open(os.path.join(self.directory, index_file)) as f:
+            self.assertEqual(len(json.load(f)["sleep"]), 8)
+
+        with FileSink(self.directory) as sink:
+            for day in days:
+                sink.write(day, documents(day))
+        self.assertEqual([day for day, _ in read_documents(
+            self.directory, "sleep")], [day.isoformat() for day in days])
+        path = os.path.join(self.directory, "sleep", "2019-03.ndjson.gz")
+        with gzip.open(path, "rb") as f:
+            self.assertEqual(len(f.readlines()), 12)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+from datetime import datetime, timedelta, timezone
+import os
+import shutil
+import tempfile
+import unittest
+
+from garminexport.backup import export_filename, not_found_file
+from garminexport.journal import Journal, journal_file
+
+START = datetime(2019, 3, 1, 6, 30, tzinfo=timezone.utc)
+
+
+class TestJournal(unittest.TestCase):
+    """Exercise `Journal`."""
+
+    def setUp(self):
+        self.backup_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.backup_dir, journal_file)
+        self.activities = [(100 + i, START - timedelta(days=i))
+                           for i in range(5)]
+        self.formats = ["gpx", "fit"]
+
+    def tearDown(self):
+        shutil.rmtree(self.backup_dir)
+
+    def _touch(self, activity, export_format):
+        open(os.path.join(self.backup_dir,
+                          export_filename(activity, export_format)), "w").close()
+
+    def test_plan_and_resume(self):
+        self._touch(self.activities[0], "gpx")
+        self._touch(self.activities[0], "fit")
+        self._touch(self.activities[1], "gpx")
+        with open(os.path.join(self.backup_dir, not_found_file), "w") as f:
+            f.write(export_filename(self.activities[2], "fit") + "\n")
+
+        with Journal(self.path) as journal:
+            journal.reset(self.formats)
+            journal.add_listing(self.activities)
+            self.assertEqual(journal.plan(self.backup_dir), 4)
+            pending = journal.pending("oldest")
+            self.assertEqual([activity for activity, _ in pending],
+                             self.activities[:0:-1])
+            self.assertEqual(pending[-1][1], ["fit"])
+            self.assertEqual(pending[-2][1], ["gpx"])
+            journal.mark(*pending[0], state="done")
+
+        with Journal(self.path) as journal:
+            self.assertTrue(journal.is_planned(["fit", "gpx"]))
+            self.assertFalse(journal.is_planned(["gpx"]))
+            pending = journal.pending("newest")
+            self.assertEqual([activity for activity, _ in pending],
+                             self.activities[1:4])
+            for activity, formats in pending:
+                self.assertFalse(journal.finish())
+                journal.mark(activity, formats, "done")
+            self.assertTrue(journal.finish())
+            self.assertFalse(journal.is_started(self.formats))
+
+    def test_listing_cursor(self):
+        with Journal(self.path) as journal:
+            journal.reset(self.formats)
+
+            def interrupted():
+                for activity in self.activities[:3]:
+                    yield activity
+                raise IOError("connection lost")
+            with self.assertRaises(IOError):
+                journal.add_listing(interrupted())
+            self.assertFalse(journal.is_listed)
+            self.assertEqual(journal.listing_cursor, 3)
+
+            self.assertEqual(journal.add_listing(
+                self.activities[journal.listing_cursor:]), 5)
+            self.assertTrue(journal.is_listed)
+            self.assertEqual(sorted(journal.listing()), self.activities)
+
+
+if __name__ == '__main__':
+    unittest.main()
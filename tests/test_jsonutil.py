@@ -0,0 +1,81 @@
+import importlib
+import json
+import os
+import unittest
+from unittest import mock
+
+from garminexport import jsonutil
+
+DOCUMENT = {"activityId": 123, "activityName": u"Löpning",
+            "distance": 10012.5, "laps": [{"n": 1}, {"n": 2}], "empty": []}
+
+
+def reload_with(environment):
+    with mock.patch.dict(os.environ, environment):
+        return importlib.reload(jsonutil)
+
+
+class TestJsonUtil(unittest.TestCase):
+    """Exercise `jsonutil` with both backends."""
+
+    def tearDown(self):
+        # restore the backend and indent of the test environment
+        importlib.reload(jsonutil)
+
+    def backends(self):
+        backends = ["json"]
+        if jsonutil._orjson_installed:
+            backends.append("orjson")
+        return backends
+
+    def test_round_trip(self):
+        for backend in self.backends():
+            with self.subTest(backend=backend):
+                module = reload_with({"GARMINEXPORT_JSON": backend})
+                self.assertEqual(module.backend, backend)
+                compact = module.dumps(DOCUMENT)
+                self.assertIsInstance(compact, bytes)
+                self.assertNotIn(b" ", compact)
+                self.assertIn(u"Löpning".encode("utf-8"), compact)
+                self.assertEqual(module.loads(compact), DOCUMENT)
+                self.assertEqual(module.loads(compact.decode("utf-8")),
+                                 DOCUMENT)
+
+    def test_indent(self):
+        for backend in self.backends():
+            for indent in (2, 4):
+                with self.subTest(backend=backend, indent=indent):
+                    module = reload_with({"GARMINEXPORT_JSON": backend})
+                    expected = json.dumps(DOCUMENT, ensure_ascii=False,
+                                          indent=indent).encode("utf-8")
+                    self.assertEqual(module.dumps(DOCUMENT, indent=indent),
+                                     expected)
+
+    @unittest.skipUnless(jsonutil._orjson_installed, "orjson is missing")
+    def test_orjson_encodes_indent_2(self):
+        module = reload_with({"GARMINEXPORT_JSON": "orjson"})
+        with mock.patch.object(module.json, "dumps") as dumps:
+            module.dumps(DOCUMENT, indent=2)
+            dumps.assert_not_called()
+            module.dumps(DOCUMENT, indent=4)
+            dumps.assert_called_once()
+
+    def test_pretty_indent(self):
+        self.assertEqual(reload_with({}).pretty_indent, 4)
+        module = reload_with({"GARMINEXPORT_JSON_INDENT": "2"})
+        self.assertEqual(module.pretty_indent, 2)
+
+    def test_unrecognized_settings(self):
+        with self.assertRaises(ValueError):
+            reload_with({"GARMINEXPORT_JSON": "simplejson"})
+        with self.assertRaises(ValueError):
+            reload_with({"GARMINEXPORT_JSON_INDENT": "tab"})
+
+    @unittest.skipIf(jsonutil._orjson_installed, "orjson is installed")
+    def test_orjson_override_requires_orjson(self):
+        with self.assertRaises(ValueError):
+            reload_with({"GARMINEXPORT_JSON": "orjson"})
+
+
+if __name__ == '__main__':
+    unittest.main()
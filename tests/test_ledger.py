@@ -0,0 +1,101 @@
+from datetime import date, timedelta
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from garminexport.commands.get_data import process_range
+from garminexport.filesink import read_documents
+from garminexport.ledger import EMPTY, FAILED, OK, Ledger, ledger_file
+
+from tests.test_wellness import FakeWellnessClient
+
+
+class TestLedger(unittest.TestCase):
+    """Exercise `Ledger`."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_gaps(self):
+        with Ledger(os.path.join(self.directory, ledger_file)) as ledger:
+            ledger.record(date(2019, 3, 1), {"sleep": OK, "heart_rate": EMPTY})
+            ledger.record(date(2019, 3, 2), {"sleep": FAILED},
+                          {"sleep": "boom"})
+            self.assertEqual(
+                ledger.gaps(date(2019, 3, 1), date(2019, 3, 3),
+                            kinds=["sleep", "heart_rate"]),
+                [(date(2019, 3, 2), "sleep"), (date(2019, 3, 2), "heart_rate"),
+                 (date(2019, 3, 3), "sleep"), (date(2019, 3, 3), "heart_rate")])
+            ledger.record(date(2019, 3, 2), {"sleep": OK})
+            self.assertEqual(ledger.status(date(2019, 3, 2), "sleep"), OK)
+            self.assertIsNone(ledger.status(date(2019, 3, 3), "sleep"))
+
+    def test_ok_is_never_downgraded(self):
+        with Ledger(os.path.join(self.directory, ledger_file)) as ledger:
+            ledger.record(date(2019, 3, 1), {"sleep": OK})
+            ledger.record(date(2019, 3, 1), {"sleep": FAILED},
+                          {"sleep": "duplicate entry"})
+            ledger.record(date(2019, 3, 1), {"sleep": EMPTY})
+            self.assertEqual(ledger.status(date(2019, 3, 1), "sleep"), OK)
+            ledger.record(date(2019, 3, 2), {"sleep": FAILED})
+            ledger.record(date(2019, 3, 2), {"sleep": OK})
+            self.assertEqual(ledger.status(date(2019, 3, 2), "sleep"), OK)
+
+    def test_recent_empty_days_are_gaps(self):
+        today = date.today()
+        old, recent = today - timedelta(10), today - timedelta(1)
+        with Ledger(os.path.join(self.directory, ledger_file)) as ledger:
+            for day in (old, recent):
+                ledger.record(day, {"sleep": EMPTY})
+            self.assertEqual(ledger.gaps(old, recent, kinds=["sleep"]),
+                             [(old + timedelta(i), "sleep")
+                              for i in range(1, 9)] + [(recent, "sleep")])
+            self.assertEqual(len(ledger.gaps(old, recent, kinds=["sleep"],
+                                             empty_recheck_days=None)), 10)
+            self.assertEqual(len(ledger.gaps(old, recent, kinds=["sleep"],
+                                             empty_recheck_days=0)), 8)
+
+    def test_fill_gaps(self):
+        client = FakeWellnessClient(delay=0)
+        # user summaries of 2019-03-04 fail, movement of 2019-03-02 is empty
+        self.assertEqual(process_range(client, "2019-03-01", "2019-03-05",
+                                       output_dir=self.directory), 1)
+        ledger = Ledger(os.path.join(self.directory, ledger_file))
+        self.assertEqual(ledger.status(date(2019, 3, 2), "movement"), EMPTY)
+        self.assertEqual(ledger.gaps(date(2019, 3, 1), date(2019, 3, 5)),
+                         [(date(2019, 3, 4), "user_summary")])
+
+        fetched = []
+        client.get_user_summary = lambda request_date: (
+            fetched.append(request_date) or {"date": request_date})
+        self.assertEqual(process_range(client, "2019-03-01", "2019-03-05",
+                                       output_dir=self.directory,
+                                       fill_gaps=True), 0)
+        self.assertEqual(fetched, ["2019-03-04"])
+
+        # a plain rerun fetches the whole range (and stores no duplicates)
+        self.assertEqual(process_range(client, "2019-03-01", "2019-03-05",
+                                       output_dir=self.directory), 0)
+        self.assertEqual(fetched, ["2019-03-04", "2019-03-01", "2019-03-02",
+                                   "2019-03-03", "2019-03-04", "2019-03-05"])
+        self.assertEqual(ledger.gaps(date(2019, 3, 1), date(2019, 3, 5)), [])
+        self.assertEqual(len(list(read_documents(self.directory,
+                                                 "user_summary"))), 5)
+        ledger.close()
+
+    def test_fill_gaps_needs_a_ledger_with_the_database(self):
+        environment = dict(os.environ)
+        environment.pop("BIO_LEDGER_PATH", None)
+        with mock.patch.dict(os.environ, environment, clear=True):
+            with self.assertRaises(ValueError):
+                process_range(FakeWellnessClient(delay=0), "2019-03-01",
+                              "2019-03-05", fill_gaps=True)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from garminexport.metrics import Metrics, endpoint_name
+
+
+class TestEndpointName(unittest.TestCase):
+    """Exercise `endpoint_name`."""
+
+    def test_ids_dates_and_queries_are_replaced(self):
+        self.assertEqual(
+            endpoint_name("https://connect.garmin.com/modern/proxy/"
+                          "activity-service/activity/123456"),
+            "activity-service/activity/{id}")
+        self.assertEqual(
+            endpoint_name("https://connect.garmin.com/modern/proxy/"
+                          "wellness-service/wellness/dailyHeartRate/"
+                          "someuser?date=2019-03-01&_=1532359756927"),
+            "wellness-service/wellness/dailyHeartRate/someuser")
+        self.assertEqual(
+            endpoint_name("https://sso.garmin.com/sso/login"), "sso/login")
+
+
+class TestMetrics(unittest.TestCase):
+    """Exercise `Metrics`."""
+
+    def setUp(self):
+        self.metrics = Metrics()
+
+    def test_counters_and_histograms(self):
+        self.metrics.inc("http_requests_total", endpoint="a", status=200)
+        self.metrics.inc("http_requests_total", endpoint="a", status=200)
+        self.metrics.inc("http_response_bytes_total", 512, endpoint="a")
+        self.metrics.observe("http_request_duration_seconds", 0.2, endpoint="a")
+        self.metrics.observe("http_request_duration_seconds", 3.0, endpoint="a")
+
+        report = self.metrics.to_dict()
+        self.assertEqual(report["counters"]["http_requests_total"],
+                         [{"labels": {"endpoint": "a", "status": 200},
+                           "value": 2}])
+        histogram = report["histograms"]["http_request_duration_seconds"][0]
+        self.assertEqual(histogram["count"], 2)
+        self.assertAlmostEqual(histogram["sum"], 3.2)
+        self.assertEqual(histogram["max"], 3.0)
+        self.assertEqual(histogram["buckets"]["0.25"], 1)
+        self.assertEqual(histogram["buckets"]["5.0"], 2)
+
+    def test_timed(self):
+        @self.metrics.timed("stage_duration_seconds", stage="work")
+        def work(x):
+            return x * 2
+
+        self.assertEqual(work(2), 4)
+        self.assertEqual(work(3), 6)
+        histogram = self.metrics.histograms["stage_duration_seconds"][
+            (("stage", "work"),)]
+        self.assertEqual(histogram.count, 2)
+
+    def test_prometheus(self):
+        self.metrics.inc("retries_total", function="get_activity_gpx")
+        self.metrics.observe("stage_duration_seconds", 0.02, stage="db")
+        lines = self.metrics.prometheus().splitlines()
+        self.assertIn("# TYPE garminexport_retries_total counter", lines)
+        self.assertIn(
+            'garminexport_retries_total{function="get_activity_gpx"} 1', lines)
+        self.assertIn(
+            'garminexport_stage_duration_seconds_bucket{stage="db",le="0.01"} 0',
+            lines)
+        self.assertIn(
+            'garminexport_stage_duration_seconds_bucket{stage="db",le="+Inf"} 1',
+            lines)
+        self.assertIn(
+            'garminexport_stage_duration_seconds_count{stage="db"} 1', lines)
+
+    def test_write_reports(self):
+        directory = tempfile.mkdtemp()
+        try:
+            self.metrics.inc("retries_total", function="f")
+            self.metrics.write_json(os.path.join(directory, "stats.json"))
+            self.metrics.write_prometheus(os.path.join(directory, "stats.prom"))
+            with open(os.path.join(directory, "stats.json")) as f:
+                self.assertIn("retries_total", json.load(f)["counters"])
+            self.assertEqual(sorted(os.listdir(directory)),
+                             ["stats.json", "stats.prom"])
+        finally:
+            shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    unittest.main()
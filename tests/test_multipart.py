@@ -0,0 +1,74 @@
+import email.parser
+import gzip
+import io
+import os
+import tempfile
+import unittest
+
+from garminexport.multipart import MultipartEncoder
+
+
+def parse(encoder, body):
+    """Parses a multipart body into its (single) part."""
+    message = email.parser.BytesParser().parsebytes(
+        b"Content-Type: " + encoder.content_type.encode() + b"\r\n\r\n" + body)
+    parts = message.get_payload()
+    assert len(parts) == 1
+    return parts[0]
+
+
+class TestMultipartEncoder(unittest.TestCase):
+    """Exercise `MultipartEncoder`."""
+
+    def setUp(self):
+        self.content = os.urandom(300 * 1024)
+        self.file = tempfile.TemporaryFile()
+        self.file.write(self.content)
+        self.file.seek(0)
+
+    def tearDown(self):
+        self.file.close()
+
+    def test_read_in_chunks(self):
+        """Reading in small chunks should produce a valid, complete body of
+        the advertised length."""
+        encoder = MultipartEncoder("data", "a.fit", self.file, chunk_size=1000)
+        chunks = iter(lambda: encoder.read(8192), b"")
+        body = b"".join(chunks)
+        self.assertEqual(len(body), len(encoder))
+        part = parse(encoder, body)
+        self.assertEqual(part.get_param("name", header="content-disposition"),
+                         "data")
+        self.assertEqual(part.get_filename(), "a.fit")
+        self.assertEqual(part.get_payload(decode=True), self.content)
+
+    def test_iterate(self):
+        encoder = MultipartEncoder("data", "a.fit", io.BytesIO(self.content))
+        body = b"".join(encoder)
+        self.assertEqual(len(body), len(encoder))
+        self.assertEqual(parse(encoder, body).get_payload(decode=True),
+                         self.content)
+
+    def test_progress(self):
+        calls = []
+        encoder = MultipartEncoder(
+            "data", "a.fit", self.file, chunk_size=100 * 1024,
+            progress=lambda read, total: calls.append((read, total)))
+        encoder.read()
+        total = len(self.content)
+        self.assertEqual(calls, [(100 * 1024, total), (200 * 1024, total),
+                                 (total, total)])
+
+    def test_compress(self):
+        """A compressed body has unknown length and a gzipped file part."""
+        encoder = MultipartEncoder("data", "a.fit", self.file, compress=True)
+        self.assertEqual(len(encoder), 0)
+        self.assertTrue(encoder)
+        part = parse(encoder, encoder.read())
+        self.assertEqual(part.get_filename(), "a.fit.gz")
+        self.assertEqual(gzip.decompress(part.get_payload(decode=True)),
+                         self.content)
+
+
+if __name__ == '__main__':
+    unittest.main()
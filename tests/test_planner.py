@@ -0,0 +1,62 @@
+from datetime import datetime, timedelta, timezone
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from garminexport import planner
+from garminexport.backup import export_filename, missing_exports, not_found_file
+from garminexport.planner import BackupIndex
+
+NEWEST = datetime(2019, 3, 1, 6, 30, tzinfo=timezone.utc)
+FORMATS = ["json_summary", "fit", "gpx"]
+
+
+class TestBackupIndex(unittest.TestCase):
+    """Exercise `BackupIndex`."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        # newest first, like an account's listing
+        self.activities = [(100 + i, NEWEST - timedelta(hours=i))
+                           for i in range(25)]
+        for activity in self.activities[5:]:
+            for export_format in ("json_summary", "fit"):
+                open(os.path.join(self.directory, export_filename(
+                    activity, export_format)), "w").close()
+        with open(os.path.join(self.directory, not_found_file), "w") as f:
+            for activity in self.activities[10:]:
+                f.write(export_filename(activity, "gpx") + "\n")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_missing_matches_missing_exports(self):
+        with mock.patch.object(planner, "_SQLITE_MAX_VARIABLES", 7):
+            with BackupIndex(self.directory) as index:
+                missing = list(index.missing(iter(self.activities), FORMATS))
+                self.assertEqual(index.listed, 25)
+        self.assertEqual(dict(missing), missing_exports(
+            self.activities, self.directory, FORMATS))
+        # in listing order
+        self.assertEqual([activity for activity, _ in missing],
+                         self.activities[:10])
+        self.assertEqual(missing[0][1], FORMATS)
+        self.assertEqual(missing[-1][1], ["gpx"])
+
+    def test_refresh(self):
+        with BackupIndex(self.directory) as index:
+            missing = dict(index.missing(
+                self.activities, FORMATS, refresh={120}))
+            self.assertEqual(missing[self.activities[20]], FORMATS)
+            open(os.path.join(self.directory, export_filename(
+                self.activities[0], "gpx")), "w").close()
+            self.assertEqual(index.refresh(), 20 * 2 + 15 + 1 + 1)
+            missing = dict(index.missing(self.activities, FORMATS))
+            self.assertEqual(missing[self.activities[0]],
+                             ["json_summary", "fit"])
+
+
+if __name__ == '__main__':
+    unittest.main()
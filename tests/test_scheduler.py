@@ -0,0 +1,69 @@
+from datetime import datetime
+import unittest
+
+from garminexport.scheduler import (
+    Job, TimeBudget, parse_format_priority, prioritize, schedule)
+
+OLD = (1, datetime(2019, 1, 1))
+NEW = (2, datetime(2019, 2, 1))
+
+
+class FakeClock(object):
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestPrioritize(unittest.TestCase):
+    """Exercise `prioritize`."""
+
+    def test_format_then_recency(self):
+        missing = {OLD: ["json_details", "fit", "gpx"], NEW: ["gpx", "fit"]}
+        self.assertEqual(prioritize(missing), [
+            Job(NEW, "fit"), Job(OLD, "fit"), Job(NEW, "gpx"),
+            Job(OLD, "gpx"), Job(OLD, "json_details")])
+        self.assertEqual(
+            prioritize(missing, parse_format_priority("gpx"), "oldest")[:3],
+            [Job(OLD, "gpx"), Job(NEW, "gpx"), Job(OLD, "fit")])
+
+    def test_parse_format_priority(self):
+        self.assertEqual(parse_format_priority("json_details, tcx")[:3],
+                         ["json_details", "tcx", "original"])
+        with self.assertRaises(ValueError):
+            parse_format_priority("kml")
+
+
+class TestSchedule(unittest.TestCase):
+    """Exercise `schedule`."""
+
+    def test_time_budget(self):
+        clock = FakeClock()
+        budget = TimeBudget(10.5, clock=clock)
+        jobs = [Job(NEW, "json_details"), Job(OLD, "json_details"),
+                Job(NEW, "gpx"), Job(OLD, "gpx")]
+        cost = {"json_details": 4, "gpx": 1}
+        done = []
+        for job in schedule(jobs, budget):
+            clock.now += cost[job.export_format]
+            done.append(job)
+        self.assertEqual(done, jobs)
+
+        clock.now = 0.0
+        budget = TimeBudget(6.5, clock=clock)
+        done = []
+        for job in schedule(jobs, budget):
+            clock.now += cost[job.export_format]
+            done.append(job)
+        # after 4 s, another json_details (4 s) would not fit, a gpx would
+        self.assertEqual(done, [jobs[0], jobs[2], jobs[3]])
+
+    def test_no_budget(self):
+        jobs = [Job(NEW, "fit")] * 3
+        self.assertEqual(list(schedule(jobs)), jobs)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+import threading
+import time
+import unittest
+
+from garminexport.garminclient import GarminClient
+from garminexport.singleflight import SingleFlight
+
+
+class FakeResponse(object):
+
+    def __init__(self, content):
+        self.status_code = 200
+        self.content = content
+        self.headers = {}
+
+
+class TestSingleFlight(unittest.TestCase):
+    """Exercise `SingleFlight`."""
+
+    def call_concurrently(self, function, count=4):
+        results = [None] * count
+
+        def call(i):
+            try:
+                results[i] = function()
+            except Exception as e:
+                results[i] = e
+        threads = [threading.Thread(target=call, args=(i,))
+                   for i in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_concurrent_calls_are_coalesced(self):
+        flight = SingleFlight()
+        calls = []
+
+        def slow(key):
+            calls.append(key)
+            time.sleep(0.1)
+            return key.upper()
+        results = self.call_concurrently(lambda: flight.do("a", slow, "a"))
+        self.assertEqual(results, ["A"] * 4)
+        self.assertEqual(calls, ["a"])
+        self.assertEqual(flight.in_flight(), 0)
+        # completed calls are not remembered
+        self.assertEqual(flight.do("a", slow, "a"), "A")
+        self.assertEqual(len(calls), 2)
+
+    def test_errors_are_shared(self):
+        flight = SingleFlight()
+
+        def failing():
+            time.sleep(0.1)
+            raise ValueError("boom")
+        results = self.call_concurrently(lambda: flight.do("a", failing))
+        self.assertTrue(all(isinstance(r, ValueError) for r in results))
+        self.assertEqual(flight.in_flight(), 0)
+
+    def test_client_gets_are_coalesced(self):
+        client = GarminClient("user", None)
+        client.session = object()
+        requests = []
+
+        def request(method, url, **kwargs):
+            requests.append(url)
+            time.sleep(0.1)
+            return FakeResponse(b"original")
+        client._request = request
+        results = self.call_concurrently(
+            lambda: client.get_raw_data("https://example.com/a"))
+        self.assertEqual(results, [b"original"] * 4)
+        self.assertEqual(requests, ["https://example.com/a"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,142 @@
+import os
+import shutil
+import struct
+import tempfile
+import unittest
+
+from garminexport.spatial import (
+    TileIndex, read_fit_points, read_gpx_points, tiles_file)
+
+GPX = """<?xml version="1.0" encoding="UTF-8"?>
+<gpx version="1.1" xmlns="http://www.topografix.com/GPX/1/1">
+  <trk><trkseg>
+{}
+  </trkseg></trk>
+</gpx>
+"""
+
+TRKPT = """    <trkpt lat="{}" lon="{}"><ele>10.0</ele><time>{}</time></trkpt>"""
+
+
+def write_gpx(path, points):
+    with open(path, "w") as f:
+        f.write(GPX.format("\n".join(
+            TRKPT.format(lat, lon, time) for lat, lon, time in points)))
+
+
+def write_fit(path, points):
+    """Writes a minimal FIT file with one `record` message per point
+    (`(lat, lon, fit_timestamp)`)."""
+    to_semicircles = lambda deg: int(round(deg * 2 ** 31 / 180.0))
+    # definition message for local type 0: global message 20 (record) with
+    # timestamp (253), position_lat (0) and position_long (1)
+    records = struct.pack("<BBBHB", 0x40, 0, 0, 20, 3)
+    records += struct.pack("<BBB", 253, 4, 0x86)
+    records += struct.pack("<BBB", 0, 4, 0x85)
+    records += struct.pack("<BBB", 1, 4, 0x85)
+    for lat, lon, timestamp in points:
+        records += struct.pack("<BIii", 0x00, timestamp,
+                               to_semicircles(lat), to_semicircles(lon))
+    header = struct.pack("<BBHI4s", 12, 0x10, 2093, len(records), b".FIT")
+    with open(path, "wb") as f:
+        f.write(header + records + b"\x00\x00")
+
+
+class TestTrackReaders(unittest.TestCase):
+    """Exercise the GPX and FIT track point readers."""
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_read_gpx_points(self):
+        path = os.path.join(self.dir, "a.gpx")
+        write_gpx(path, [(59.3, 18.0, "2019-03-01T06:30:00.000Z"),
+                         (59.4, 18.1, "2019-03-01T06:30:01.000Z")])
+        self.assertEqual(list(read_gpx_points(path)),
+                         [(59.3, 18.0, 1551421800), (59.4, 18.1, 1551421801)])
+
+    def test_read_fit_points(self):
+        path = os.path.join(self.dir, "a.fit")
+        write_fit(path, [(59.3, 18.0, 1000), (59.4, 18.1, 1001)])
+        points = list(read_fit_points(path))
+        self.assertEqual(len(points), 2)
+        self.assertAlmostEqual(points[0][0], 59.3, places=6)
+        self.assertAlmostEqual(points[0][1], 18.0, places=6)
+        self.assertEqual(points[1][2], 631065600 + 1001)
+
+
+class TestTileIndex(unittest.TestCase):
+    """Exercise `TileIndex`."""
+
+    def setUp(self):
+        self.backup_dir = tempfile.mkdtemp()
+        self.index = TileIndex(os.path.join(self.backup_dir, tiles_file))
+
+    def tearDown(self):
+        self.index.close()
+        shutil.rmtree(self.backup_dir)
+
+    def test_query_returns_activities_in_bbox(self):
+        """Only activities passing through the box should be returned."""
+        write_gpx(os.path.join(self.backup_dir, "2019-03-01_1.gpx"),
+                  [(59.30, 18.00, "2019-03-01T06:30:00Z"),
+                   (59.35, 18.05, "2019-03-01T06:40:00Z")])
+        write_fit(os.path.join(self.backup_dir, "2019-03-02_2.fit"),
+                  [(40.70, -74.00, 1000), (40.71, -74.01, 1001)])
+        self.assertEqual(self.index.update(self.backup_dir), 2)
+
+        hits = self.index.query((59.34, 18.04, 59.36, 18.06))
+        self.assertEqual([hit["activity_id"] for hit in hits], [1])
+        self.assertEqual(hits[0]["filename"], "2019-03-01_1.gpx")
+        self.assertEqual(hits[0]["start_time"], 1551422400)
+
+        hits = self.index.query((40.0, -75.0, 41.0, -73.0))
+        self.assertEqual([hit["activity_id"] for hit in hits], [2])
+
+    def test_query_by_time(self):
+        """Time bounds should apply to the time spent within the box."""
+        self.index.add(1, [(59.30, 18.00, 100), (59.35, 18.05, 200)])
+        bbox = (59.34, 18.04, 59.36, 18.06)
+        self.assertEqual(len(self.index.query(bbox, start=150)), 1)
+        self.assertEqual(len(self.index.query(bbox, start=250)), 0)
+        self.assertEqual(len(self.index.query(bbox, end=200)), 0)
+
+    def test_update_is_incremental_and_prefers_gpx(self):
+        """Unchanged files should not be re-read, and only one track file
+        per activity should be indexed."""
+        write_gpx(os.path.join(self.backup_dir, "2019-03-01_1.gpx"),
+                  [(59.30, 18.00, "2019-03-01T06:30:00Z")])
+        write_fit(os.path.join(self.backup_dir, "2019-03-01_1.fit"),
+                  [(40.70, -74.00, 1000)])
+        self.assertEqual(self.index.update(self.backup_dir), 1)
+        self.assertEqual(self.index.update(self.backup_dir), 0)
+        self.assertEqual(self.index.query((40.0, -75.0, 41.0, -73.0)), [])
+
+    def test_update_removes_deleted_tracks(self):
+        """The tiles of deleted track files should be dropped, falling back
+        to another track format of the activity if there is one."""
+        bbox = (59.0, 18.0, 60.0, 19.0)
+        write_gpx(os.path.join(self.backup_dir, "2019-03-01_1.gpx"),
+                  [(59.30, 18.00, "2019-03-01T06:30:00Z")])
+        write_gpx(os.path.join(self.backup_dir, "2019-03-02_2.gpx"),
+                  [(59.30, 18.00, "2019-03-02T06:30:00Z")])
+        write_fit(os.path.join(self.backup_dir, "2019-03-02_2.fit"),
+                  [(59.31, 18.01, 1000)])
+        self.assertEqual(self.index.update(self.backup_dir), 2)
+
+        os.remove(os.path.join(self.backup_dir, "2019-03-01_1.gpx"))
+        os.remove(os.path.join(self.backup_dir, "2019-03-02_2.gpx"))
+        self.assertEqual(self.index.update(self.backup_dir), 1)
+        hits = self.index.query(bbox)
+        self.assertEqual([(hit["activity_id"], hit["filename"])
+                          for hit in hits], [(2, "2019-03-02_2.fit")])
+        self.assertEqual(self.index.connection.execute(
+            "SELECT COUNT(*) FROM tiles WHERE activity_id = 1").fetchone(),
+            (0,))
+
+
+if __name__ == '__main__':
+    unittest.main()
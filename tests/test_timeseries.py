@@ -0,0 +1,35 @@
+import math
+import unittest
+
+from garminexport.timeseries import decode, encode
+
+
+class TestTimeseries(unittest.TestCase):
+    """Exercise `encode` and `decode`."""
+
+    def test_round_trip(self):
+        timestamps = [1551398400000 + 120000 * i for i in range(720)]
+        values = [60 + (i % 7) for i in range(720)]
+        blob = encode(timestamps, values)
+        series = decode(blob)
+        self.assertEqual(list(series.timestamps), timestamps)
+        self.assertEqual(list(series.values), values)
+        # regular samples compress to a fraction of their 16 raw bytes
+        self.assertLess(len(blob), 720)
+
+    def test_scale_and_missing_values(self):
+        series = decode(encode([30, 10, 20], [0.12346, None, 3.5], 10000))
+        self.assertEqual(list(series.timestamps), [30, 10, 20])
+        self.assertEqual(series.values[0], 0.1235)
+        self.assertTrue(math.isnan(series.values[1]))
+        self.assertEqual(series.values[2], 3.5)
+
+    def test_empty_and_invalid(self):
+        series = decode(encode([], []))
+        self.assertEqual((len(series.timestamps), len(series.values)), (0, 0))
+        with self.assertRaises(ValueError):
+            encode([1, 2], [1])
+
+
+if __name__ == '__main__':
+    unittest.main()
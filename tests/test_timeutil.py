@@ -0,0 +1,52 @@
+from datetime import datetime, timezone
+import unittest
+
+from garminexport.timeutil import (
+    epoch_to_datetime, epochs_to_datetimes, parse_timestamp,
+    parse_timestamps, parse_utc_timestamp)
+
+
+class TestParseTimestamp(unittest.TestCase):
+    """Exercise `parse_timestamp`."""
+
+    def test_fixed_formats(self):
+        self.assertEqual(parse_timestamp("2019-03-01 06:30:15"),
+                         datetime(2019, 3, 1, 6, 30, 15))
+        self.assertEqual(parse_timestamp("2019-03-01T06:30:15.0"),
+                         datetime(2019, 3, 1, 6, 30, 15))
+        self.assertEqual(parse_timestamp("2019-03-01T06:30:15.25"),
+                         datetime(2019, 3, 1, 6, 30, 15, 250000))
+
+    def test_fallback(self):
+        """Other formats should be handled by dateutil."""
+        self.assertEqual(parse_timestamp("2019-03-01T06:30:15.000Z"),
+                         datetime(2019, 3, 1, 6, 30, 15, tzinfo=timezone.utc))
+        self.assertEqual(parse_timestamp("March 1 2019"), datetime(2019, 3, 1))
+
+    def test_utc(self):
+        timestamp = parse_utc_timestamp("2015-02-17 05:45:00")
+        self.assertEqual(timestamp.isoformat(), "2015-02-17T05:45:00+00:00")
+
+    def test_batch(self):
+        self.assertEqual(
+            parse_timestamps(["2019-03-01 06:30:15", None]),
+            [datetime(2019, 3, 1, 6, 30, 15), None])
+
+
+class TestEpochToDatetime(unittest.TestCase):
+    """Exercise `epoch_to_datetime` and `epochs_to_datetimes`."""
+
+    def test_seconds_and_millis(self):
+        expected = datetime.fromtimestamp(1532359756)
+        self.assertEqual(epoch_to_datetime(1532359756), expected)
+        self.assertEqual(epoch_to_datetime(1532359756927), expected)
+        self.assertIsNone(epoch_to_datetime(None))
+
+    def test_bulk(self):
+        epochs = [1532359756927, 1532359757000, None, 1532359758]
+        self.assertEqual(epochs_to_datetimes(epochs),
+                         [epoch_to_datetime(epoch) for epoch in epochs])
+
+
+if __name__ == '__main__':
+    unittest.main()
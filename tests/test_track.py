@@ -0,0 +1,109 @@
+import math
+import unittest
+
+try:
+    import numpy as np
+    from garminexport import track
+except ImportError:
+    np = None
+
+
+GPX = """<?xml version="1.0" encoding="UTF-8"?>
+<gpx version="1.1" xmlns="http://www.topografix.com/GPX/1/1">
+  <trk><trkseg>
+    <trkpt lat="59.0" lon="18.0"><ele>10.0</ele><time>2019-03-01T06:30:00.000Z</time></trkpt>
+    <trkpt lat="59.0001" lon="18.0"><ele>11.0</ele><time>2019-03-01T06:30:01.000Z</time></trkpt>
+    <trkpt lat="59.0002" lon="18.0"><ele>12.0</ele><time>2019-03-01T06:30:02.000Z</time></trkpt>
+    <trkpt lat="59.0003" lon="18.0"><time>2019-03-01T06:30:03.000Z</time></trkpt>
+  </trkseg></trk>
+</gpx>
+"""
+
+
+@unittest.skipIf(np is None, "numpy is not installed")
+class TestTrack(unittest.TestCase):
+    """Exercise the `track` module."""
+
+    def test_haversine(self):
+        """One degree of latitude should be roughly 111.2 km."""
+        distances = track.haversine([0.0, 59.0], [0.0, 18.0],
+                                    [1.0, 60.0], [0.0, 18.0])
+        self.assertAlmostEqual(distances[0], 111195, delta=1)
+        self.assertAlmostEqual(distances[1], 111195, delta=1)
+
+    def test_cumulative_distance(self):
+        distances = track.cumulative_distance([0.0, 1.0, 2.0], [0.0] * 3)
+        self.assertEqual(distances[0], 0.0)
+        self.assertAlmostEqual(distances[2], 2 * 111195, delta=2)
+
+    def test_simplify_rdp_keeps_corners(self):
+        """Collinear points should be removed, corners kept."""
+        lat = [0.0, 0.0, 0.0, 0.0, 0.001, 0.002]
+        lon = [0.0, 0.001, 0.002, 0.003, 0.003, 0.003]
+        keep = track.simplify_rdp(lat, lon, tolerance=1.0)
+        self.assertEqual(np.flatnonzero(keep).tolist(), [0, 3, 5])
+
+    def test_simplify_visvalingam_keeps_corners(self):
+        lat = [0.0, 0.0, 0.0, 0.0, 0.001, 0.002]
+        lon = [0.0, 0.001, 0.002, 0.003, 0.003, 0.003]
+        keep = track.simplify_visvalingam(lat, lon, min_area=1.0)
+        self.assertEqual(np.flatnonzero(keep).tolist(), [0, 3, 5])
+
+    def test_resample_time(self):
+        t = track.Track([0.0, 1.0], [0.0, 0.0], [0.0, 10.0], [0.0, 10.0])
+        resampled = track.resample_time(t, 5.0)
+        self.assertEqual(resampled.time.tolist(), [0.0, 5.0, 10.0])
+        self.assertEqual(resampled.lat.tolist(), [0.0, 0.5, 1.0])
+
+    def test_resample_distance(self):
+        t = track.Track([0.0, 0.0, 1.0], [0.0, 0.0, 0.0])
+        resampled = track.resample_distance(t, 111195.0 / 4)
+        self.assertEqual(len(resampled), 5)
+        self.assertAlmostEqual(resampled.lat[2], 0.5, places=4)
+
+    def test_parse_and_reduce_gpx(self):
+        """A straight track should be reduced to its end points."""
+        parsed = track.parse_gpx(GPX)
+        self.assertEqual(len(parsed), 4)
+        self.assertEqual(parsed.time[1], 1551421801.0)
+        self.assertTrue(math.isnan(parsed.ele[3]))
+
+        reduced = track.parse_gpx(track.reduce_gpx(GPX))
+        self.assertEqual(reduced.lat.tolist(), [59.0, 59.0003])
+        self.assertEqual(reduced.time.tolist(), [1551421800.0, 1551421803.0])
+
+    def test_gpx_round_trip(self):
+        """Sub-second times and the track name survive a round trip."""
+        times = [1551421800.0, 1551421800.25, 1551421801.000001, float("nan")]
+        original = track.Track([59.0, 59.0001, 59.0002, 59.0003],
+                               [18.0] * 4, [10.0, 11.0, float("nan"), 12.0],
+                               times, name=u"Morning Run & <Walk>")
+        gpx = track.to_gpx(original)
+        self.assertIn("<time>2019-03-01T06:30:00Z</time>", gpx)
+        self.assertIn("<time>2019-03-01T06:30:00.250000Z</time>", gpx)
+
+        parsed = track.parse_gpx(gpx)
+        self.assertEqual(parsed.name, original.name)
+        self.assertEqual(parsed.lat.tolist(), original.lat.tolist())
+        self.assertEqual(parsed.time[:3].tolist(), times[:3])
+        self.assertTrue(math.isnan(parsed.time[3]))
+        self.assertTrue(math.isnan(parsed.ele[2]))
+        self.assertEqual(track.parse_gpx(track.reduce_gpx(gpx)).name,
+                         original.name)
+
+    def test_parse_time_offsets(self):
+        """GPX times are converted to UTC by their offsets."""
+        utc = 1551421800.0
+        self.assertEqual(track._parse_time("2019-03-01T06:30:00Z"), utc)
+        self.assertEqual(track._parse_time("2019-03-01T06:30:00"), utc)
+        self.assertEqual(
+            track._parse_time("2019-03-01T07:30:00+01:00"), utc)
+        self.assertEqual(
+            track._parse_time("2019-03-01T01:30:00.5-0500"), utc + 0.5)
+        self.assertTrue(math.isnan(track._parse_time(None)))
+        with self.assertRaises(ValueError):
+            track._parse_time("2019-03-01T06:30:00 CET")
+
+
+if __name__ == '__main__':
+    unittest.main()
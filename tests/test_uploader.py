@@ -0,0 +1,90 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+from garminexport.garminclient import ActivityExistsError
+from garminexport.uploader import UploadJournal, upload_files
+
+
+class FakeClient(object):
+    """A client whose `upload_activity` assigns increasing activity ids and
+    reports files whose content starts with `dup` as duplicates."""
+
+    def __init__(self):
+        self.uploaded = []
+        self.lock = threading.Lock()
+
+    def upload_activity(self, file, **kwargs):
+        content = file.read()
+        if content.startswith(b"dup?"):
+            raise ActivityExistsError("duplicate of an unknown activity")
+        if content.startswith(b"dup"):
+            raise ActivityExistsError("duplicate", 42)
+        if content.startswith(b"bad"):
+            raise RuntimeError("boom!")
+        with self.lock:
+            self.uploaded.append(os.path.basename(file.name))
+            return 1000 + len(self.uploaded)
+
+
+class TestUploadFiles(unittest.TestCase):
+    """Exercise `upload_files`."""
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.journal_path = os.path.join(self.dir, "journal")
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def write(self, name, content):
+        path = os.path.join(self.dir, name)
+        with open(path, "wb") as f:
+            f.write(content)
+        return path
+
+    def test_statuses(self):
+        paths = [self.write("a.fit", b"a"), self.write("b.fit", b"dup"),
+                 self.write("c.fit", b"bad")]
+        with UploadJournal(self.journal_path) as journal:
+            results = {os.path.basename(r.path): r for r in upload_files(
+                FakeClient(), paths, journal=journal, workers=2)}
+        self.assertEqual(results["a.fit"].status, "uploaded")
+        self.assertEqual(results["b.fit"].status, "duplicate")
+        self.assertEqual(results["b.fit"].activity_id, 42)
+        self.assertEqual(results["c.fit"].status, "failed")
+
+    def test_unknown_duplicate_id_is_journaled_empty(self):
+        path = self.write("d.fit", b"dup?")
+        with UploadJournal(self.journal_path) as journal:
+            [result] = upload_files(FakeClient(), [path], journal=journal)
+        self.assertEqual(result.status, "duplicate")
+        with open(self.journal_path) as f:
+            self.assertEqual(f.read().split("\t")[1], "")
+        with UploadJournal(self.journal_path) as journal:
+            [result] = upload_files(FakeClient(), [path], journal=journal)
+        self.assertEqual(result.status, "skipped")
+        self.assertIsNone(result.activity_id)
+
+    def test_resume_skips_journaled_files(self):
+        """Files uploaded in a previous run should be skipped by content."""
+        paths = [self.write("{}.fit".format(i), str(i).encode())
+                 for i in range(10)]
+        with UploadJournal(self.journal_path) as journal:
+            list(upload_files(FakeClient(), paths[:6], journal=journal,
+                              workers=3))
+
+        client = FakeClient()
+        with UploadJournal(self.journal_path) as journal:
+            results = list(upload_files(client, paths, journal=journal,
+                                        workers=3))
+        self.assertEqual(sorted(client.uploaded),
+                         sorted("{}.fit".format(i) for i in range(6, 10)))
+        self.assertEqual(
+            len([r for r in results if r.status == "skipped"]), 6)
+
+
+if __name__ == '__main__':
+    unittest.main()
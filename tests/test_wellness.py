@@ -0,0 +1,83 @@
+from datetime import date
+import threading
+import time
+import unittest
+
+from garminexport.garminclient import GarminClient, WELLNESS_KINDS
+
+
+class FakeWellnessClient(GarminClient):
+
+    def __init__(self, delay=0.01):
+        super(FakeWellnessClient, self).__init__("user", None, "user")
+        self.session = object()
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def _fetch(self, kind, request_date):
+        with self.lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(self.delay)
+        with self.lock:
+            self.in_flight -= 1
+        if kind == "movement" and request_date == "2019-03-02":
+            return None
+        return {"kind": kind, "date": request_date}
+
+    def get_daily_sleep_data(self, request_date):
+        return self._fetch("sleep", request_date)
+
+    def get_daily_hr_data(self, request_date):
+        return self._fetch("heart_rate", request_date)
+
+    def get_daily_movement(self, request_date):
+        return self._fetch("movement", request_date)
+
+    def get_user_summary(self, request_date):
+        if request_date == "2019-03-04":
+            raise ValueError("boom")
+        return self._fetch("user_summary", request_date)
+
+
+class TestWellnessRange(unittest.TestCase):
+    """Exercise `GarminClient.get_wellness_range`."""
+
+    def test_days_in_order(self):
+        client = FakeWellnessClient()
+        days = list(client.get_wellness_range(
+            date(2019, 3, 1), date(2019, 3, 3), workers=4))
+        self.assertEqual([day for day, _ in days],
+                         [date(2019, 3, 1), date(2019, 3, 2), date(2019, 3, 3)])
+        self.assertEqual(sorted(days[0][1]), sorted(WELLNESS_KINDS))
+        self.assertEqual(days[0][1]["sleep"],
+                         {"kind": "sleep", "date": "2019-03-01"})
+        self.assertIsNone(days[1][1]["movement"])
+        self.assertGreater(client.max_in_flight, 1)
+        self.assertLessEqual(client.max_in_flight, 4)
+
+    def test_kinds(self):
+        client = FakeWellnessClient(delay=0)
+        days = list(client.get_wellness_range(
+            date(2019, 3, 1), date(2019, 3, 2), kinds=["heart_rate"]))
+        self.assertEqual([list(documents) for _, documents in days],
+                         [["heart_rate"], ["heart_rate"]])
+        with self.assertRaises(ValueError):
+            list(client.get_wellness_range(
+                date(2019, 3, 1), date(2019, 3, 1), kinds=["steps"]))
+
+    def test_failure_is_raised_in_order(self):
+        client = FakeWellnessClient(delay=0)
+        stored = []
+        with self.assertRaises(ValueError):
+            for day, _ in client.get_wellness_range(
+                    date(2019, 3, 1), date(2019, 3, 6)):
+                stored.append(day)
+        self.assertEqual(stored, [date(2019, 3, 1), date(2019, 3, 2),
+                                  date(2019, 3, 3)])
+
+
+if __name__ == '__main__':
+    unittest.main()